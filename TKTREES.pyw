@@ -10,8 +10,17 @@ Requires Python >= 3.9
 """
 
 if __name__ == "__main__":
+    from multiprocessing import freeze_support
     from sys import argv
 
-    from src import app
+    freeze_support()
 
-    app.run_app(argv)
+    # the command line api is dispatched before the gui, and with it tkinter, is imported
+    from src import api
+
+    if api.is_api_call(argv):
+        api.run_api(argv)
+    else:
+        from src import app
+
+        app.run_app(argv)
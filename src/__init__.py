@@ -1,6 +1,12 @@
-# ruff: noqa: F401
-
 # SPDX-License-Identifier: GPL-3.0-only
 # Copyright (c) R. A. Gardner
 
-from .app import AppGUI, run_app
+
+def __getattr__(name: str):
+    # the gui is only imported when it's asked for so that the compare engine
+    # and the command line api can be imported without tkinter
+    if name in ("AppGUI", "run_app"):
+        from . import app
+
+        return getattr(app, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,134 @@
+# SPDX-License-Identifier: AGPL-3.0-only
+# Copyright (c) R. A. Gardner
+
+# the command line api, kept free of tkinter so that it runs without a display
+
+from __future__ import annotations
+
+import os
+
+from openpyxl.utils import column_index_from_string
+
+from .classes import tk_trees_api
+from .compare import tk_trees_compare_api
+from .functions import try_write_error_log
+
+# ________________________ ALLOW USE OF API HERE ________________________
+allow_api_use = True
+
+
+def _api_column_index(token: str, kind: str) -> int:
+    if token.isdigit():
+        return int(token)
+    try:
+        return column_index_from_string(token.upper()) - 1
+    except ValueError:
+        raise ValueError(
+            f"{kind} column index must be a number or letter representing a column, not '{token}'"
+        ) from None
+
+
+def _api_parent_columns(arg: str, param: str) -> list[int]:
+    tokens = [c for c in arg.split(param)[1].split(",") if c]
+    if not tokens:
+        raise ValueError(f"Missing required parameter {param}")
+    return sorted(_api_column_index(c, "Parent") for c in tokens)
+
+
+def parse_api_argv(argv: list[str]) -> dict:
+    # compare takes a second input file before the output file
+    compare = argv[1] == "compare"
+    kwargs = {
+        "api_action": argv[1],
+        "input_filepath": os.path.normpath(argv[2]),
+        "output_filepath": os.path.normpath(argv[4] if compare else argv[3]),
+    }
+    if compare:
+        kwargs["compare_filepath"] = os.path.normpath(argv[3])
+    all_parent_column_indexes = None
+    for arg in argv[5 if compare else 4 :]:
+        # -id-<int> and -parent-<int> required for flatten operations
+        if arg.startswith("-all-parent-columns-"):
+            all_parent_column_indexes = _api_parent_columns(arg, "-all-parent-columns-")
+
+        # compare only, the second file's parent columns, defaults to -all-parent-columns-
+        elif arg.startswith("-all-parent-columns2-"):
+            kwargs["compare_parent_column_indexes"] = _api_parent_columns(arg, "-all-parent-columns2-")
+
+        # compare only, the second file's sheet, defaults to first sheet
+        elif arg.startswith("-input-sheet2-"):
+            kwargs["compare_sheet"] = arg.split("-input-sheet2-")[1]
+
+        # compare only, the second file's ID column, defaults to -id-
+        elif arg.startswith("-id2-"):
+            kwargs["compare_id_column"] = _api_column_index(arg.split("-id2-")[1], "ID")
+
+        # defaults to first sheet
+        elif arg.startswith("-input-sheet-"):
+            kwargs["input_sheet"] = arg.split("-input-sheet-")[1]
+
+        # defaults to input-sheet name
+        elif arg.startswith("-output-sheet-"):
+            kwargs["output_sheet"] = arg.split("-output-sheet-")[1]
+
+        # defaults to comma
+        elif arg.startswith("-delim-"):
+            kwargs["csv_delimiter"] = arg.split("-delim-")[1]
+
+        # -id- and -parent- required for flatten, not for unflatten
+        elif arg.startswith("-id-"):
+            kwargs["flatten_id_column"] = _api_column_index(arg.split("-id-")[1], "ID")
+
+        elif arg.startswith("-parent-"):
+            if not compare:
+                kwargs["flatten_parent_column"] = _api_column_index(arg.split("-parent-")[1], "Parent")
+
+        # optional flags, e.g. -odjr
+        elif arg.startswith("-"):
+            # flags
+            # o overwrite
+            # d detail_columns
+            # j justify_left
+            # r reverse
+            # i add index
+            # m group moved branches (compare)
+            flags = arg.split("-")[1]
+            for c in flags:
+                if c == "o":
+                    kwargs["overwrite_file"] = True
+                elif compare:
+                    if c == "m":
+                        kwargs["structural"] = True
+                    else:
+                        break
+                elif c == "d":
+                    kwargs["detail_columns"] = True
+                elif c == "j":
+                    kwargs["justify_left"] = True
+                elif c == "r":
+                    kwargs["reverse"] = True
+                elif c == "i":
+                    kwargs["add_index"] = True
+                else:
+                    break
+
+    if all_parent_column_indexes is None:
+        raise ValueError("Missing required parameter -all-parent-columns-")
+    kwargs["all_parent_column_indexes"] = all_parent_column_indexes
+    return kwargs
+
+
+def is_api_call(argv: list[str]) -> bool:
+    return len(argv) > 4 and allow_api_use
+
+
+def run_api(argv: list[str]) -> None:
+    try:
+        kwargs = parse_api_argv(argv)
+        if kwargs["api_action"] == "compare":
+            tk_trees_compare_api(**kwargs)
+        else:
+            tk_trees_api(**kwargs)
+    except Exception as error_msg:
+        try_write_error_log(f"{error_msg}")
+        raise SystemExit(1) from None
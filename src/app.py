@@ -5,18 +5,20 @@ from __future__ import annotations
 
 import os
 import tkinter as tk
+from collections.abc import Callable
 from contextlib import suppress
 from tkinter import filedialog, ttk
+from typing import Any
 
-from openpyxl import load_workbook
 from tksheet import (
     DotDict,
-    alpha2idx,
 )
 
+from .api import is_api_call, run_api
 from .classes import (
     Header,
-    tk_trees_api,
+    ProjectFile,
+    TaskCancelled,
 )
 from .constants import (
     BF,
@@ -42,15 +44,14 @@ from .constants import (
 )
 from .functions import (
     b32_x_dict,
-    bytes_io_wb,
     center,
-    csv_str_x_data,
+    get_csv_data_from_file,
     get_json_format,
     get_json_from_file,
     json_to_sheet,
     load_cfg,
+    load_xlsx,
     set_window_zoomed,
-    try_write_error_log,
     window_is_zoomed,
     write_cfg,
     ws_x_data,
@@ -67,15 +68,13 @@ from .toplevels import (
 from .tree_compare import Tree_Compare
 from .tree_editor import Tree_Editor
 from .widgets import (
+    BackgroundTask,
     Column_Selection,
     Frame,
     Readonly_Entry,
     Status_Bar,
 )
 
-# ________________________ ALLOW USE OF API HERE ________________________
-allow_api_use = True
-
 
 class AppGUI(tk.Tk):
     def __init__(self, start_arg=None):
@@ -281,6 +280,8 @@ To get started once you have closed this popup, either:
     def try_to_close_everything(self):
         self.USER_HAS_QUIT = True
         self.try_to_close_workbook()
+        with suppress(Exception):
+            self.frames["tree_edit"].close_undo_history()
         with suppress(Exception):
             self.quit()
         with suppress(Exception):
@@ -317,6 +318,9 @@ To get started once you have closed this popup, either:
             "Alternate color": self.frames["tree_edit"].tree.ops.alternate_color,
             "Auto resize row indexes": self.frames["tree_edit"].auto_resize_indexes,
             "Allow cell text overflow": self.frames["tree_edit"].tree.ops.allow_cell_overflow,
+            "Undo memory limit MB": self.frames["tree_edit"].undo_mem_limit_mb,
+            "Save compact program data": self.frames["tree_edit"].save_compact_program_data,
+            "Save json indented": self.frames["tree_edit"].save_json_indented,
         }
         self.check_window_size_settings()
 
@@ -355,6 +359,9 @@ To get started once you have closed this popup, either:
             "Alternate color": self.frames["tree_edit"].tree.ops.alternate_color,
             "Auto resize row indexes": self.frames["tree_edit"].auto_resize_indexes,
             "Allow cell text overflow": self.frames["tree_edit"].tree.ops.allow_cell_overflow,
+            "Undo memory limit MB": self.frames["tree_edit"].undo_mem_limit_mb,
+            "Save compact program data": self.frames["tree_edit"].save_compact_program_data,
+            "Save json indented": self.frames["tree_edit"].save_json_indented,
         }
 
     def save_cfg(self, event=None, get_settings=True):
@@ -387,6 +394,12 @@ To get started once you have closed this popup, either:
         if "Allow cell text overflow" in self.configsettings:
             self.frames["tree_edit"].tree.ops.allow_cell_overflow = self.configsettings["Allow cell text overflow"]
             self.frames["tree_edit"].sheet.ops.allow_cell_overflow = self.configsettings["Allow cell text overflow"]
+        if "Undo memory limit MB" in self.configsettings:
+            self.frames["tree_edit"].undo_mem_limit_mb = self.configsettings["Undo memory limit MB"]
+        if "Save compact program data" in self.configsettings:
+            self.frames["tree_edit"].save_compact_program_data = self.configsettings["Save compact program data"]
+        if "Save json indented" in self.configsettings:
+            self.frames["tree_edit"].save_json_indented = self.configsettings["Save json indented"]
         self.theme = self.configsettings["Theme"]
         self.frames["tree_edit"].set_display_option(self.configsettings["Editor display option"])
         self.frames["tree_edit"].change_theme(self.theme, write=False)
@@ -448,6 +461,13 @@ To get started once you have closed this popup, either:
             self.title(app_title)
         self.update_idletasks()
 
+    def run_task(self, func: Callable, *args, cancellable: bool = True, pass_task: bool = False, **kwargs) -> Any:
+        # pass_task gives func the task as task= for progress and cancellation checks
+        task = BackgroundTask(self, self.status_bar, cancellable=cancellable)
+        if pass_task:
+            kwargs["task"] = task
+        return task.run(func, *args, **kwargs)
+
     def load_from_file(self):
         self.status_bar.change_text("Loading...")
         self.frames["tree_edit"].sheet.MT.data = []
@@ -455,9 +475,14 @@ To get started once you have closed this popup, either:
         self.try_to_close_workbook()
         if self.open_dict["filepath"].lower().endswith((".csv", ".tsv")):
             try:
-                with open(self.open_dict["filepath"], "r") as fh:
-                    temp_data = fh.read()
-                self.frames["tree_edit"].sheet.MT.data = csv_str_x_data(temp_data)
+                self.frames["tree_edit"].sheet.MT.data = self.run_task(
+                    get_csv_data_from_file,
+                    self.open_dict["filepath"],
+                    pass_task=True,
+                )
+            except TaskCancelled:
+                self.create_new_at_start()
+                return
             except Exception as error_msg:
                 Error(self, f"Error: {error_msg}", theme=self.theme)
                 self.create_new_at_start()
@@ -474,16 +499,22 @@ To get started once you have closed this popup, either:
 
         elif self.open_dict["filepath"].lower().endswith(".json"):
             try:
-                j = get_json_from_file(self.open_dict["filepath"])
+                j = self.run_task(get_json_from_file, self.open_dict["filepath"], pass_task=True)
+            except TaskCancelled:
+                self.create_new_at_start()
+                return
             except Exception as error_msg:
                 Error(self, f"Error: {error_msg}", theme=self.theme)
                 self.create_new_at_start()
                 return
             if "program_data" in j:
                 try:
-                    program_data = b32_x_dict(j["program_data"])
+                    program_data = self.run_task(b32_x_dict, j["program_data"])
                     self.frames["tree_edit"].sheet.MT.data = program_data["records"]
                     self.open_dict["sheet"] = "Sheet1"
+                except TaskCancelled:
+                    self.create_new_at_start()
+                    return
                 except Exception as error_msg:
                     Error(self, f"Error: {error_msg}", theme=self.theme)
                     self.create_new_at_start()
@@ -499,10 +530,35 @@ To get started once you have closed this popup, either:
             else:
                 self.json_go_to_column_selection(j)
 
+        elif self.open_dict["filepath"].lower().endswith(".tktrees"):
+            project = None
+            try:
+                project = self.run_task(ProjectFile, self.open_dict["filepath"])
+                program_data = self.run_task(project.program_data)
+                self.frames["tree_edit"].sheet.MT.data = program_data["records"]
+                self.open_dict["sheet"] = program_data.get("sheetname", "Sheet1")
+                self.frames["tree_edit"].populate(program_data=program_data)
+            except TaskCancelled:
+                if project is not None:
+                    project.close()
+                self.create_new_at_start()
+                return
+            except Exception as error_msg:
+                if project is not None:
+                    project.close()
+                Error(self, f"Error opening project: {error_msg}", theme=self.theme)
+                self.frames["tree_edit"].reset_tree()
+                self.create_new_at_start()
+                return
+            self.frames["tree_edit"].show_warnings(self.open_dict["filepath"], self.open_dict["sheet"])
+            self.after_idle(self.frames["tree_edit"].load_changelog, project)
+
         elif self.open_dict["filepath"].lower().endswith((".xlsx", ".xlsm", ".xls")):
             try:
-                in_mem = bytes_io_wb(self.open_dict["filepath"])
-                self.wb = load_workbook(in_mem, read_only=True, data_only=True)
+                self.wb = self.run_task(load_xlsx, self.open_dict["filepath"])
+            except TaskCancelled:
+                self.create_new_at_start()
+                return
             except Exception as error_msg:
                 Error(self, f"Error: {error_msg}", theme=self.theme)
                 self.create_new_at_start()
@@ -517,16 +573,20 @@ To get started once you have closed this popup, either:
                 ws = self.wb["program_data"]
                 ws.reset_dimensions()
                 try:
-                    d = b32_x_dict(ws_x_program_data_str(ws))
+                    d = self.run_task(lambda: b32_x_dict(ws_x_program_data_str(ws)))
                     self.frames["tree_edit"].populate(program_data=d)
                     self.open_dict["sheet"] = d["sheetname"]
                     self.wb.close()
                     self.frames["tree_edit"].show_warnings(self.open_dict["filepath"], self.open_dict["sheet"])
 
+                except TaskCancelled:
+                    self.wb.close()
+                    self.create_new_at_start()
+                    return
                 except Exception as error_msg:
                     self.wb.close()
                     self.frames["tree_edit"].sheet.MT.data = []
-                    self.wb = load_workbook(in_mem, read_only=True, data_only=True)
+                    self.wb = load_xlsx(self.open_dict["filepath"])
                     self.frames["column_selection"].sheet_selector.updatesheets(self.wb.sheetnames)
                     self.frames["column_selection"].sheet_selector.cont()
                     self.show_frame("column_selection")
@@ -539,7 +599,7 @@ To get started once you have closed this popup, either:
         else:
             Error(
                 self,
-                "Error: File must be one of these types - .xlsx, .xlsm, .xls, .csv, .tsv, .json",
+                "Error: File must be one of these types - .xlsx, .xlsm, .xls, .csv, .tsv, .json, .tktrees",
                 theme=self.theme,
             )
             self.create_new_at_start()
@@ -575,6 +635,8 @@ To get started once you have closed this popup, either:
 
     def wb_sheet_has_been_selected(self, selection):
         self.status_bar.change_text("Loading...")
+        if self.wb is None:
+            self.wb = load_xlsx(self.open_dict["filepath"])
         ws = self.wb[selection]
         ws.reset_dimensions()
         self.frames["tree_edit"].sheet.MT.data = ws_x_data(ws)
@@ -584,6 +646,8 @@ To get started once you have closed this popup, either:
             self.frames["column_selection"].sheet_selector.cont()
             self.show_frame("column_selection")
             return
+        # the workbook reads from the file on disk, release it so the file can be saved over
+        self.try_to_close_workbook()
         self.frames["tree_edit"].row_len = max(map(len, self.frames["tree_edit"].sheet.MT.data), default=0)
         self.open_dict["sheet"] = selection
         self.frames["column_selection"].populate(
@@ -675,8 +739,8 @@ To get started once you have closed this popup, either:
             Error(self, "Filepath invalid   ", theme=self.theme)
             self.enable_at_start()
             return
-        if not fp.lower().endswith((".json", ".xlsx", ".xls", ".xlsm", ".csv", ".tsv")):
-            Error(self, "Please select excel/csv/json   ", theme=self.theme)
+        if not fp.lower().endswith((".json", ".xlsx", ".xls", ".xlsm", ".csv", ".tsv", ".tktrees")):
+            Error(self, "Please select excel/csv/json/tktrees   ", theme=self.theme)
             self.enable_at_start()
             return
         check = os.path.isfile(fp)
@@ -689,83 +753,9 @@ To get started once you have closed this popup, either:
             self.enable_at_start()
 
 
-def _api_column_index(token: str, kind: str) -> int:
-    i = int(token) if token.isdigit() else alpha2idx(token)
-    if not isinstance(i, int) or i < 0:
-        raise ValueError(f"{kind} column index must be a number or letter representing a column, not '{token}'")
-    return i
-
-
-def parse_api_argv(argv: list[str]) -> dict:
-    kwargs = DotDict(
-        api_action=argv[1],
-        input_filepath=os.path.normpath(argv[2]),
-        output_filepath=os.path.normpath(argv[3]),
-    )
-    all_parent_column_indexes = None
-    for arg in argv[4:]:
-        # -id-<int> and -parent-<int> required for flatten operations
-        if arg.startswith("-all-parent-columns-"):
-            tokens = [c for c in arg.split("-all-parent-columns-")[1].split(",") if c]
-            if not tokens:
-                raise ValueError("Missing required parameter -all-parent-columns-")
-            all_parent_column_indexes = sorted(_api_column_index(c, "Parent") for c in tokens)
-
-        # defaults to first sheet
-        elif arg.startswith("-input-sheet-"):
-            kwargs["input_sheet"] = arg.split("-input-sheet-")[1]
-
-        # defaults to input-sheet name
-        elif arg.startswith("-output-sheet-"):
-            kwargs["output_sheet"] = arg.split("-output-sheet-")[1]
-
-        # defaults to comma
-        elif arg.startswith("-delim-"):
-            kwargs["csv_delimiter"] = arg.split("-delim-")[1]
-
-        # -id- and -parent- required for flatten, not for unflatten
-        elif arg.startswith("-id-"):
-            kwargs["flatten_id_column"] = _api_column_index(arg.split("-id-")[1], "ID")
-
-        elif arg.startswith("-parent-"):
-            kwargs["flatten_parent_column"] = _api_column_index(arg.split("-parent-")[1], "Parent")
-
-        # optional flags, e.g. -odjr
-        elif arg.startswith("-"):
-            # flags
-            # o overwrite
-            # d detail_columns
-            # j justify_left
-            # r reverse
-            # i add index
-            flags = arg.split("-")[1]
-            for c in flags:
-                if c == "o":
-                    kwargs["overwrite_file"] = True
-                elif c == "d":
-                    kwargs["detail_columns"] = True
-                elif c == "j":
-                    kwargs["justify_left"] = True
-                elif c == "r":
-                    kwargs["reverse"] = True
-                elif c == "i":
-                    kwargs["add_index"] = True
-                else:
-                    break
-
-    if all_parent_column_indexes is None:
-        raise ValueError("Missing required parameter -all-parent-columns-")
-    kwargs["all_parent_column_indexes"] = all_parent_column_indexes
-    return kwargs
-
-
 def run_app(startup_args):
-    if len(startup_args) > 4 and allow_api_use:
-        try:
-            tk_trees_api(**parse_api_argv(startup_args))
-        except Exception as error_msg:
-            try_write_error_log(f"{error_msg}")
-            raise SystemExit(1) from None
+    if is_api_call(startup_args):
+        run_api(startup_args)
     else:
         app = AppGUI(startup_args)
         app.mainloop()
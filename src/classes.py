@@ -4,22 +4,27 @@
 from __future__ import annotations
 
 import contextlib
-import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import zlib
 from collections import defaultdict, deque
-from collections.abc import Generator
+from collections.abc import Generator, Iterable
 from itertools import chain, islice, repeat
 from operator import itemgetter
-from typing import Literal
-
-from openpyxl import load_workbook
+from typing import Any, Literal
 
 from .functions import (
     csv_dialect_from_delim,
-    csv_str_x_data,
     equalize_sublist_lens,
+    get_csv_data_from_file,
     get_json_format,
     get_json_from_file,
     json_to_sheet,
+    load_xlsx,
     shift_elements_to_end,
     shift_elements_to_start,
     to_csv,
@@ -46,6 +51,13 @@ class TreeBuilder:
                 break
             current = nodes[current].ps[h]
 
+    def find_root(self, iid: str, roots: dict[str, str]) -> str:
+        while (parent := roots.get(iid, iid)) != iid:
+            grandparent = roots.get(parent, parent)
+            roots[iid] = grandparent
+            iid = grandparent
+        return iid
+
     def build(
         self,
         input_sheet: list[list[str]],
@@ -73,6 +85,10 @@ class TreeBuilder:
         tally_of_ids = defaultdict(lambda: -1)
         qhsic = sorted(hiers.copy() + [ic])
         qhs = hiers
+        # per hierarchy disjoint sets of linked ids, an id being added is always the
+        # root of its own tree so a parent in the same set would create a loop
+        roots = {h: {} for h in qhs}
+        sizes = {h: defaultdict(lambda: 1) for h in qhs}
         for i, r in enumerate(islice(input_sheet, 0 if not skip_1st else 1, len(input_sheet))):
             rn = f"{i + 2}"
             if len(r) < row_len:
@@ -119,17 +135,22 @@ class TreeBuilder:
                         parent = ""
                         pk = ""
                     elif pk:
-                        for ck in chain(self.check_cn(ik, h, nodes), self.check_ps(ik, h, nodes)):
-                            if pk == ck:
-                                if add_warnings:
-                                    warnings.append(
-                                        f" - Infinite loop of children avoided by setting "
-                                        f"IDs ({ID}) parent ({parent}) to none at row #{rn}"
-                                    )
-                                r[h] = ""
-                                parent = ""
-                                pk = ""
-                                break
+                        ir = self.find_root(ik, roots[h])
+                        pr = self.find_root(pk, roots[h])
+                        if ir == pr:
+                            if add_warnings:
+                                warnings.append(
+                                    f" - Infinite loop of children avoided by setting "
+                                    f"IDs ({ID}) parent ({parent}) to none at row #{rn}"
+                                )
+                            r[h] = ""
+                            parent = ""
+                            pk = ""
+                        else:
+                            if sizes[h][ir] > sizes[h][pr]:
+                                ir, pr = pr, ir
+                            roots[h][ir] = pr
+                            sizes[h][pr] += sizes[h][ir]
                     if pk:
                         if pk not in nodes:
                             nodes[pk] = Node(parent, hiers)
@@ -731,6 +752,47 @@ class SearchResult:
         self.exact = exact
 
 
+class SearchIndex:
+    """
+    Trigram -> row ids index over all cells, only ever added to, results are
+    candidates which must be checked against the sheet so stale entries are harmless
+    """
+
+    __slots__ = ("grams", "ready")
+
+    def __init__(self) -> None:
+        self.grams: dict[str, set[str]] = {}
+        self.ready = False
+
+    def build(self, rows: Iterable[list[str]], ic: int) -> SearchIndex:
+        for row in rows:
+            self.add(row[ic].lower(), row)
+        self.ready = True
+        return self
+
+    def add(self, iid: str, values: Iterable[str]) -> None:
+        grams = self.grams
+        for g in {e[i : i + 3] for e in map(str.lower, values) for i in range(len(e) - 2)}:
+            if g in grams:
+                grams[g].add(iid)
+            else:
+                grams[g] = {iid}
+
+    def candidates(self, term: str) -> set[str] | None:
+        """
+        None if the index can't answer, i.e. not built yet or term too short
+        """
+        if not self.ready or len(term) < 3:
+            return None
+        postings = []
+        for g in {term[i : i + 3] for i in range(len(term) - 2)}:
+            if g not in self.grams:
+                return set()
+            postings.append(self.grams[g])
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+
 class Node:
     __slots__ = ("cn", "name", "ps")
 
@@ -746,6 +808,51 @@ class Node:
         self.ps = ps if ps else dict.fromkeys(hrs)
 
 
+class TreeIndex:
+    """
+    Euler tour of one hierarchy, iid x is under iid a (inclusive) when
+    tin[a] <= tin[x] < tout[a], order[tin[a] + 1 : tout[a]] are a's descendants.
+    Snapshot only, owner compares generation to know if it is stale
+    """
+
+    __slots__ = ("depth", "generation", "order", "tin", "tout")
+
+    def __init__(self, nodes: dict[str, Node], h: int, generation: int = 0) -> None:
+        self.generation = generation
+        self.order: list[str] = []
+        self.tin: dict[str, int] = {}
+        self.tout: dict[str, int] = {}
+        self.depth: dict[str, int] = {}
+        order, tin, tout, depth = self.order, self.tin, self.tout, self.depth
+        # negative depth marks the exit of -depth - 1
+        stack = [(iid, 0) for iid, node in nodes.items() if node.ps[h] == ""]
+        stack.reverse()
+        while stack:
+            iid, d = stack.pop()
+            if d < 0:
+                tout[iid] = len(order)
+                continue
+            tin[iid] = len(order)
+            depth[iid] = d
+            order.append(iid)
+            stack.append((iid, -d - 1))
+            stack.extend((ciid, d + 1) for ciid in reversed(nodes[iid].cn[h]))
+
+    def __contains__(self, iid: str) -> bool:
+        return iid in self.tin
+
+    def is_under(self, iid: str, ancestor: str) -> bool:
+        if iid not in self.tin or ancestor not in self.tin:
+            return False
+        return self.tin[ancestor] <= self.tin[iid] < self.tout[ancestor]
+
+    def descendants(self, iid: str) -> list[str]:
+        return self.order[self.tin[iid] + 1 : self.tout[iid]]
+
+    def level(self, iid: str) -> int:
+        return self.depth[iid] + 1
+
+
 class Header:
     __slots__ = (
         "formatting",
@@ -785,6 +892,661 @@ class Header:
             self.validation = validation
 
 
+class ImportCheck:
+    """
+    Follows IDs, parents and columns through a list of imported changes without
+    touching the sheet, check() gives why a change can't be applied or "" if it can
+    and keeps its effect so later changes are checked against it
+    """
+
+    __slots__ = ("cells", "cn", "cols", "data", "ids", "nodes", "nrows", "ps", "rns", "rows")
+
+    def __init__(
+        self,
+        headers: list[Header],
+        data: list[list[str]],
+        nodes: dict[str, Node],
+        rns: dict[str, int],
+    ) -> None:
+        self.data = data
+        self.nodes = nodes
+        self.rns = rns
+        self.nrows = len(data)
+        # {lowercase name: [type, column in data or None if added by the import, name]}
+        self.cols = {h.name.lower(): [h.type_, i, h.name] for i, h in enumerate(headers)}
+        # changes are kept apart from nodes and data, ids None and rows None once deleted
+        self.ids: dict[str, str | None] = {}
+        self.rows: dict[str, int | None] = {}
+        self.ps: dict[tuple[str, str], str | None] = {}
+        self.cn: dict[tuple[str, str], list[str]] = {}
+        self.cells: dict[tuple[str, str], str] = {}
+
+    def check(self, ctyp: str, change: list[str]) -> str:
+        ctyp = ctyp.removesuffix(" |")
+        try:
+            getattr(self, "_" + ctyp.lower().replace(" + ", " and ").replace(",", "").replace(" ", "_"))(change)
+        except ValueError as error:
+            return f"{error}"
+        except (IndexError, KeyError, AttributeError):
+            return "Change could not be read"
+        return ""
+
+    # state
+
+    def name(self, iid: str) -> str | None:
+        if iid in self.ids:
+            return self.ids[iid]
+        return node.name if (node := self.nodes.get(iid)) else None
+
+    def col(self, name: str, type_: str | None = None) -> list:
+        if (col := self.cols.get(name.lower())) is None:
+            raise ValueError(f"Column {name} doesn't exist")
+        if type_ is not None and col[0] != type_:
+            raise ValueError(f"Column {name} isn't of type {type_}")
+        return col
+
+    def hiers(self) -> list[str]:
+        return [h for h, col in self.cols.items() if col[0] == "Parent"]
+
+    def label(self, h: str) -> str:
+        return self.cols[h][2] if h in self.cols else h
+
+    def parent(self, iid: str, h: str) -> str | None:
+        if (iid, h) in self.ps:
+            return self.ps[(iid, h)]
+        if (c := self.cols[h][1]) is None or iid in self.ids or not (node := self.nodes.get(iid)):
+            return None
+        return node.ps[c]
+
+    def children(self, iid: str, h: str) -> list[str]:
+        if (iid, h) in self.cn:
+            return self.cn[(iid, h)]
+        if (c := self.cols[h][1]) is None or iid in self.ids or not (node := self.nodes.get(iid)):
+            return []
+        return node.cn[c]
+
+    def value(self, iid: str, h: str) -> str:
+        type_, c = self.cols[h]
+        if (iid, h) in self.cells:
+            return self.cells[(iid, h)]
+        if type_ == "ID" and iid in self.ids:
+            return self.ids[iid]
+        if type_ == "Parent" and (iid, h) in self.ps:
+            return self.name(pk) if (pk := self.ps[(iid, h)]) else ""
+        if c is None or (rn := self.rows.get(iid, self.rns.get(iid))) is None:
+            return ""
+        return self.data[rn][c]
+
+    def descendants(self, iid: str, h: str) -> list[str]:
+        found, stack = [], list(self.children(iid, h))
+        while stack:
+            found.append(ciid := stack.pop())
+            stack.extend(self.children(ciid, h))
+        return found
+
+    def is_under(self, iid: str, ancestor: str, h: str) -> bool:
+        while iid:
+            if iid == ancestor:
+                return True
+            iid = self.parent(iid, h)
+        return False
+
+    def set_parent(self, iid: str, h: str, pk: str | None) -> None:
+        if old := self.parent(iid, h):
+            self.cn[(old, h)] = [ciid for ciid in self.children(old, h) if ciid != iid]
+        self.ps[(iid, h)] = pk
+        if pk:
+            self.cn[(pk, h)] = [*self.children(pk, h), iid]
+
+    def move_subtree(self, iid: str, old_h: str, new_h: str, pk: str, cut: bool) -> None:
+        # iid goes under pk in new_h with its descendants, they leave old_h if cut
+        for ciid in self.descendants(iid, old_h):
+            self.ps[(ciid, new_h)] = self.parent(ciid, old_h)
+            self.cn[(ciid, new_h)] = list(self.children(ciid, old_h))
+            if cut:
+                self.ps[(ciid, old_h)], self.cn[(ciid, old_h)] = None, []
+        self.cn[(iid, new_h)] = list(self.children(iid, old_h))
+        if cut:
+            self.cn[(iid, old_h)] = []
+            self.set_parent(iid, old_h, None)
+        self.set_parent(iid, new_h, pk)
+
+    def add_id(self, iid: str, name: str) -> None:
+        self.ids[iid] = name
+        self.rows[iid] = None
+        for h in self.hiers():
+            self.ps[(iid, h)], self.cn[(iid, h)] = None, []
+        self.nrows += 1
+
+    def remove(self, iid: str, h: str, to_parent: bool) -> None:
+        # takes iid out of h, its children go to its parent or become top IDs
+        if (pk := self.parent(iid, h)) is None:
+            return
+        new_pk = pk if to_parent else ""
+        kids = list(self.children(iid, h))
+        for ciid in kids:
+            self.ps[(ciid, h)] = new_pk
+        self.cn[(iid, h)] = []
+        self.set_parent(iid, h, None)
+        if new_pk:
+            self.cn[(new_pk, h)] = [*self.children(new_pk, h), *kids]
+
+    def delete_id(self, iid: str, to_parent: bool = True) -> None:
+        for h in self.hiers():
+            self.remove(iid, h, to_parent)
+        self.ids[iid] = None
+        self.rows[iid] = None
+        self.nrows -= 1
+
+    def delete_if_unused(self, iid: str) -> None:
+        if all(self.parent(iid, h) is None for h in self.hiers()):
+            self.delete_id(iid)
+
+    def rename(self, iid: str, new_name: str) -> None:
+        nik = new_name.lower()
+        if not nik:
+            raise ValueError("New ID is empty")
+        if nik != iid and self.name(nik) is not None:
+            raise ValueError(f"ID {new_name} already exists")
+        for h in self.hiers():
+            pk, kids = self.parent(iid, h), list(self.children(iid, h))
+            if pk:
+                self.cn[(pk, h)] = [nik if ciid == iid else ciid for ciid in self.children(pk, h)]
+            for ciid in kids:
+                self.ps[(ciid, h)] = nik
+            self.ps[(iid, h)], self.cn[(iid, h)] = None, []
+            self.ps[(nik, h)], self.cn[(nik, h)] = pk, kids
+        for key in [key for key in self.cells if key[0] == iid]:
+            self.cells[(nik, key[1])] = self.cells.pop(key)
+        rn = self.rows.get(iid, self.rns.get(iid))
+        self.rows[iid] = None
+        self.rows[nik] = rn
+        self.ids[iid] = None
+        self.ids[nik] = new_name
+
+    # shared checks
+
+    def existing(self, name: str) -> str:
+        if self.name(iid := name.lower()) is None:
+            raise ValueError(f"ID {name} doesn't exist")
+        return iid
+
+    def new_parent(self, text: str, words: list[str], h: str) -> str:
+        if "n/a - Top ID" in text:
+            return ""
+        pk = self.existing(words[2])
+        if self.parent(pk, h) is None:
+            raise ValueError(f"Parent {words[2]} isn't in column {self.label(h)}")
+        return pk
+
+    def old_parent(self, iid: str, text: str, words: list[str], h: str) -> None:
+        pk = self.parent(iid, h)
+        if "n/a - Top ID" in text:
+            if pk != "":
+                raise ValueError(f"ID {self.name(iid)} isn't a top ID in column {self.label(h)}")
+        elif not pk or self.name(pk) != words[2]:
+            raise ValueError(f"ID {self.name(iid)} doesn't have parent {words[2]} in column {self.label(h)}")
+
+    def cut_or_copy(self, change: list[str]) -> tuple[str, str, str, str]:
+        old, new = change[3].split(" "), change[4].split(" ")
+        old_h, new_h = old[-1].lower(), new[-1].lower()
+        self.col(old_h, "Parent")
+        self.col(new_h, "Parent")
+        return self.existing(change[2]), old_h, new_h, self.new_parent(change[4], new, new_h)
+
+    def not_in(self, iids: Iterable[str], h: str) -> None:
+        for iid in iids:
+            if self.parent(iid, h) is not None:
+                raise ValueError(f"ID {self.name(iid)} is already in column {self.label(h)}")
+
+    # changes, named after their change type
+
+    def _edit_cell(self, change: list[str]) -> None:
+        c3s = change[2].split(" ")
+        type_ = c3s[-1] if c3s[-1] != "Detail" else f"{c3s[-2]} {c3s[-1]}"
+        h = c3s[5].lower()
+        self.col(h, type_)
+        iid = self.existing(c3s[1])
+        if self.value(iid, h) != change[3]:
+            raise ValueError(f"Cell no longer has the value {change[3]}")
+        if change[3] == change[4]:
+            return
+        if type_ == "ID":
+            self.rename(iid, change[4])
+        elif type_ == "Parent":
+            if (pk := change[4].lower()) and self.name(pk) is None:
+                self.add_id(pk, change[4])
+                self.ps[(pk, h)] = ""
+            elif pk == iid or (pk and self.is_under(pk, iid, h)):
+                raise ValueError(f"Parent {change[4]} is under ID {c3s[1]} in column {c3s[5]}")
+            self.set_parent(iid, h, pk)
+        else:
+            self.cells[(iid, h)] = change[4]
+
+    def _move_rows(self, change: list[str]) -> None:
+        old, new = change[3].split(","), change[4].split(",")
+        if len(old) != len(new):
+            raise ValueError("Row numbers don't match")
+        if len(old) == 1:
+            old, new = [old[0].split("Old locations: ")[1]], [new[0].split("New locations: ")[1]]
+        if not all(0 <= int(r) <= self.nrows for r in chain(old, new)):
+            raise ValueError("Row numbers are outside the sheet")
+
+    def _move_columns(self, change: list[str]) -> None:
+        new = change[4].split(",")
+        if len(new) == 1:
+            new = [new[0].split("New locations: ")[1]]
+        if max(map(int, new)) >= len(self.cols):
+            raise ValueError("Column numbers are outside the sheet")
+
+    def add_col(self, name: str, colnum: str, type_: str) -> None:
+        if name.lower() in self.cols:
+            raise ValueError(f"Column {name} already exists")
+        if not 0 <= int(colnum[1:]) - 1 <= len(self.cols):
+            raise ValueError("Column number is outside the sheet")
+        self.cols[name.lower()] = [Header(name, type_).type_, None, name]
+
+    def _add_new_hierarchy_column(self, change: list[str]) -> None:
+        c3s = change[2].split(" ")
+        self.add_col(c3s[-1].strip(), c3s[1], "Parent")
+
+    def _add_new_detail_column(self, change: list[str]) -> None:
+        c3s = change[2].split(" ")
+        self.add_col(c3s[4].strip(), c3s[1], f"{c3s[-2]} {c3s[-1]}")
+
+    def _delete_hierarchy_column(self, change: list[str]) -> None:
+        h = change[2].split(" ")[-1].lower()
+        self.col(h, "Parent")
+        if len(self.hiers()) < 2:
+            raise ValueError("The only hierarchy column can't be deleted")
+        del self.cols[h]
+
+    def _delete_detail_column(self, change: list[str]) -> None:
+        name = change[2].split(" ")[4]
+        if self.col(name)[0] not in ("Text", "Number", "Date"):
+            raise ValueError(f"Column {name} isn't a detail column")
+        del self.cols[name.lower()]
+
+    def _column_rename(self, change: list[str]) -> None:
+        old, new = change[3].lower(), "".join(change[4].split(" ")).strip()
+        self.col(old, change[2].split(" ")[-1])
+        if new.lower() in self.cols:
+            raise ValueError(f"Column {new} already exists")
+        self.cols[new.lower()] = self.cols.pop(old)
+        self.cols[new.lower()][2] = new
+        for overlay in (self.ps, self.cn, self.cells):
+            for key in [key for key in overlay if key[1] == old]:
+                overlay[(key[0], new.lower())] = overlay.pop(key)
+
+    def _edit_validation(self, change: list[str]) -> None:
+        self.col(change[2].split(" ")[3])
+
+    def _change_detail_column_type(self, change: list[str]) -> None:
+        name = change[2].split(" ")[-1]
+        col = self.col(name, change[3])
+        if change[4] not in ("Text", "Number", "Date"):
+            raise ValueError(f"Type {change[4]} isn't a detail column type")
+        col[0] = change[4]
+
+    def _date_format_change(self, change: list[str]) -> None:
+        pass
+
+    def _cut_and_paste_id(self, change: list[str]) -> None:
+        iid, old_h, new_h, pk = self.cut_or_copy(change)
+        self.old_parent(iid, change[3], change[3].split(" "), old_h)
+        if pk == iid:
+            raise ValueError(f"ID {change[2]} can't be its own parent")
+        if old_h != new_h:
+            self.not_in((iid,), new_h)
+        elif self.parent(iid, new_h) == pk:
+            raise ValueError(f"ID {change[2]} already has this parent")
+        self.remove(iid, old_h, to_parent=True)
+        self.set_parent(iid, new_h, pk)
+
+    def _cut_and_paste_id_and_children(self, change: list[str]) -> None:
+        iid, old_h, new_h, pk = self.cut_or_copy(change)
+        self.old_parent(iid, change[3], change[3].split(" "), old_h)
+        if old_h != new_h:
+            self.not_in(chain((iid,), self.descendants(iid, old_h)), new_h)
+            self.move_subtree(iid, old_h, new_h, pk, cut=True)
+        elif self.parent(iid, new_h) == pk:
+            raise ValueError(f"ID {change[2]} already has this parent")
+        elif pk and self.is_under(pk, iid, new_h):
+            raise ValueError(f"Parent {self.name(pk)} is under ID {change[2]} in column {self.label(new_h)}")
+        else:
+            self.set_parent(iid, new_h, pk)
+
+    def _cut_and_paste_children(self, change: list[str]) -> None:
+        old, new = change[3].split(" "), change[4].split(" ")
+        old_h, new_h = old[-1].lower(), new[-1].lower()
+        self.col(old_h, "Parent")
+        self.col(new_h, "Parent")
+        pk = self.new_parent(change[3], old, old_h)
+        npk = self.new_parent(change[4], new, new_h)
+        if not (kids := list(self.children(pk, old_h))):
+            raise ValueError(f"ID {old[2]} has no children in column {self.label(old_h)}")
+        if old_h == new_h:
+            if pk == npk or (npk and self.is_under(npk, pk, new_h)):
+                raise ValueError(f"Children of {old[2]} can't be moved under {self.name(npk) or 'the top'}")
+            for ciid in kids:
+                self.set_parent(ciid, new_h, npk)
+            return
+        movable = [
+            ciid
+            for ciid in kids
+            if all(self.parent(diid, new_h) is None for diid in chain((ciid,), self.descendants(ciid, old_h)))
+        ]
+        if not movable:
+            raise ValueError(f"Children of {old[2]} are already in column {self.label(new_h)}")
+        for ciid in movable:
+            self.move_subtree(ciid, old_h, new_h, npk, cut=True)
+
+    def _copy_and_paste_id(self, change: list[str]) -> None:
+        iid, old_h, new_h, pk = self.cut_or_copy(change)
+        if old_h == new_h:
+            raise ValueError(f"ID {change[2]} is already in column {self.label(new_h)}")
+        self.not_in((iid,), new_h)
+        self.set_parent(iid, new_h, pk)
+
+    def _copy_and_paste_id_and_children(self, change: list[str]) -> None:
+        iid, old_h, new_h, pk = self.cut_or_copy(change)
+        if old_h == new_h:
+            raise ValueError(f"ID {change[2]} is already in column {self.label(new_h)}")
+        self.not_in(chain((iid,), self.descendants(iid, old_h)), new_h)
+        self.move_subtree(iid, old_h, new_h, pk, cut=False)
+
+    def _add_id(self, change: list[str]) -> None:
+        new = change[2].split(" ")
+        h = new[-1].lower()
+        self.col(h, "Parent")
+        pk = "" if "n/a - Top ID" in change[2] else self.existing(new[3])
+        if pk and self.parent(pk, h) is None:
+            raise ValueError(f"Parent {new[3]} isn't in column {self.label(h)}")
+        iid = new[1].lower()
+        if self.name(iid) is None:
+            self.add_id(iid, new[1])
+        else:
+            self.not_in((iid,), h)
+        self.set_parent(iid, h, pk)
+
+    def _rename_id(self, change: list[str]) -> None:
+        self.rename(self.existing(change[3]), change[4])
+
+    def deleted(self, change: list[str]) -> tuple[str, str]:
+        info = change[2].split(" ")
+        h = info[-1].lower()
+        self.col(h, "Parent")
+        iid = self.existing(info[1])
+        if self.parent(iid, h) is None:
+            raise ValueError(f"ID {info[1]} isn't in column {self.label(h)}")
+        self.old_parent(iid, change[2], info[1:], h)
+        return iid, h
+
+    def _delete_id(self, change: list[str]) -> None:
+        iid, h = self.deleted(change)
+        self.remove(iid, h, to_parent=True)
+        self.delete_if_unused(iid)
+
+    def _delete_id_orphan_children(self, change: list[str]) -> None:
+        iid, h = self.deleted(change)
+        self.remove(iid, h, to_parent=False)
+        self.delete_if_unused(iid)
+
+    def _delete_id_and_all_children(self, change: list[str]) -> None:
+        iid, h = self.deleted(change)
+        subtree = [iid, *self.descendants(iid, h)]
+        for diid in reversed(subtree):
+            self.remove(diid, h, to_parent=True)
+            self.delete_if_unused(diid)
+
+    def _delete_id_and_all_children_from_all_hierarchies(self, change: list[str]) -> None:
+        iid, h = self.deleted(change)
+        for diid in reversed([iid, *self.descendants(iid, h)]):
+            self.delete_id(diid)
+
+    def _delete_id_from_all_hierarchies(self, change: list[str]) -> None:
+        self.delete_id(self.existing(change[2]))
+
+    def _delete_id_from_all_hierarchies_orphan_children(self, change: list[str]) -> None:
+        self.delete_id(self.existing(change[2]), to_parent=False)
+
+    def _sort_sheet(self, change: list[str]) -> None:
+        if change[2] == "Sorted sheet in tree walk order":
+            if not self.nrows:
+                raise ValueError("The sheet is empty")
+            return
+        c3s = change[2].split(" ")
+        self.col(c3s[6])
+        if c3s[8] not in ("ASCENDING", "DESCENDING"):
+            raise ValueError(f"Sort order {c3s[8]} isn't known")
+
+
+class UndoHistory:
+    """
+    Bounded by bytes rather than a count, the newest entries are kept as they are,
+    older entries are pickled and compressed and once over mem_limit the oldest of
+    those are appended to a temporary file, over disk_limit the oldest are dropped
+    """
+
+    __slots__ = ("disk_bytes", "disk_limit", "entries", "file", "keep_live", "mem_bytes", "mem_limit")
+
+    def __init__(self, mem_limit: int = 256 * 1024**2, disk_limit: int | None = None, keep_live: int = 1) -> None:
+        self.mem_limit = mem_limit
+        self.disk_limit = mem_limit * 8 if disk_limit is None else disk_limit
+        self.keep_live = keep_live
+        # [state, payload] state 0 live entry, 1 compressed bytes, 2 (offset, length) in file
+        self.entries: list[list] = []
+        self.file = None
+        self.mem_bytes = 0
+        self.disk_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def __getitem__(self, idx: int) -> dict:
+        item = self.entries[idx]
+        if item[0]:
+            item[1] = self.load(item)
+            item[0] = 0
+        return item[1]
+
+    def append(self, entry: dict) -> None:
+        self.entries.append([0, entry])
+        for item in islice(reversed(self.entries), self.keep_live, None):
+            if not item[0]:
+                self.seal(item)
+            else:
+                break
+        self.trim()
+
+    def pop(self) -> dict:
+        item = self.entries.pop()
+        return self.load(item) if item[0] else item[1]
+
+    def clear(self) -> None:
+        self.entries = []
+        self.mem_bytes = 0
+        self.disk_bytes = 0
+        self.close()
+
+    def close(self) -> None:
+        # the spill file lives as long as the history, the owner calls this when done with it
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def seal(self, item: list) -> None:
+        try:
+            item[1] = zlib.compress(pickle.dumps(item[1], protocol=pickle.HIGHEST_PROTOCOL), 1)
+        except Exception:
+            return
+        item[0] = 1
+        self.mem_bytes += len(item[1])
+
+    def load(self, item: list) -> dict:
+        if item[0] == 1:
+            self.mem_bytes -= len(item[1])
+            return pickle.loads(zlib.decompress(item[1]))
+        offset, length = item[1]
+        self.disk_bytes -= length
+        self.file.seek(offset)
+        data = self.file.read(length)
+        # reclaim the end of the file if this was the last entry written to it
+        if not self.disk_bytes:
+            self.file.truncate(0)
+        elif offset + length == self.file.seek(0, 2):
+            self.file.truncate(offset)
+        return pickle.loads(zlib.decompress(data))
+
+    def trim(self) -> None:
+        for item in self.entries:
+            if self.mem_bytes <= self.mem_limit:
+                break
+            if item[0] == 1:
+                self.spill(item)
+        while self.entries and (self.mem_bytes > self.mem_limit or self.disk_bytes > self.disk_limit):
+            item = self.entries[0]
+            if not item[0]:
+                break
+            del self.entries[0]
+            if item[0] == 1:
+                self.mem_bytes -= len(item[1])
+            else:
+                self.disk_bytes -= item[1][1]
+                if not self.disk_bytes:
+                    self.file.truncate(0)
+
+    def spill(self, item: list) -> None:
+        try:
+            if self.file is None:
+                self.file = tempfile.TemporaryFile()  # noqa: SIM115 closed by close()
+            offset = self.file.seek(0, 2)
+            # dropped entries leave holes at the start of the file
+            if offset > self.disk_bytes * 2 + self.disk_limit:
+                offset = self.compact_file()
+            self.file.write(item[1])
+        except Exception:
+            return
+        length = len(item[1])
+        self.mem_bytes -= length
+        self.disk_bytes += length
+        item[0] = 2
+        item[1] = (offset, length)
+
+    def compact_file(self) -> int:
+        new = tempfile.TemporaryFile()  # noqa: SIM115 becomes self.file, closed by close()
+        for item in self.entries:
+            if item[0] == 2:
+                self.file.seek(item[1][0])
+                offset = new.tell()
+                new.write(self.file.read(item[1][1]))
+                item[1] = (offset, item[1][1])
+        self.file.close()
+        self.file = new
+        return new.tell()
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class ProjectFile:
+    """
+    .tktrees container, a header, a table of sections then the sections themselves,
+    each one zlib compressed json. The file is memory mapped and a section is only
+    decompressed when it's asked for
+
+    header: magic, version, number of sections
+    table entry: name length, name, offset, compressed size
+    """
+
+    __slots__ = ("decoded", "mm", "table")
+
+    magic = b"TKTREES\0"
+    version = 1
+    header = struct.Struct("<8sHH")
+    entry = struct.Struct("<QQ")
+    # program data keys with their own section, everything else goes in "view"
+    sections = ("records", "nodes", "headers", "changelog")
+
+    def __init__(self, filepath: str) -> None:
+        self.decoded = {}
+        # the map keeps its own handle so the file itself is closed straight away
+        with open(filepath, "rb") as fh:
+            self.mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, num = self.header.unpack_from(self.mm, 0)
+            if magic != self.magic:
+                raise ValueError("File is not a .tktrees project")
+            if version > self.version:
+                raise ValueError(f"File was saved by a newer version (format {version})")
+            self.table = {}
+            pos = self.header.size
+            for _ in range(num):
+                n = self.mm[pos]
+                name = self.mm[pos + 1 : pos + 1 + n].decode()
+                pos += 1 + n
+                self.table[name] = self.entry.unpack_from(self.mm, pos)
+                pos += self.entry.size
+        except Exception:
+            self.close()
+            raise
+
+    @classmethod
+    def write(cls, filepath: str, program_data: dict) -> None:
+        view = {k: v for k, v in program_data.items() if k not in cls.sections}
+        blobs = {name: program_data[name] for name in cls.sections if name in program_data} | {"view": view}
+        blobs = {name: zlib.compress(json.dumps(obj).encode(), 1) for name, obj in blobs.items()}
+        names = [name.encode() for name in blobs]
+        offset = cls.header.size + sum(1 + len(n) + cls.entry.size for n in names)
+        # written beside the target and swapped in so a failed save leaves the old file intact
+        tmp = f"{filepath}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(cls.header.pack(cls.magic, cls.version, len(blobs)))
+            for n, blob in zip(names, blobs.values()):
+                fh.write(bytes((len(n),)) + n + cls.entry.pack(offset, len(blob)))
+                offset += len(blob)
+            for blob in blobs.values():
+                fh.write(blob)
+        os.replace(tmp, filepath)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.table
+
+    def section(self, name: str) -> Any:
+        if name not in self.decoded:
+            offset, size = self.table[name]
+            self.decoded[name] = json.loads(zlib.decompress(self.mm[offset : offset + size]))
+        return self.decoded[name]
+
+    def program_data(self, skip: Iterable[str] = ("changelog",)) -> dict:
+        # what populate() needs, skipped sections are left empty to be read later
+        from tksheet import DotDict
+
+        d = DotDict(self.section("view"))
+        for name in self.sections:
+            if name in skip:
+                d[name] = []
+            elif name in self:
+                d[name] = self.section(name)
+        return d
+
+    def close(self) -> None:
+        self.decoded = {}
+        if getattr(self, "mm", None) is not None:
+            self.mm.close()
+            self.mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
 # t = type, deleted (1) or changed (0)
 class RowStorage:
     __slots__ = ("row", "t")
@@ -794,6 +1556,39 @@ class RowStorage:
         self.row = r
 
 
+def api_load_sheet(filepath: str, sheet_name: str | int = 0) -> tuple[list[list[str]], tuple[int, str], str | int]:
+    # returns (sheet, json format, sheet name), the json format is (1, "records")
+    # for other file types and an xlsx sheet index is returned as its name
+    if not filepath.lower().endswith((".xlsx", ".xls", ".xlsm", ".csv", ".tsv", ".json")):
+        raise Exception("Input file must be .xlsx / .xls / .xlsm / .csv / .tsv")
+
+    json_format = (1, "records")
+    sheet = []
+    if filepath.lower().endswith((".csv", ".tsv")):
+        sheet = get_csv_data_from_file(filepath)
+
+    elif filepath.lower().endswith((".xlsx", ".xls", ".xlsm")):
+        wb = load_xlsx(filepath)
+        if isinstance(sheet_name, int):
+            sheet_name = wb.sheetnames[sheet_name]
+        ws = wb[sheet_name]
+        ws.reset_dimensions()
+        sheet = ws_x_data(ws)
+        wb.close()
+
+    elif filepath.lower().endswith(".json"):
+        j = get_json_from_file(filepath)
+        if not (json_format := get_json_format(j)):
+            raise Exception("Invalid json file")
+        sheet = json_to_sheet(
+            j,
+            format_=json_format[0],
+            key=json_format[1],
+            get_format=False,
+        )
+    return sheet, json_format, sheet_name
+
+
 def tk_trees_api(
     api_action: Literal["flatten", "unflatten-top-base", "unflatten-base-top"],
     input_filepath: str,
@@ -815,42 +1610,9 @@ def tk_trees_api(
 
         overwrite_file = "w" if overwrite_file else "x"
 
-        sheet = []
-        row_len = 0
-
         # ___________ LOAD FILE AND DATA ___________________
 
-        if not input_filepath.lower().endswith((".xlsx", ".xls", ".xlsm", ".csv", ".tsv", ".json")):
-            raise Exception("Input file must be .xlsx / .xls / .xlsm / .csv / .tsv")
-
-        json_format = (1, "records")
-        if input_filepath.lower().endswith((".csv", ".tsv")):
-            with open(input_filepath, "r") as fh:
-                temp_data = fh.read()
-            sheet = csv_str_x_data(temp_data)
-
-        elif input_filepath.lower().endswith((".xlsx", ".xls", ".xlsm")):
-            with open(input_filepath, "rb") as fh:
-                in_mem = io.BytesIO(fh.read())
-            wb = load_workbook(in_mem, read_only=True, data_only=True)
-            if isinstance(input_sheet, int):
-                input_sheet = wb.sheetnames[input_sheet]
-            ws = wb[input_sheet]
-            ws.reset_dimensions()
-            sheet = ws_x_data(ws)
-            wb.close()
-
-        elif input_filepath.lower().endswith(".json"):
-            j = get_json_from_file(input_filepath)
-            if not (json_format := get_json_format(j)):
-                raise Exception("Invalid json file")
-            sheet = json_to_sheet(
-                j,
-                format_=json_format[0],
-                key=json_format[1],
-                get_format=False,
-            )
-
+        sheet, json_format, input_sheet = api_load_sheet(input_filepath, input_sheet)
         row_len = max(map(len, sheet), default=0)
 
         if api_action == "flatten":
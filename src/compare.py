@@ -0,0 +1,822 @@
+# SPDX-License-Identifier: AGPL-3.0-only
+# Copyright (c) R. A. Gardner
+
+from __future__ import annotations
+
+import csv
+import gc
+import multiprocessing
+import os
+from collections import defaultdict
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from hashlib import blake2b
+from itertools import repeat
+from typing import Any, Literal, NamedTuple
+
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from .classes import TreeBuilder, api_load_sheet
+from .constants import blue_fill, green_fill
+from .functions import csv_dialect_from_delim, sort_key, try_write_error_log, write_json, xlsx_string_sheet
+
+# below this many cells in total both sheets are built in the calling thread,
+# starting worker processes and pickling the sheets costs more than it saves
+parallel_build_min_cells = 2_000_000
+
+DIFF_SECTION = "Differences in Parents/Details of Matched IDs"
+
+
+class CompareSide(NamedTuple):
+    """
+    One sheet after building its tree, only what the comparison needs
+    ids: IDs in sheet order, rows added for IDs only found as parents included
+    names: the tree's name for each ID, the first spelling seen
+    order: positions in ids in the order the IDs were first seen
+    parents: {parent column: parent per ID aligned with names}, a parent is the
+    lowercase ID key, "" for a top ID or None if not in that hierarchy
+    details: {detail column: cell per ID aligned with names}
+    trees: only for structural comparisons, {parent column: (preorder, ends, digests)}
+    where preorder holds positions in ids, the subtree of preorder[i] is
+    preorder[i:ends[i]] and digests, aligned with ids, hash each ID's subtree
+    """
+
+    warnings: list[str]
+    ids: list[str]
+    names: list[str]
+    order: list[int]
+    parents: dict[int, list[str | None]]
+    details: dict[int, list[str]]
+    trees: dict[int, tuple[list[int], list[int], list[int | None]]]
+
+
+class Difference(NamedTuple):
+    # a parent or detail cell of a matched ID which differs, values are as stored
+    # in CompareSide, formatting is done when the report is made. moved is the
+    # number of IDs in a branch whose parent differs but whose subtree does not
+    ID: str
+    detail: bool
+    column: str
+    value1: str | None
+    value2: str | None
+    moved: int = 0
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    # building and comparing trees allocates millions of small objects none of
+    # which are cyclic garbage, collection passes during it only cost time
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def heads_comparison(heads: list[str], row_len: int) -> tuple[list[str], list[str]]:
+    # fills in missing and renames duplicate headers, returns (headers, warnings)
+    warnings = []
+    if len(heads) < row_len:
+        heads += list(repeat("", row_len - len(heads)))
+    tally_of_heads = defaultdict(lambda: -1)
+    for coln in range(len(heads)):
+        cell = heads[coln]
+        if not cell:
+            cell = f"MISSING_{coln + 1}"
+            warnings.append(f" - Missing header in column #{coln + 1}")
+        hk = cell.lower()
+        tally_of_heads[hk] += 1
+        if tally_of_heads[hk] > 0:
+            orig = cell
+            x = 1
+            while hk in tally_of_heads:
+                cell = f"{orig}_DUPLICATED_{x}"
+                hk = cell.lower()
+                x += 1
+            tally_of_heads[hk] += 1
+            warnings.append(f" - Duplicate header in column #{coln + 1}")
+        heads[coln] = cell
+    return heads, warnings
+
+
+def subtree_digests(
+    ordered: list, h: int, rns: dict[str, int], own: list[int]
+) -> tuple[list[int], list[int], list[int | None]]:
+    # merkle hash per subtree from each ID's own digest, a leaf's digest is its
+    # own. children are sorted by digest because sibling order is not compared.
+    # hash() of a tuple of ints is not salted so both processes agree
+    kids = [[rns[ck] for ck in node.cn[h]] for node in ordered]
+    preorder = []
+    stack = [r for r, node in enumerate(ordered) if node.ps[h] == ""]
+    while stack:
+        r = stack.pop()
+        preorder.append(r)
+        stack.extend(kids[r])
+    digests = [None] * len(ordered)
+    sizes = [1] * len(ordered)
+    for r in reversed(preorder):
+        if ks := kids[r]:
+            digests[r] = hash((own[r], *sorted([digests[k] for k in ks])))
+            sizes[r] += sum([sizes[k] for k in ks])
+        else:
+            digests[r] = own[r]
+    return preorder, [i + sizes[r] for i, r in enumerate(preorder)], digests
+
+
+@gc_paused()
+def build_compare_side(
+    data: list[list[str]],
+    row_len: int,
+    ic: int,
+    hiers: list[int],
+    warnings: list[str],
+    parent_cols: list[int],
+    detail_cols: list[int],
+    structural: bool = False,
+) -> CompareSide:
+    # runs in a worker process for large sheets so everything here has to pickle,
+    # the build changes its input so it gets copies, as it would in a worker process
+    sheet, nodes, warnings, rns = TreeBuilder().build(
+        input_sheet=[row.copy() for row in data],
+        output_sheet=[],
+        row_len=row_len,
+        ic=ic,
+        hiers=hiers,
+        nodes={},
+        warnings=warnings.copy(),
+        rns={},
+        add_warnings=True,
+        skip_1st=True,
+        compare=True,
+        fix_associate=True,
+        strip=False,
+    )
+    ids = [r[ic] for r in sheet]
+    ordered = [nodes[ID.lower()] for ID in ids]
+    trees = {}
+    if structural:
+        # an ID's own part of the hash, details compare case insensitively
+        own = [
+            int.from_bytes(
+                blake2b(
+                    "\x1f".join([r[ic].lower()] + [r[c].lower() for c in detail_cols]).encode("utf-8", "surrogatepass"),
+                    digest_size=8,
+                ).digest(),
+                "little",
+                signed=True,
+            )
+            for r in sheet
+        ]
+        trees = {h: subtree_digests(ordered, h, rns, own) for h in parent_cols}
+    return CompareSide(
+        warnings=warnings,
+        ids=ids,
+        names=[node.name for node in ordered],
+        order=[rns[ik] for ik in nodes],
+        parents={h: [node.ps[h] for node in ordered] for h in parent_cols},
+        details={c: [r[c] for r in sheet] for c in detail_cols},
+        trees=trees,
+    )
+
+
+class ReportSection(NamedTuple):
+    # kind is "new_ids" or "differences" for sections an ID can be found in
+    title: str
+    count: int
+    row: Callable[[int], list]
+    kind: str = ""
+
+
+def list_section(title: str, rows: list[list]) -> ReportSection:
+    return ReportSection(title, len(rows), rows.__getitem__)
+
+
+def column_section(title: str, values: list[str], kind: str = "") -> ReportSection:
+    return ReportSection(title, len(values), lambda i: [values[i]], kind)
+
+
+class CompareResult:
+    """
+    Structured result of compare_sheets(), section_table() lays it out as the
+    sections of the comparison report with rows made on demand, sections()
+    yields (title, rows) for each of them for writing the report
+    """
+
+    def __init__(self, filename_1: str, filename_2: str, sheetname_1: str, sheetname_2: str) -> None:
+        self.header = f"Comparison report for:  {filename_1}  and  {filename_2}"
+        self.sheetname_1 = sheetname_1
+        self.sheetname_2 = sheetname_2
+        self.warnings1: list[str] = []
+        self.warnings2: list[str] = []
+        self.id_col_indexes: tuple[int, int] | None = None
+        self.id_col_names: tuple[str, str] | None = None
+        self.matching_parent_cols = False
+        self.new_parent_cols1: list[str] = []
+        self.new_parent_cols2: list[str] = []
+        self.parent_col_indexes: list[tuple[str, int, int]] = []
+        self.matching_detail_cols = False
+        self.new_detail_cols1: list[str] = []
+        self.new_detail_cols2: list[str] = []
+        self.detail_col_indexes: list[tuple[str, int, int]] = []
+        self.matching_ids = False
+        self.new_ids1: list[str] = []
+        self.new_ids2: list[str] = []
+        self.differences: list[Difference] = []
+        # lowercase ID key to ID name for each sheet, for showing parents
+        self.names1: dict[str, str] = {}
+        self.names2: dict[str, str] = {}
+        # matched column names, for filtering the report
+        self.parent_columns: list[str] = []
+        self.detail_columns: list[str] = []
+        self._table = None
+
+    @property
+    def identical(self) -> bool:
+        return not self.section_table()
+
+    @property
+    def report_header(self) -> str:
+        return f"{self.header} - Sheets are identical" if self.identical else self.header
+
+    def parent_name(self, pk: str | None, names: dict[str, str]) -> str:
+        if pk is None:
+            return "Not present"
+        if pk == "":
+            return "Appears as top ID"
+        return names[pk]
+
+    def difference_row(self, d: Difference) -> list[str]:
+        if d.detail:
+            return [d.ID, f"Details in column: {d.column}", d.value1, d.value2]
+        p1 = self.parent_name(d.value1, self.names1)
+        p2 = self.parent_name(d.value2, self.names2)
+        if d.moved:
+            return [d.ID, f"Branch moved in hierarchy: {d.column} ({d.moved} IDs)", p1, p2]
+        if d.value1 is None:
+            return [d.ID, f"Present in hierarchy: {d.column} in {self.sheetname_2} and not {self.sheetname_1}", p1, p2]
+        if d.value2 is None:
+            return [d.ID, f"Present in hierarchy: {d.column} in {self.sheetname_1} and not {self.sheetname_2}", p1, p2]
+        return [d.ID, f"Parents in hierarchy: {d.column}", p1, p2]
+
+    def section_table(self) -> list[ReportSection]:
+        # each section which has anything to show, rows are made when asked for
+        if self._table is not None:
+            return self._table
+        s1, s2 = self.sheetname_1, self.sheetname_2
+        table = []
+        if self.warnings1:
+            table.append(column_section(f"Warnings {s1}:", self.warnings1))
+        if self.warnings2:
+            table.append(column_section(f"Warnings {s2}:", self.warnings2))
+        if self.id_col_indexes:
+            table.append(
+                list_section("Difference in ID Column Index", [[s1, s2], [f"{i + 1}" for i in self.id_col_indexes]])
+            )
+        if self.id_col_names:
+            table.append(list_section("Difference in ID Column Name", [[s1, s2], list(self.id_col_names)]))
+        if self.matching_parent_cols:
+            if self.new_parent_cols1:
+                table.append(column_section(f"New Parent Columns {s1}", self.new_parent_cols1))
+            if self.new_parent_cols2:
+                table.append(column_section(f"New Parent Columns {s2}", self.new_parent_cols2))
+            if self.parent_col_indexes:
+                table.append(
+                    list_section(
+                        "Differences in Parent Column Indexes",
+                        [["NAME", s1, s2]] + [list(t) for t in self.parent_col_indexes],
+                    )
+                )
+        else:
+            table.append(list_section("Parent Columns", [["Sheets have no matching parent column names."]]))
+        if self.matching_detail_cols:
+            if self.new_detail_cols1:
+                table.append(column_section(f"New Detail Columns {s1}", self.new_detail_cols1))
+            if self.new_detail_cols2:
+                table.append(column_section(f"New Detail Columns {s2}", self.new_detail_cols2))
+            if self.detail_col_indexes:
+                table.append(
+                    list_section(
+                        "Differences in Detail Column Indexes",
+                        [["NAME", s1, s2]] + [list(t) for t in self.detail_col_indexes],
+                    )
+                )
+        else:
+            table.append(list_section("Detail Columns", [["Sheets have no matching detail column names."]]))
+        if not self.matching_ids:
+            table.append(list_section("IDs", [["Sheets have no matching IDs"]]))
+        else:
+            if self.new_ids1:
+                table.append(column_section(f"New IDs {s1}", self.new_ids1, "new_ids"))
+            if self.new_ids2:
+                table.append(column_section(f"New IDs {s2}", self.new_ids2, "new_ids"))
+            if self.differences:
+                header = ["ID", "DIFFERENCE", s1, s2]
+                differences = self.differences
+                table.append(
+                    ReportSection(
+                        DIFF_SECTION,
+                        len(differences) + 1,
+                        lambda i: self.difference_row(differences[i - 1]) if i else header.copy(),
+                        "differences",
+                    )
+                )
+        self._table = table
+        return table
+
+    def sections(self) -> Iterator[tuple[str, Iterator[list]]]:
+        # (section title, rows) for each section which has anything to show
+        for section in self.section_table():
+            yield section.title, map(section.row, range(section.count))
+
+
+def build_sides(
+    data1: list[list[str]],
+    data2: list[list[str]],
+    args1: tuple,
+    args2: tuple,
+    task: Any = None,
+    parallel: bool | None = None,
+) -> tuple[CompareSide, CompareSide]:
+    if parallel is None:
+        parallel = (
+            available_cpus() > 1 and (len(data1) + len(data2)) * max(args1[0], args2[0], 1) >= parallel_build_min_cells
+        )
+    if parallel:
+        try:
+            return _build_sides_in_processes(data1, data2, args1, args2, task)
+        except Exception:
+            # e.g. no process support, fall back to building them here
+            if task is not None:
+                task.check_cancelled()
+    side1 = build_compare_side(data1, *args1)
+    if task is not None:
+        task.check_cancelled()
+    side2 = build_compare_side(data2, *args2)
+    if task is not None:
+        task.check_cancelled()
+    return side1, side2
+
+
+def _build_sides_in_processes(
+    data1: list[list[str]],
+    data2: list[list[str]],
+    args1: tuple,
+    args2: tuple,
+    task: Any = None,
+) -> tuple[CompareSide, CompareSide]:
+    # spawn because the caller is usually a thread of a running Tk app
+    pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures: list[Future] = [
+            pool.submit(build_compare_side, data1, *args1),
+            pool.submit(build_compare_side, data2, *args2),
+        ]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if task is not None:
+                task.check_cancelled()
+        return futures[0].result(), futures[1].result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@gc_paused()
+def compare_sheets(
+    data1: list[list[str]],
+    data2: list[list[str]],
+    ic1: int,
+    ic2: int,
+    parent_cols1: list[int],
+    parent_cols2: list[int],
+    filename_1: str = "",
+    filename_2: str = "",
+    sheetname_1: str = "",
+    sheetname_2: str = "",
+    task: Any = None,
+    parallel: bool | None = None,
+    structural: bool = False,
+) -> CompareResult:
+    """
+    data1 and data2 include their header rows, parent columns are matched by
+    header name, IDs case insensitively. task is optional and only needs
+    progress(text) and check_cancelled().
+    structural hashes every subtree so identical branches are skipped and a
+    branch moved without other changes is one difference with its size
+    """
+    result = CompareResult(filename_1, filename_2, sheetname_1, sheetname_2)
+    row_len1 = max(map(len, data1), default=0)
+    row_len2 = max(map(len, data2), default=0)
+    heads1, result.warnings1 = heads_comparison(data1[0].copy() if data1 else [], row_len1)
+    heads2, result.warnings2 = heads_comparison(data2[0].copy() if data2 else [], row_len2)
+
+    parcolset1 = set(parent_cols1)
+    parcolset2 = set(parent_cols2)
+    ic_parcolset1 = {ic1} | parcolset1
+    ic_parcolset2 = {ic2} | parcolset2
+    pcold = defaultdict(list)
+    for i, h in enumerate(heads1):
+        if i in parcolset1:
+            pcold[h].append(i)
+    for i, h in enumerate(heads2):
+        if i in parcolset2:
+            pcold[h].append(i)
+    detcold = defaultdict(list)
+    for i, h in enumerate(heads1):
+        if i not in ic_parcolset1:
+            detcold[h].append(i)
+    for i, h in enumerate(heads2):
+        if i not in ic_parcolset2:
+            detcold[h].append(i)
+    matching_hrs_names = sorted((k for k, v in pcold.items() if len(v) > 1), key=sort_key)
+    matching_details_names = sorted((k for k, v in detcold.items() if len(v) > 1), key=sort_key)
+
+    if task is not None:
+        task.progress("Building trees...")
+    side1, side2 = build_sides(
+        data1,
+        data2,
+        (
+            row_len1,
+            ic1,
+            list(parent_cols1),
+            result.warnings1,
+            [pcold[nx][0] for nx in matching_hrs_names],
+            [detcold[nx][0] for nx in matching_details_names],
+            structural,
+        ),
+        (
+            row_len2,
+            ic2,
+            list(parent_cols2),
+            result.warnings2,
+            [pcold[nx][1] for nx in matching_hrs_names],
+            [detcold[nx][1] for nx in matching_details_names],
+            structural,
+        ),
+        task=task,
+        parallel=parallel,
+    )
+    result.warnings1, result.warnings2 = side1.warnings, side2.warnings
+    result.parent_columns = matching_hrs_names
+    result.detail_columns = matching_details_names
+    if task is not None:
+        task.progress("Comparing...")
+
+    if ic1 != ic2:
+        result.id_col_indexes = (ic1, ic2)
+    if heads1[ic1] != heads2[ic2]:
+        result.id_col_names = (heads1[ic1], heads2[ic2])
+
+    if matching_hrs_names:
+        result.matching_parent_cols = True
+        hdset1 = {h for i, h in enumerate(heads1) if i in parcolset1}
+        hdset2 = {h for i, h in enumerate(heads2) if i in parcolset2}
+        result.new_parent_cols1 = [h for h in hdset1 if h not in hdset2]
+        result.new_parent_cols2 = [h for h in hdset2 if h not in hdset1]
+        result.parent_col_indexes = [
+            (name, cols[0], cols[1]) for name, cols in pcold.items() if len(cols) > 1 and cols[0] != cols[1]
+        ]
+    if matching_details_names:
+        result.matching_detail_cols = True
+        hdset1 = {h for i, h in enumerate(heads1) if i not in ic_parcolset1}
+        hdset2 = {h for i, h in enumerate(heads2) if i not in ic_parcolset2}
+        result.new_detail_cols1 = [h for h in hdset1 if h not in hdset2]
+        result.new_detail_cols2 = [h for h in hdset2 if h not in hdset1]
+        result.detail_col_indexes = [
+            (name, cols[0], cols[1]) for name, cols in detcold.items() if len(cols) > 1 and cols[0] != cols[1]
+        ]
+
+    # keyed joins on lowercase IDs
+    keys1 = [ID.lower() for ID in side1.ids]
+    keys2 = [ID.lower() for ID in side2.ids]
+    index1 = dict(zip(keys1, range(len(keys1))))
+    index2 = dict(zip(keys2, range(len(keys2))))
+    if task is not None:
+        task.check_cancelled()
+    result.matching_ids = not index1.keys().isdisjoint(index2)
+    if not result.matching_ids:
+        return result
+    result.new_ids1 = [side1.names[i] for i in side1.order if keys1[i] not in index2]
+    result.new_ids2 = [side2.names[i] for i in side2.order if keys2[i] not in index1]
+    result.names1 = dict(zip(keys1, side1.names))
+    result.names2 = dict(zip(keys2, side2.names))
+
+    # matched IDs as (row in 1, row in 2, row in the sheet with fewer columns),
+    # differences are reported in that sheet's order
+    if row_len1 >= row_len2:
+        it_side = side2
+        matched = [(index1[k], i, i) for i, k in enumerate(keys2) if k in index1]
+    else:
+        it_side = side1
+        matched = [(i, index2[k], i) for i, k in enumerate(keys1) if k in index2]
+    if task is not None:
+        task.check_cancelled()
+
+    found = defaultdict(list)
+    if structural and matching_hrs_names:
+        # rows of sheet 1 inside subtrees identical on both sides
+        covered = set()
+        for nx in matching_hrs_names:
+            structural_parent_diffs(
+                nx,
+                side1,
+                side2,
+                pcold[nx][0],
+                pcold[nx][1],
+                keys1,
+                keys2,
+                index1,
+                index2,
+                it_side is side2,
+                found,
+                covered,
+            )
+            if task is not None:
+                task.check_cancelled()
+        if covered:
+            matched = [t for t in matched if t[0] not in covered]
+    else:
+        # each column is compared over all matched IDs
+        for nx in matching_hrs_names:
+            a = side1.parents[pcold[nx][0]]
+            b = side2.parents[pcold[nx][1]]
+            for i1, i2, r in matched:
+                if a[i1] != b[i2]:
+                    found[r].append((False, nx, a[i1], b[i2]))
+            if task is not None:
+                task.check_cancelled()
+    for nx in matching_details_names:
+        a = side1.details[detcold[nx][0]]
+        b = side2.details[detcold[nx][1]]
+        for i1, i2, r in matched:
+            if (c1 := a[i1]) != (c2 := b[i2]) and c1.lower() != c2.lower():
+                found[r].append((True, nx, c1, c2))
+        if task is not None:
+            task.check_cancelled()
+    result.differences = [Difference(it_side.ids[r], *d) for r in sorted(found) for d in found[r]]
+    return result
+
+
+def structural_parent_diffs(
+    nx: str,
+    side1: CompareSide,
+    side2: CompareSide,
+    h1: int,
+    h2: int,
+    keys1: list[str],
+    keys2: list[str],
+    index1: dict[str, int],
+    index2: dict[str, int],
+    it2: bool,
+    found: defaultdict[int, list],
+    covered: set[int],
+) -> None:
+    # walks each side's hierarchy top down jumping over subtrees with equal
+    # digests, a subtree which is equal but under a different parent is a move
+    order1, ends1, digests1 = side1.trees[h1]
+    order2, ends2, digests2 = side2.trees[h2]
+    a = side1.parents[h1]
+    b = side2.parents[h2]
+    i, n = 0, len(order1)
+    while i < n:
+        i1 = order1[i]
+        if (i2 := index2.get(keys1[i1])) is None:
+            i += 1
+            continue
+        if digests1[i1] == digests2[i2]:
+            if a[i1] != b[i2]:
+                found[i2 if it2 else i1].append((False, nx, a[i1], b[i2], ends1[i] - i))
+            covered.update(order1[i : ends1[i]])
+            i = ends1[i]
+            continue
+        if a[i1] != b[i2]:
+            found[i2 if it2 else i1].append((False, nx, a[i1], b[i2]))
+        i += 1
+    # IDs in this hierarchy only in sheet 2, anything else was found above
+    i, n = 0, len(order2)
+    while i < n:
+        i2 = order2[i]
+        if (i1 := index1.get(keys2[i2])) is None:
+            i += 1
+            continue
+        if digests1[i1] == digests2[i2]:
+            i = ends2[i]
+            continue
+        if a[i1] is None:
+            found[i2 if it2 else i1].append((False, nx, None, b[i2]))
+        i += 1
+
+
+class ReportIndex:
+    """
+    Finds report rows by section, ID or column without formatting the report.
+    A selection is a list of (section number, row numbers), rows are only made
+    for the part of a selection being shown or written
+    """
+
+    def __init__(self, result: CompareResult) -> None:
+        self.result = result
+        self.table = result.section_table()
+        self._ids: dict[int, dict[str, list[int]]] = {}
+        self._columns: dict[int, dict[str, list[int]]] = {}
+
+    def ids(self, n: int) -> dict[str, list[int]]:
+        # lowercase ID: row numbers in section n
+        if n not in self._ids:
+            section = self.table[n]
+            index = defaultdict(list)
+            if section.kind == "differences":
+                for i, d in enumerate(self.result.differences, 1):
+                    index[d.ID.lower()].append(i)
+            else:
+                for i in range(section.count):
+                    index[section.row(i)[0].lower()].append(i)
+            self._ids[n] = dict(index)
+        return self._ids[n]
+
+    def columns(self, n: int) -> dict[str, list[int]]:
+        # column name: row numbers in a differences section
+        if n not in self._columns:
+            index = defaultdict(list)
+            for i, d in enumerate(self.result.differences, 1):
+                index[d.column].append(i)
+            self._columns[n] = dict(index)
+        return self._columns[n]
+
+    def select(self, section: int | None = None, ID: str = "", column: str = "") -> list[tuple[int, Sequence[int]]]:
+        # a filtered differences section keeps its header row
+        selection = []
+        for n, sec in enumerate(self.table):
+            if section is not None and n != section:
+                continue
+            if not ID and not column:
+                selection.append((n, range(sec.count)))
+            elif sec.kind == "differences":
+                rows = self.ids(n).get(ID.lower(), []) if ID else None
+                if column:
+                    in_column = self.columns(n).get(column, [])
+                    if rows is None:
+                        rows = in_column
+                    else:
+                        in_column = set(in_column)
+                        rows = [i for i in rows if i in in_column]
+                if rows:
+                    selection.append((n, [0, *rows]))
+            elif sec.kind == "new_ids" and not column and (rows := self.ids(n).get(ID.lower())):
+                selection.append((n, rows))
+        return selection
+
+    def count(self, selection: list[tuple[int, Sequence[int]]]) -> int:
+        # displayed rows, one for each section title and one for each row
+        return sum(1 + len(rows) for _, rows in selection)
+
+    def page(
+        self, selection: list[tuple[int, Sequence[int]]], start: int, stop: int
+    ) -> Iterator[tuple[int, int, list]]:
+        # (section number, row number or -1 for the title row, row) for displayed rows start to stop
+        pos = 0
+        for n, rows in selection:
+            if pos >= stop:
+                return
+            section = self.table[n]
+            end = pos + 1 + len(rows)
+            if end > start:
+                if pos >= start:
+                    yield n, -1, [section.title]
+                first = max(start - pos - 1, 0)
+                for i in rows[first : stop - pos - 1]:
+                    yield n, i, section.row(i)
+            pos = end
+
+    def sections(self, selection: list[tuple[int, Sequence[int]]]) -> Iterator[tuple[str, Iterator[list]]]:
+        for n, rows in selection:
+            section = self.table[n]
+            yield section.title, map(section.row, rows)
+
+
+def write_report(
+    result: CompareResult,
+    filepath: str,
+    dialect: type[csv.Dialect] = csv.excel,
+    overwrite: Literal["w", "x"] = "w",
+    sheetname: str = "Report",
+    sections: Iterator[tuple[str, Iterator[list]]] | None = None,
+) -> None:
+    """
+    Writes the report to .xlsx, .csv, .tsv or .json a row at a time, sections are
+    formatted as they're written so the report is never held in memory.
+    sections, e.g. from ReportIndex.sections(), writes only part of the report
+    """
+    if sections is None:
+        sections = result.sections()
+    if filepath.lower().endswith((".csv", ".tsv")):
+        with open(filepath, overwrite, newline="") as fh:
+            writer = csv.writer(fh, dialect=dialect, lineterminator="\n")
+            writer.writerow([result.report_header])
+            for title, rows in sections:
+                writer.writerow([title])
+                writer.writerows(rows)
+
+    elif filepath.lower().endswith(".json"):
+        with open(filepath, overwrite) as fh:
+            write_json(fh, {"header": result.report_header, "report": dict(sections)})
+
+    elif filepath.lower().endswith(".xlsx"):
+        if overwrite == "x" and os.path.exists(filepath):
+            raise FileExistsError(f"File already exists: {filepath}")
+        wb = Workbook(write_only=True)
+        ws = xlsx_string_sheet(wb, sheetname)
+        white_font = Font(color="00FFFFFF")
+        green = ws.style_id(fill=green_fill, font=white_font)
+        blue = ws.style_id(fill=blue_fill, font=white_font)
+        ws.append([result.report_header])
+        row_ctr = 2
+        for title, rows in sections:
+            ws.append([(title, green)])
+            row_ctr += 1
+            for i, row in enumerate(rows):
+                # sections are grouped and collapsed, set a row at a time
+                ws.row_dimensions.group(row_ctr, outline_level=1, hidden=True)
+                if not i and len(row) > 1:
+                    ws.append([(e, blue) for e in row])
+                else:
+                    ws.append([e if e != "" else None for e in row])
+                row_ctr += 1
+        wb.save(filepath)
+
+    else:
+        raise Exception("Output file must be .xlsx / .csv / .tsv / .json")
+
+
+def tk_trees_compare_api(
+    api_action: Literal["compare"],
+    input_filepath: str,
+    compare_filepath: str,
+    output_filepath: str,
+    all_parent_column_indexes: list[int],
+    compare_parent_column_indexes: list[int] | None = None,
+    input_sheet: str | int = 0,
+    compare_sheet: str | int = 0,
+    output_sheet: str | None = None,
+    csv_delimiter: str | Literal["tab"] = ",",
+    overwrite_file: bool = True,
+    flatten_id_column: int = 0,
+    compare_id_column: int | None = None,
+    structural: bool = False,
+) -> None:
+    try:
+        if api_action != "compare":
+            raise Exception(f"API action must be compare, not '{api_action}'")
+        if not output_filepath.lower().endswith((".xlsx", ".csv", ".tsv", ".json")):
+            raise Exception("Output file must be .xlsx / .csv / .tsv / .json")
+        dialect = csv_dialect_from_delim(csv_delimiter)
+        ic1 = flatten_id_column
+        ic2 = flatten_id_column if compare_id_column is None else compare_id_column
+        parent_cols1 = all_parent_column_indexes
+        parent_cols2 = (
+            all_parent_column_indexes if compare_parent_column_indexes is None else compare_parent_column_indexes
+        )
+        if ic1 in parent_cols1 or ic2 in parent_cols2:
+            raise Exception("An ID column cannot be the same as a parent column")
+
+        data1 = api_load_sheet(input_filepath, input_sheet)[0]
+        data2 = api_load_sheet(compare_filepath, compare_sheet)[0]
+        filename_1 = os.path.basename(input_filepath)
+        filename_2 = os.path.basename(compare_filepath)
+        result = compare_sheets(
+            data1,
+            data2,
+            ic1,
+            ic2,
+            parent_cols1,
+            parent_cols2,
+            filename_1=filename_1,
+            filename_2=filename_2,
+            sheetname_1="Sheet 1" if filename_1 == filename_2 else filename_1,
+            sheetname_2="Sheet 2" if filename_1 == filename_2 else filename_2,
+            structural=structural,
+        )
+        del data1, data2
+        write_report(
+            result,
+            output_filepath,
+            dialect=dialect,
+            overwrite="w" if overwrite_file else "x",
+            sheetname="Report" if output_sheet is None else output_sheet,
+        )
+
+    except Exception as error:
+        try_write_error_log(f"{error}")
+        raise SystemExit(1) from None
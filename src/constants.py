@@ -4,7 +4,6 @@
 import datetime
 import os
 import re
-import tkinter as tk
 from platform import (
     release as get_os_version,
 )
@@ -18,14 +17,6 @@ from sys import (
 from openpyxl.styles import Alignment, PatternFill
 from openpyxl.styles.borders import Border, Side
 from openpyxl.styles.colors import Color
-from tksheet import (
-    DotDict,
-    theme_black,
-    theme_dark,
-    theme_dark_blue,
-    theme_light_blue,
-    theme_light_green,
-)
 
 _ts_path = os.path.realpath(__file__)
 current_dir = os.path.join(os.path.normpath(os.path.dirname(_ts_path)), "")
@@ -36,8 +27,6 @@ upone_dir = os.path.join(os.path.normpath(os.path.dirname(os.path.dirname(_ts_pa
 USER_OS = f"{get_os()}".lower()
 USER_OS_VERSION = f"{get_os_version()}"
 USER_PYTHON_VERSION = f"{get_python_version}"
-USER_TK_VERSION = f"{tk.TkVersion}"
-USER_TCL_VERSION = f"{tk.TclVersion}"
 
 rc_button = "<2>" if USER_OS == "darwin" else "<3>"
 rc_press = "<ButtonPress-2>" if USER_OS == "darwin" else "<ButtonPress-3>"
@@ -56,16 +45,6 @@ website1 = "github.com/ragardner"
 current_year = f"{datetime.datetime.now().year}"
 app_copyright = f"Copyright © 2019-{current_year} R. A. Gardner."
 contact_info = f" {software_version_full}\n {app_copyright}\n {contact_email}\n {website1}"
-about_system = "\n".join(
-    (
-        f"TkTrees: {software_version_number}",
-        f"OS: {USER_OS}",
-        f"OS Version: {USER_OS_VERSION}",
-        f"Python: {USER_PYTHON_VERSION}",
-        f"Tk: {USER_TK_VERSION}",
-        f"Tcl: {USER_TCL_VERSION}",
-    )
-)
 config_name = ".tktrees.json"
 default_app_window_size = (1000, 760)
 
@@ -125,6 +104,67 @@ sheet_bindings = tree_bindings
 
 detail_column_types = {"Text", "Number", "Date"}
 
+# changelog entries which import changes can apply, some older entries end with " |"
+importable_changes = {
+    "Edit cell",
+    "Move rows",
+    "Move columns",
+    "Add new hierarchy column",
+    "Add new detail column",
+    "Delete hierarchy column",
+    "Delete detail column",
+    "Column rename",
+    "Edit validation",
+    "Change detail column type",
+    "Date format change",
+    "Cut and paste ID",
+    "Cut and paste ID + children",
+    "Cut and paste children",
+    "Copy and paste ID",
+    "Copy and paste ID + children",
+    "Add ID",
+    "Rename ID",
+    "Delete ID",
+    "Delete ID, orphan children",
+    "Delete ID + all children",
+    "Delete ID + all children from all hierarchies",
+    "Delete ID from all hierarchies",
+    "Delete ID from all hierarchies, orphan children",
+    "Sort sheet",
+}
+
+# importable changes which work on whole rows or columns, deferred tree work is finished before them
+whole_sheet_changes = {
+    "Move rows",
+    "Move columns",
+    "Add new hierarchy column",
+    "Add new detail column",
+    "Delete hierarchy column",
+    "Delete detail column",
+    "Edit validation",
+    "Change detail column type",
+    "Date format change",
+    "Sort sheet",
+}
+
+# id / parent cell edits above this amount rebuild the whole tree
+max_incremental_edits = 200
+
+# sheets with at least this many IDs only put open nodes into the treeview
+lazy_tree_min_nodes = 50_000
+
+# treeview rows kept for switching back to previously shown hierarchies without a rebuild
+max_cached_tree_rows = 2_000_000
+
+# comparison report rows shown at once, larger reports are paged
+compare_report_page_rows = 10_000
+
+# conditional formatting number / date conversion cache entries per column type
+max_typed_cells = 1_000_000
+
+# undo and redo history memory budget, older entries beyond it are moved to a temporary file
+undo_mem_limit_mb = 256
+
 validation_allowed_num_chars = {"0", "1", "2", "3", "4", "5", "6", "7", "8", "9", ",", "-", ".", "e"}
 validation_allowed_date_chars = {"0", "1", "2", "3", "4", "5", "6", "7", "8", "9", ",", "/", "-", " "}
 
@@ -141,15 +181,6 @@ date_formats_usable = {
 # date_formats_entry["%B %d, %Y"] = None, # Full month name, e.g., January 01, 2023
 # date_formats_entry["%b %d, %Y"] = None, # Abbreviated month name, e.g., Jan 01, 2023
 
-themes = DotDict(
-    {
-        "light_blue": theme_light_blue,
-        "light_green": theme_light_green,
-        "dark": theme_dark,
-        "black": theme_black,
-        "dark_blue": theme_dark_blue,
-    }
-)
 
 # BUILD START WARNINGS HEADER
 warnings_header = """## TREE BUILD WARNINGS"""
@@ -522,3 +553,49 @@ checked_icon = (
     "AAAAAAAAAIRAANCRxIsKDBgwgTKlzIsKHDFRAjrnB4UKJFigUtSsRIUGNEjgM9QgQpUOR"
     "EkiZJGkqJUqRKliBhcpQ5U6PKmzhzFgwIADs="
 )
+
+
+def gui_constants() -> dict:
+    import tkinter as tk
+
+    from tksheet import (
+        DotDict,
+        theme_black,
+        theme_dark,
+        theme_dark_blue,
+        theme_light_blue,
+        theme_light_green,
+    )
+
+    return {
+        "USER_TK_VERSION": f"{tk.TkVersion}",
+        "USER_TCL_VERSION": f"{tk.TclVersion}",
+        "about_system": "\n".join(
+            (
+                f"TkTrees: {software_version_number}",
+                f"OS: {USER_OS}",
+                f"OS Version: {USER_OS_VERSION}",
+                f"Python: {USER_PYTHON_VERSION}",
+                f"Tk: {tk.TkVersion}",
+                f"Tcl: {tk.TclVersion}",
+            )
+        ),
+        "themes": DotDict(
+            {
+                "light_blue": theme_light_blue,
+                "light_green": theme_light_green,
+                "dark": theme_dark,
+                "black": theme_black,
+                "dark_blue": theme_dark_blue,
+            }
+        ),
+    }
+
+
+def __getattr__(name: str):
+    # the constants which need tkinter or tksheet are made the first time one is asked for,
+    # so the compare engine and the command line api can import this module without them
+    if name in ("USER_TK_VERSION", "USER_TCL_VERSION", "about_system", "themes"):
+        globals().update(gui_constants())
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,30 +3,45 @@
 
 from __future__ import annotations
 
+import ast
+import codecs
 import contextlib
 import csv
+import datetime
 import io
 import json
+import locale
 import lzma
 import os
 import re
-import tkinter as tk
 import zlib
 from base64 import b32decode as b32d
 from base64 import b32encode as b32e
 from collections import defaultdict
+from collections.abc import Callable, Generator, Iterable, Iterator
 from contextlib import suppress
-from itertools import islice, repeat
+from functools import lru_cache
+from itertools import chain, islice, repeat
 from math import ceil
+from operator import eq, ge, gt, itemgetter, le, lt, ne, not_
 from sys import stderr
-from typing import Literal
+from typing import TYPE_CHECKING, Any, Literal
+from xml.parsers import expat
 
 from openpyxl import Workbook
-from openpyxl.cell import WriteOnlyCell
-from tksheet import (
-    DotDict,
-    get_csv_str_dialect,
-)
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES, ILLEGAL_CHARACTERS_RE
+from openpyxl.compat.strings import safe_string
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import from_excel, from_ISO8601
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+from openpyxl.worksheet._reader import _cast_number
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+from openpyxl.worksheet._writer import WorksheetWriter, create_temporary_file
+from openpyxl.xml.constants import SHARED_STRINGS, SHEET_MAIN_NS
+from openpyxl.xml.functions import Element
 
 from .constants import (
     config_name,
@@ -42,6 +57,13 @@ from .constants import (
     upone_dir,
 )
 
+if TYPE_CHECKING:
+    # tkinter and tksheet, which imports it, are only imported where the gui needs them
+    # so that the compare engine and the command line api run without them
+    import tkinter as tk
+
+    from tksheet import DotDict
+
 
 def try_write_error_log(error: str) -> bool:
     with contextlib.suppress(Exception), open(upone_dir + "TKTREES-ERROR.txt", "w") as fh:
@@ -110,8 +132,38 @@ def write_cfg(d: dict) -> bool:
     return True
 
 
+_natural_split = re.compile("([0-9]+)").split
+
+
+# memoized, the same IDs get sorted over and over while editing
+@lru_cache(maxsize=1 << 20)
 def sort_key(s: str):
-    return tuple(int(e) if e.isdigit() else e for e in re.split("([0-9]+)", s))
+    return tuple(int(e) if e.isdigit() else e for e in _natural_split(s))
+
+
+def bisect_left_key(a: list, x: Any, key: Callable) -> int:
+    # bisect.bisect_left() with key=, which needs Python 3.10
+    lo, hi = 0, len(a)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key(a[mid]) < x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def insort_key(a: list, item: Any, key: Callable) -> None:
+    # bisect.insort() with key=, which needs Python 3.10
+    x = key(item)
+    lo, hi = 0, len(a)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if x < key(a[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    a.insert(lo, item)
 
 
 def case_insensitive_replace(find_, repl, text):
@@ -285,14 +337,8 @@ def center(
     return x, y
 
 
-def bytes_io_wb(filepath):
-    with open(filepath, "rb") as fh:
-        in_mem = io.BytesIO(fh.read())
-    return in_mem
-
-
 def csv_str_x_data(s: str, discard_empty_rows: bool = True, paste: bool = False) -> list[list[str]]:
-    dialect = get_csv_str_dialect(s, delimiters=from_clipboard_delimiters)
+    dialect = sniff_csv_dialect(s, delimiters=from_clipboard_delimiters)
     if discard_empty_rows:
         data = []
         for r in csv.reader(
@@ -319,6 +365,8 @@ def csv_str_x_data(s: str, discard_empty_rows: bool = True, paste: bool = False)
 
 
 def ws_x_data(ws) -> list[list[str]]:
+    if isinstance(ws, ReadOnlyWorksheet) and ws.parent.data_only:
+        return [r for r in ws_rows(ws) if r]
     data = []
     for r in ws.iter_rows(values_only=True):
         try:
@@ -334,9 +382,329 @@ def ws_x_data(ws) -> list[list[str]]:
 
 
 def ws_x_program_data_str(ws) -> str:
+    if isinstance(ws, ReadOnlyWorksheet) and ws.parent.data_only:
+        return "".join(r[0] if r else "" for r in islice(ws_rows(ws), 1, None))
     return "".join("" if r[0] is None else f"{r[0]}" for r in islice(ws.iter_rows(values_only=True), 1, None))
 
 
+# element names as pyexpat reports them with namespace_separator="}"
+xlsx_tag = {k: f"{SHEET_MAIN_NS}}}{k}" for k in ("si", "t", "r", "rPh", "row", "c", "v", "is")}
+
+
+@lru_cache(maxsize=16384)
+def xlsx_column_index(coordinate: str) -> int:
+    return column_index_from_string(coordinate.rstrip("0123456789")) - 1
+
+
+def xlsx_shared_strings(src, chunk_size: int = 1 << 20) -> list[str]:
+    # same strings as openpyxl's read_string_table() without building elements
+    strings = []
+    text = []
+    collect = False
+    phonetic = 0
+    si, t, rph = xlsx_tag["si"], xlsx_tag["t"], xlsx_tag["rPh"]
+
+    def start(name: str, attrs: dict) -> None:
+        nonlocal collect, phonetic
+        if name == t:
+            collect = not phonetic
+        elif name == rph:
+            phonetic += 1
+        elif name == si:
+            text.clear()
+
+    def end(name: str) -> None:
+        nonlocal collect, phonetic
+        if name == t:
+            collect = False
+        elif name == rph:
+            phonetic -= 1
+        elif name == si:
+            strings.append("".join(text).replace("x005F_", ""))
+
+    def chars(data: str) -> None:
+        if collect:
+            text.append(data)
+
+    parser = xlsx_expat_parser(start, end, chars)
+    while chunk := src.read(chunk_size):
+        parser.Parse(chunk, False)
+    parser.Parse(b"", True)
+    return strings
+
+
+def xlsx_expat_parser(start: Callable, end: Callable, chars: Callable) -> Any:
+    parser = expat.ParserCreate(namespace_separator="}")
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = chars
+    return parser
+
+
+class XlsxSheet(ReadOnlyWorksheet):
+    # dimensions start unset as after reset_dimensions(), openpyxl parses the
+    # whole sheet to find them when the file doesn't declare them
+    def _get_size(self) -> None:
+        pass
+
+
+class XlsxReader(ExcelReader):
+    # read only ExcelReader using xlsx_shared_strings() and XlsxSheet
+    def read_strings(self) -> None:
+        if self.rich_text:
+            return super().read_strings()
+        if (ct := self.package.find(SHARED_STRINGS)) is not None:
+            with self.archive.open(ct.PartName[1:]) as src:
+                self.shared_strings = xlsx_shared_strings(src)
+
+    def read_worksheets(self) -> None:
+        for sheet, rel in self.parser.find_sheets():
+            if rel.target not in self.valid_files:
+                continue
+            if "chartsheet" in rel.Type:
+                self.read_chartsheet(sheet, rel)
+                continue
+            ws = XlsxSheet(self.wb, sheet.name, rel.target, self.shared_strings)
+            ws.sheet_state = sheet.state
+            self.wb._sheets.append(ws)
+
+
+def load_xlsx(filepath: str) -> Workbook:
+    # a read only, data only workbook which reads from the file as it's used, must be closed
+    reader = XlsxReader(filepath, read_only=True, data_only=True)
+    reader.read()
+    return reader.wb
+
+
+def ws_rows(ws: ReadOnlyWorksheet, chunk_size: int = 1 << 20) -> Generator[list[str]]:
+    """
+    Values of a read only data only worksheet as lists of strings, the same
+    as ws_x_data() makes from iter_rows() but parsed straight from the
+    sheet xml, without cell objects or styles. Only rows present in the file
+    are yielded and they are trimmed of trailing empty cells
+    """
+    shared_strings = ws._shared_strings
+    date_formats = ws.parent._date_formats
+    timedelta_formats = ws.parent._timedelta_formats
+    epoch = ws.parent.epoch
+    row_tag, c_tag, v_tag, t_tag, is_tag, rph_tag = (xlsx_tag[k] for k in ("row", "c", "v", "t", "is", "rPh"))
+    rows = []
+    row = []
+    text = []
+    type_ = style = coordinate = None
+    collect = inline = False
+    phonetic = 0
+
+    def start(name: str, attrs: dict) -> None:
+        nonlocal type_, style, coordinate, collect, inline, phonetic
+        if name == c_tag:
+            type_ = attrs.get("t", "n")
+            style = attrs.get("s")
+            coordinate = attrs.get("r")
+            inline = False
+            text.clear()
+        elif name == v_tag:
+            collect = True
+        elif name == row_tag:
+            row.clear()
+        elif name == is_tag:
+            inline = True
+        elif name == t_tag:
+            collect = inline and not phonetic
+        elif name == rph_tag:
+            phonetic += 1
+
+    def end(name: str) -> None:
+        nonlocal collect, phonetic
+        if name == c_tag:
+            value = "".join(text)
+            if type_ == "inlineStr":
+                value = value if inline else None
+            elif not value:
+                value = None
+            elif type_ == "s":
+                value = f"{shared_strings[int(value)]}"
+            elif type_ == "n":
+                value = _cast_number(value)
+                if style and (style_id := int(style)) in date_formats:
+                    try:
+                        value = from_excel(value, epoch, timedelta=style_id in timedelta_formats)
+                    except (OverflowError, ValueError):
+                        value = "#VALUE!"
+                value = f"{value}"
+            elif type_ == "b":
+                value = f"{bool(int(value))}"
+            elif type_ == "d":
+                value = f"{from_ISO8601(value)}"
+            if coordinate and (col := xlsx_column_index(coordinate)) != len(row):
+                if col < len(row):
+                    row[col] = value
+                    return
+                row.extend(repeat(None, col - len(row)))
+            row.append(value)
+        elif name in (v_tag, t_tag):
+            collect = False
+        elif name == row_tag:
+            while row and row[-1] is None:
+                row.pop()
+            rows.append(["" if v is None else v for v in row])
+        elif name == rph_tag:
+            phonetic -= 1
+
+    def chars(data: str) -> None:
+        if collect:
+            text.append(data)
+
+    parser = xlsx_expat_parser(start, end, chars)
+    with ws._get_source() as src:
+        while chunk := src.read(chunk_size):
+            parser.Parse(chunk, False)
+            yield from rows
+            rows.clear()
+        parser.Parse(b"", True)
+    yield from rows
+
+
+def xlsx_escape(s: str) -> str:
+    if "&" in s:
+        s = s.replace("&", "&amp;")
+    if "<" in s:
+        s = s.replace("<", "&lt;")
+    if ">" in s:
+        s = s.replace(">", "&gt;")
+    return s
+
+
+class XlsxStringSheet(WriteOnlyWorksheet):
+    """
+    Write only worksheet which writes appended rows to the sheet xml as they
+    come instead of making a cell for every value. Values can be str, int,
+    float, None, a WriteOnlyCell or a (value, style) tuple with a style from
+    style_id(). Strings are written as inline strings, the same as openpyxl
+    """
+
+    marker = "tktrees_rows"
+
+    def __init__(self, parent: Workbook, title: str | None = None) -> None:
+        super().__init__(parent, title)
+        self._saved = False
+        self._rows_fh = None
+        self._rows_path = None
+        self._row_idx = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._saved
+
+    def style_id(self, **styles) -> int:
+        # e.g. style_id(fill=...), styles are added to the workbook once
+        cell = WriteOnlyCell(self)
+        for k, v in styles.items():
+            setattr(cell, k, v)
+        return cell.style_id
+
+    def append(self, row: Iterable) -> None:
+        if self._saved:
+            self._already_saved()
+        if self._rows_fh is None:
+            self._rows_path = create_temporary_file()
+            # kept open between appends, closed by close() or release_rows()
+            self._rows_fh = open(self._rows_path, "w", encoding="utf-8")  # noqa: SIM115
+        self._row_idx += 1
+        r = self._row_idx
+        # row dimensions are only needed until their row is written
+        if dims := self.row_dimensions.pop(r, None):
+            attrs = "".join(f' {k}="{v}"' for k, v in dims)
+            parts = [f'<row r="{r}"{attrs}>']
+        else:
+            parts = [f'<row r="{r}">']
+        for c, v in enumerate(row, 1):
+            style = ""
+            if isinstance(v, tuple):
+                v, style_id = v
+                style = f' s="{style_id}"'
+            elif isinstance(v, Cell):
+                if v.has_style:
+                    style = f' s="{v.style_id}"'
+                v = v.value
+            if v is None:
+                if style:
+                    parts.append(f'<c r="{get_column_letter(c)}{r}"{style}></c>')
+                continue
+            elif v == "":
+                parts.append(f'<c r="{get_column_letter(c)}{r}"{style} t="inlineStr"></c>')
+                continue
+            ref = f"{get_column_letter(c)}{r}"
+            if isinstance(v, str):
+                v = v[:32767]
+                if ILLEGAL_CHARACTERS_RE.search(v):
+                    raise IllegalCharacterError(f"{v} cannot be used in worksheets.")
+                if len(v) > 1 and v.startswith("="):
+                    parts.append(f'<c r="{ref}"{style}><f>{xlsx_escape(v[1:])}</f><v></v></c>')
+                elif v in ERROR_CODES:
+                    parts.append(f'<c r="{ref}"{style} t="e"><v>{v}</v></c>')
+                elif v != v.strip():
+                    parts.append(
+                        f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{xlsx_escape(v)}</t></is></c>'
+                    )
+                else:
+                    parts.append(f'<c r="{ref}"{style} t="inlineStr"><is><t>{xlsx_escape(v)}</t></is></c>')
+            elif isinstance(v, bool):
+                parts.append(f'<c r="{ref}"{style} t="b"><v>{v:d}</v></c>')
+            elif isinstance(v, (int, float)):
+                parts.append(f'<c r="{ref}"{style} t="n"><v>{safe_string(v)}</v></c>')
+            else:
+                parts.append(f'<c r="{ref}"{style} t="inlineStr"><is><t>{xlsx_escape(f"{v}")}</t></is></c>')
+        parts.append("</row>")
+        self._rows_fh.write("".join(parts))
+
+    def close(self) -> None:
+        if self._saved:
+            self._already_saved()
+        # everything around the rows is written by openpyxl with a marker where they go
+        writer = WorksheetWriter(self, out=io.BytesIO())
+        writer.write_top()
+        xf = writer.xf.send(True)
+        with xf.element("sheetData"):
+            xf.write(Element(self.marker))
+        writer.xf.send(None)
+        writer.write_tail()
+        writer.close()
+        head, tail = re.split(rb"<%s\s*/>" % self.marker.encode(), writer.out.getvalue())
+        writer.out = create_temporary_file()
+        with open(writer.out, "wb") as fh:
+            fh.write(head)
+            if self._rows_fh is not None:
+                self._rows_fh.close()
+                with open(self._rows_path, "rb") as rows:
+                    while chunk := rows.read(1 << 20):
+                        fh.write(chunk)
+                self.release_rows()
+            fh.write(tail)
+        self._writer = writer
+        self._saved = True
+
+    def release_rows(self) -> None:
+        # closes and removes the rows file, for a sheet that is saved or never will be
+        if self._rows_fh is not None:
+            self._rows_fh.close()
+            self._rows_fh = None
+            with suppress(Exception):
+                os.remove(self._rows_path)
+
+    def __del__(self) -> None:
+        with suppress(Exception):
+            self.release_rows()
+
+
+def xlsx_string_sheet(wb: Workbook, title: str | None = None) -> XlsxStringSheet:
+    # Workbook(write_only=True).create_sheet() for an XlsxStringSheet
+    ws = XlsxStringSheet(parent=wb, title=title)
+    wb._add_sheet(ws)
+    return ws
+
+
 def is_json_one(data):
     if not isinstance(data, dict):
         return False
@@ -364,6 +732,219 @@ def is_json_four(data):
     return isinstance(data, str)
 
 
+json_sheet_keys = ("records", "sheet", "data", "table")
+json_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+class JsonSheet(list):
+    """
+    Rows of a format 2 or 3 sheet list, converted while the file is being read so
+    the json objects for the whole list never exist at once, see get_json_from_file()
+    format_ is 0 until the first element, None if elements weren't all lists or all dicts
+    """
+
+    __slots__ = ("format_", "headers")
+
+    def __init__(self, elements: Iterable[Any], task: Any = None) -> None:
+        super().__init__()
+        self.format_ = 0
+        self.headers = {}
+        for i, e in enumerate(elements):
+            if task is not None and not i % 10_000:
+                task.check_cancelled()
+            if self.format_ is None:
+                continue
+            if isinstance(e, dict) and self.format_ in (0, 2):
+                self.format_ = 2
+                for k in e:
+                    if k not in self.headers:
+                        self.headers[k] = len(self.headers)
+                self.append([v if isinstance(v, str) else f"{v}" for v in e.values()])
+            elif isinstance(e, list) and self.format_ in (0, 3):
+                self.format_ = 3
+                while e and e[-1] == "":
+                    e.pop()
+                if e:
+                    self.append([v if isinstance(v, str) else f"{v}" for v in e])
+            else:
+                self.format_ = None
+                self.clear()
+        if self.format_ == 0:
+            self.format_ = 2
+
+    def to_sheet(self, j: dict) -> tuple[list[list[str]], int]:
+        # same results as json_to_sheet() gives for the parsed json
+        if self.format_ == 3:
+            sheet = list(self)
+            return sheet, equalize_sublist_lens(sheet)
+        headers = self.headers
+        if not headers and "headers" in j:
+            headers = {k: i for i, k in enumerate(json_get_header_strings(j["headers"]))}
+        if not headers and "columns" in j:
+            headers = {k: i for i, k in enumerate(json_get_header_strings(j["columns"]))}
+        if len(headers) < 2:
+            return [], len(headers)
+        return [list(headers), *self], len(headers)
+
+
+class JsonReader:
+    """
+    Reads a json document from a text file a value at a time, items() and elements()
+    step into an object or array, the caller reads each value before asking for the next
+    """
+
+    __slots__ = ("buf", "chunk_size", "decoder", "eof", "fh", "pos")
+
+    def __init__(self, fh: io.TextIOBase, chunk_size: int = 1 << 16) -> None:
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: int) -> None:
+        more = self.fh.read(size)
+        self.buf = self.buf[self.pos :] + more
+        self.pos = 0
+        self.eof = not more
+
+    def char(self) -> str:
+        # next non whitespace character, not consumed
+        while True:
+            self.pos = json_whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of json")
+            self.fill(self.chunk_size)
+
+    def take(self, chars: str) -> str:
+        if (c := self.char()) not in chars:
+            raise ValueError(f"Expected one of {chars} in json, found {c}")
+        self.pos += 1
+        return c
+
+    def value(self) -> Any:
+        self.char()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number at the end of the buffer may continue in the file
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # reading as much again as is buffered keeps large values linear
+            self.fill(max(self.chunk_size, len(self.buf)))
+
+    def items(self) -> Generator[str]:
+        self.take("{")
+        if self.char() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.take(":")
+            yield key
+            if self.take(",}") == "}":
+                return
+
+    def elements(self) -> Generator[Any]:
+        self.take("[")
+        if self.char() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.take(",]") == "]":
+                return
+
+
+class JsonTextChunks:
+    # a json string written a piece at a time by write_json()
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks: Iterable[str]) -> None:
+        self.chunks = chunks
+
+
+def write_json(fh: io.TextIOBase, obj: Any, indent: int | None = 4) -> None:
+    """
+    json.dump() that also takes iterators, written as arrays, and JsonTextChunks,
+    written as one string, so a document can be written without building it first.
+    Output is the same as json.dumps(obj, indent=indent)
+    """
+    dumps = json.dumps
+    item_sep = "," if indent is not None else ", "
+
+    def newline(level: int) -> str:
+        return "" if indent is None else "\n" + " " * (indent * level)
+
+    def write_items(items: Iterable[tuple[str, Any]], open_: str, close: str, level: int) -> None:
+        inner = newline(level + 1)
+        empty = True
+        for prefix, v in items:
+            if isinstance(v, str):
+                fh.write(f"{open_ if empty else item_sep}{inner}{prefix}{dumps(v)}")
+            else:
+                fh.write(f"{open_ if empty else item_sep}{inner}{prefix}")
+                write(v, level + 1)
+            empty = False
+        fh.write(open_ + close if empty else newline(level) + close)
+
+    def write(v: Any, level: int) -> None:
+        if isinstance(v, str):
+            fh.write(dumps(v))
+        elif isinstance(v, dict):
+            write_items(
+                ((f"{dumps(k if isinstance(k, str) else dumps(k))}: ", v) for k, v in v.items()), "{", "}", level
+            )
+        elif isinstance(v, list) and all(isinstance(e, str) for e in v):
+            if v:
+                inner = newline(level + 1)
+                fh.write(f"[{inner}{(item_sep + inner).join(map(dumps, v))}{newline(level)}]")
+            else:
+                fh.write("[]")
+        elif isinstance(v, (list, tuple, Iterator)):
+            write_items((("", e) for e in v), "[", "]", level)
+        elif isinstance(v, JsonTextChunks):
+            fh.write('"')
+            fh.writelines(dumps(chunk)[1:-1] for chunk in v.chunks)
+            fh.write('"')
+        else:
+            fh.write(dumps(v))
+
+    write(obj, 0)
+
+
+def sheet_to_json_dict(headers: list[str], data: list[list[str]], key: str = "records", format_: int = 1) -> dict:
+    # full_sheet_to_dict() with the sheet parts left as iterators for write_json()
+    if format_ == 1:
+        return {key: {hdr: map(itemgetter(i), data) for i, hdr in enumerate(headers)}}
+    elif format_ == 2:
+        return {key: ({hdr: row[i] for i, hdr in enumerate(headers)} for row in data)}
+    elif format_ == 3:
+        return {key: chain((headers,), data)}
+    elif format_ == 4:
+        return {key: JsonTextChunks(tsv_chunks(headers, data))}
+
+
+def tsv_chunks(headers: list[str], data: list[list[str]], rows_per_chunk: int = 1000) -> Generator[str]:
+    # the rows as tab separated text like str_io_csv_writer() gives, with .rstrip() applied to the whole
+    tail = ""
+    for rows in chain(((headers,),), (data[i : i + rows_per_chunk] for i in range(0, len(data), rows_per_chunk))):
+        s, writer = str_io_csv_writer(dialect=csv.excel_tab)
+        writer.writerows(rows)
+        chunk = tail + s.getvalue()
+        stripped = chunk.rstrip()
+        tail = chunk[len(stripped) :]
+        if stripped:
+            yield stripped
+
+
 def get_json_format(j):
     try:
         records = {k: i for i, k in enumerate(j)}
@@ -371,9 +952,13 @@ def get_json_format(j):
         return None
     if "program_data" in records:
         return "program_data", "records"
-    for key in ("records", "sheet", "data", "table"):
+    for key in json_sheet_keys:
         if key in records:
             try:
+                if isinstance(j[key], JsonSheet):
+                    if j[key].format_:
+                        return j[key].format_, key
+                    continue
                 if is_json_one(j[key]):
                     return 1, key
                 elif is_json_two(j[key]):
@@ -397,6 +982,11 @@ def json_to_sheet(
     new_sheet = []
     if get_format:
         format_, key = get_json_format(j)
+    if isinstance(j.get(key), JsonSheet) and format_ != "program_data":
+        new_sheet, rowlen = j[key].to_sheet(j)
+        if return_rowlen:
+            return new_sheet, rowlen
+        return new_sheet
     if format_ == "program_data":
         try:
             d = b32_x_dict(j["program_data"])
@@ -520,19 +1110,19 @@ def to_json(
 ):
     if data:
         headers = data.pop(0)
-        d = full_sheet_to_dict(
+        d = sheet_to_json_dict(
             headers,
             data,
             format_=format_,
         )
     else:
-        d = full_sheet_to_dict(
+        d = sheet_to_json_dict(
             [],
             data,
             format_=format_,
         )
     with open(filepath, "w") as fh:
-        fh.write(json.dumps(d, indent=4))
+        write_json(fh, d)
 
 
 def path_without_numbers(full_path):
@@ -542,6 +1132,9 @@ def path_without_numbers(full_path):
     elif full_path.lower().endswith((".xlsx", ".json", ".xlsm")):
         ext = full_path[-5:]
         path = full_path[:-5]
+    elif full_path.lower().endswith(".tktrees"):
+        ext = full_path[-8:]
+        path = full_path[:-8]
     last_index = 0
     for i, c in enumerate(reversed(path), 1):
         if c.isdigit():
@@ -559,6 +1152,8 @@ def path_numbers(full_path):
         path = full_path[:-4]
     elif full_path.lower().endswith((".xlsx", ".json", ".xlsm")):
         path = full_path[:-5]
+    elif full_path.lower().endswith(".tktrees"):
+        path = full_path[:-8]
     numbers = []
     for c in reversed(path):
         if c.isdigit():
@@ -578,6 +1173,9 @@ def increment_file_version(full_path):
     elif full_path.lower().endswith((".xlsx", ".json", ".xlsm")):
         ext = full_path[-5:]
         path = full_path[:-5]
+    elif full_path.lower().endswith(".tktrees"):
+        ext = full_path[-8:]
+        path = full_path[:-8]
     numbers = []
     last_index = 0
     for i, c in enumerate(reversed(path), 1):
@@ -684,6 +1282,95 @@ def isintlike(inp, str_only=False, num_only=False):
         return bool(type_int(inp))
 
 
+comparison_ops = {"==": eq, "!=": ne, "<": lt, "<=": le, ">": gt, ">=": ge}
+
+
+class RaisesOnCompare:
+    # stands in for an operand that failed to evaluate, comparing with it raises
+    # at the same point the old per cell eval() would have
+    def raise_(self, other):
+        raise ValueError
+
+    __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = raise_
+
+
+def condition_operand(token: str, type_: str, date_form: str, cd: Any) -> Any:
+    if token == "cd":
+        return cd
+    if type_ == "Date" and "/" in token:
+        try:
+            return datetime.datetime.strptime(token, date_form)
+        except Exception:
+            return RaisesOnCompare()
+    if type_ == "Date" and token.isdigit():
+        return datetime.timedelta(days=int(token))
+    if token.isidentifier():
+        return RaisesOnCompare()
+    # raises SyntaxError / ValueError if it isn't a number
+    return ast.literal_eval(token)
+
+
+def compile_condition(
+    type_: str,
+    condition: str,
+    date_form: str = "%Y/%m/%d",
+    cd: Any = None,
+) -> Callable[[Any], bool] | None:
+    """
+    Turns a Number or Date conditional formatting condition e.g. >= 5 and < 10
+    into a predicate on the typed cell value, None if the condition is invalid
+    and could never match, date_form should be the / version of the date format
+    """
+    if not condition:
+        return not_
+    # or of ands of comparison chains, the same precedence as python
+    ors = []
+    ands = []
+    chain = []
+    # 0 expects comparison operator, 1 expects operand, 2 after an operand
+    state = 0
+    for token in condition.split():
+        if state == 1:
+            try:
+                chain[-1][1] = condition_operand(token, type_, date_form, cd)
+            except Exception:
+                return None
+            state = 2
+        elif token in comparison_ops:
+            chain.append([comparison_ops[token], None])
+            state = 1
+        elif state == 2 and token in ("and", "or"):
+            ands.append(chain)
+            chain = []
+            if token == "or":
+                ors.append(ands)
+                ands = []
+            state = 0
+        else:
+            return None
+    if state != 2:
+        return None
+    ands.append(chain)
+    ors.append(ands)
+
+    def predicate(cell: Any) -> bool:
+        for ands in ors:
+            for chain in ands:
+                left = cell
+                for op, right in chain:
+                    if not op(left, right):
+                        break
+                    left = right
+                else:
+                    continue
+                break
+            else:
+                return True
+        return False
+
+    return predicate
+
+
 def equalize_sublist_lens(seq: list[list[object]], len_: int | None = None) -> list[list[object]]:
     if len_ is None:
         len_ = max(map(len, seq), default=0)
@@ -712,7 +1399,9 @@ def dict_x_b32(d: dict):
     return b32e(zlib.compress(json.dumps(d).encode())).decode()
 
 
-def b32_x_dict(s: str) -> dict:
+def b32_x_dict(s: str) -> DotDict:
+    from tksheet import DotDict
+
     b = b32d(s.encode())
     if comp_method(b) == "zlib":
         return DotDict(json.loads(zlib.decompress(b).decode()))
@@ -728,13 +1417,113 @@ def comp_method(b: bytes):
         return "lzma"
 
 
-def get_json_from_file(fp):
-    with open(fp, "r") as fh:
-        j = json.loads(fh.read())
-    return j
+def get_json_from_file(fp: str, task: Any = None) -> Any:
+    """
+    Reads the root object a key at a time, lists under the keys get_json_format()
+    looks for are converted into JsonSheet rows as they're read
+    """
+    encoding = get_file_encoding(fp)
+    try:
+        return read_json_file(fp, encoding, task)
+    except UnicodeDecodeError:
+        # utf-8 was a guess from the start of the file
+        if encoding != "utf-8":
+            raise
+        return read_json_file(fp, fallback_encoding(), task)
+
+
+def read_json_file(fp: str, encoding: str, task: Any = None) -> Any:
+    with open(fp, "r", encoding=encoding) as fh:
+        reader = JsonReader(fh)
+        if reader.char() != "{":
+            fh.seek(0)
+            return json.load(fh)
+        j = {}
+        for key in reader.items():
+            if key in json_sheet_keys and reader.char() == "[":
+                j[key] = JsonSheet(reader.elements(), task=task)
+            else:
+                j[key] = reader.value()
+        return j
+
+
+def sniff_csv_dialect(s: str, delimiters: str = from_clipboard_delimiters) -> type[csv.Dialect]:
+    # the same as tksheet's get_csv_str_dialect(), sniffs the first 300 lines or so
+    if len(s) > 6000:
+        upto = next(
+            (m.start() + 1 for i, m in enumerate(re.finditer("\n", s), 1) if i == 300 or m.start() > 6000),
+            len(s),
+        )
+        s = s[:upto]
+    try:
+        return csv.Sniffer().sniff(s, delimiters=delimiters)
+    except Exception:
+        return csv.excel_tab
+
+
+def get_file_encoding(fp: str, sample_size: int = 1 << 16) -> str:
+    with open(fp, "rb") as fh:
+        head = fh.read(sample_size)
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # not final, the sample may end part way through a character
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return fallback_encoding()
+
+
+def fallback_encoding() -> str:
+    # for files which aren't utf-8, latin-1 when the locale is utf-8 as it decodes any bytes
+    encoding = locale.getpreferredencoding(False)
+    return "latin-1" if codecs.lookup(encoding).name == "utf-8" else encoding
+
+
+def csv_file_rows(
+    fp: str,
+    task: Any = None,
+    sample_size: int = 1 << 16,
+    encoding: str | None = None,
+) -> Generator[list[str]]:
+    """
+    Streams a .csv/.tsv file without reading it into memory first, the dialect is
+    sniffed from the start of the file, empty trailing cells and empty rows are dropped.
+    A utf-8 guess can still fail part way through, see get_csv_data_from_file()
+    """
+    size = os.path.getsize(fp) or 1
+    with open(fp, "r", encoding=encoding or get_file_encoding(fp, sample_size)) as fh:
+        dialect = sniff_csv_dialect(fh.read(sample_size), delimiters=from_clipboard_delimiters)
+        fh.seek(0)
+        shown = -1
+        for i, r in enumerate(csv.reader(fh, dialect=dialect, skipinitialspace=True)):
+            while r and not r[-1]:
+                r.pop()
+            if r:
+                yield r
+            if task is not None and not i % 10_000:
+                task.check_cancelled()
+                if (pct := fh.buffer.tell() * 100 // size) != shown:
+                    shown = pct
+                    task.progress(f"Loading... {pct}%")
+
+
+def get_csv_data_from_file(fp: str, task: Any = None) -> list[list[str]]:
+    encoding = get_file_encoding(fp)
+    try:
+        return list(csv_file_rows(fp, task=task, encoding=encoding))
+    except UnicodeDecodeError:
+        # utf-8 was a guess from the start of the file
+        if encoding != "utf-8":
+            raise
+        return list(csv_file_rows(fp, task=task, encoding=fallback_encoding()))
 
 
 def new_scrolls(scrolls: None | tuple[float, float, float, float] = None) -> DotDict:
+    from tksheet import DotDict
+
     if scrolls is None:
         scrolls = (0.0, 0.0, 0.0, 0.0)
     return DotDict(
@@ -745,7 +1534,9 @@ def new_scrolls(scrolls: None | tuple[float, float, float, float] = None) -> Dot
     )
 
 
-def new_saved_info(hierarchies: list[int]) -> dict:
+def new_saved_info(hierarchies: list[int]) -> DotDict:
+    from tksheet import DotDict
+
     saved_info = DotDict()
     for h in hierarchies:
         saved_info[h] = new_info_storage()
@@ -760,6 +1551,8 @@ def new_info_storage(
     twidths: None | dict[str, int] = None,
     theights: None | dict[str, int] = None,
 ) -> DotDict:
+    from tksheet import DotDict
+
     return DotDict(
         scrolls=new_scrolls(scrolls=scrolls),
         opens={} if opens is None else opens,
@@ -768,39 +1561,3 @@ def new_info_storage(
         twidths={} if twidths is None else twidths,
         theights={} if theights is None else theights,
     )
-
-
-def create_cell_align_selector_menu(
-    parent,
-    command,
-    menu_kwargs,
-    icons,
-):
-    menu = tk.Menu(parent, tearoff=0, **menu_kwargs)
-    menu.add_command(
-        label="Left",
-        command=lambda: command("w"),
-        image=icons["w"],
-        compound="left",
-        **menu_kwargs,
-    )
-    menu.add_command(
-        label="Center",
-        command=lambda: command("center"),
-        image=icons["c"],
-        compound="left",
-        **menu_kwargs,
-    )
-    menu.add_command(
-        label="Right",
-        command=lambda: command("e"),
-        image=icons["e"],
-        compound="left",
-        **menu_kwargs,
-    )
-    menu.add_command(
-        label="Default",
-        command=lambda: command("global"),
-        **menu_kwargs,
-    )
-    return menu
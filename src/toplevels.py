@@ -15,9 +15,7 @@ from contextlib import suppress
 from itertools import islice, repeat
 from tkinter import filedialog, ttk
 
-from openpyxl import Workbook, load_workbook
-from openpyxl.cell import WriteOnlyCell
-from openpyxl.styles import Font
+from openpyxl import Workbook
 from tksheet import (
     Sheet,
     convert_align,
@@ -27,6 +25,10 @@ from tksheet import (
 from .classes import (
     TreeBuilder,
 )
+from .compare import (
+    ReportIndex,
+    write_report,
+)
 from .constants import (
     BF,
     EF,
@@ -34,10 +36,9 @@ from .constants import (
     ERR_ASK_FNT,
     TF,
     app_title,
-    blue_fill,
     changelog_header,
+    compare_report_page_rows,
     ctrl_button,
-    green_fill,
     lge_font_size,
     menu_kwargs,
     mono_font,
@@ -51,20 +52,22 @@ from .constants import (
 )
 from .functions import (
     b32_x_dict,
-    bytes_io_wb,
     center,
     csv_str_x_data,
     equalize_sublist_lens,
     full_sheet_to_dict,
+    get_csv_data_from_file,
     get_json_format,
     get_json_from_file,
     json_to_sheet,
+    load_xlsx,
     sort_key,
     str_io_csv_writer,
     to_clipboard,
     ws_x_data,
     ws_x_program_data_str,
     xlsx_changelog_header,
+    xlsx_string_sheet,
 )
 from .widgets import (
     Auto_Add_Condition_Date_Frame,
@@ -622,16 +625,16 @@ class Post_Import_Changes_Popup(tk.Toplevel):
         self.sheetdisplay.row_index(0)
         self.sheetdisplay.data_reference(newdataref=changes, reset_col_positions=True, reset_row_positions=True)
         self.sheetdisplay.hide_columns(0)
-        for i, b in enumerate(successful):
-            self.sheetdisplay.highlight(
-                self.sheetdisplay.span(i, index=True),
-                bg="#40bd59" if b else "#db7463",
-                fg="black",
-            )
+        self.sheetdisplay.highlight_rows(
+            rows=[i for i, b in enumerate(successful) if b], bg="#40bd59", fg="black", redraw=False
+        )
+        self.sheetdisplay.highlight_rows(
+            rows=[i for i, b in enumerate(successful) if b is False], bg="#db7463", fg="black", redraw=False
+        )
         self.sheetdisplay.grid(row=0, column=0, sticky="nswe")
         self.status_bar = Status_Bar(
             self,
-            text=f"Successful changes: {sum(successful)}/{len(successful)}",
+            text=f"Successful changes: {sum(1 for b in successful if b)}/{len(successful)}",
             theme=theme,
         )
         self.status_bar.grid(row=1, column=0, sticky="nswe")
@@ -790,7 +793,7 @@ class Changelog_Popup(tk.Toplevel):
         try:
             if newfile.lower().endswith(".xlsx"):
                 self.wb_ = Workbook(write_only=True)
-                ws = self.wb_.create_sheet(title="Changelog")
+                ws = xlsx_string_sheet(self.wb_, title="Changelog")
                 ws.append(xlsx_changelog_header(ws))
                 for row in self.C.changelog:
                     ws.append(e if e else None for e in row)
@@ -849,7 +852,7 @@ class Changelog_Popup(tk.Toplevel):
         try:
             if newfile.lower().endswith(".xlsx"):
                 self.wb_ = Workbook(write_only=True)
-                ws = self.wb_.create_sheet(title="Changelog")
+                ws = xlsx_string_sheet(self.wb_, title="Changelog")
                 ws.append(xlsx_changelog_header(ws))
                 for row in islice(self.C.changelog, from_row, to_row):
                     ws.append(e if e else None for e in row)
@@ -893,11 +896,45 @@ class Compare_Report_Popup(tk.Toplevel):
         self.C = new_toplevel_chores(self, C, f"{app_title} - Comparison Report", resizable=True)
         self.USER_HAS_QUIT = False
         self.protocol("WM_DELETE_WINDOW", self.USER_HAS_CLOSED_WINDOW)
-        self.wb_ = None
-        self.sheet1name = self.C.sheetname_1
-        self.sheet2name = self.C.sheetname_2
+        self.result = self.C.comparison
+        self.index = ReportIndex(self.result)
+        self.selection = self.index.select()
+        self.total_rows = self.index.count(self.selection)
+        self.page_start = 0
+        self.all_sections = "All sections"
+        self.all_columns = "All columns"
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
+
+        self.filter_frame = Frame(self, theme=theme)
+        self.filter_frame.grid(row=0, column=0, sticky="nswe")
+        self.filter_frame.grid_columnconfigure(1, weight=1)
+        self.section_label = Label(self.filter_frame, text="Section:", font=EF, theme=theme, anchor="w")
+        self.section_label.grid(row=0, column=0, sticky="nswe", padx=(20, 10), pady=(10, 2))
+        self.section_dropdown = Ez_Dropdown(self.filter_frame, font=EF)
+        self.section_dropdown["values"] = [self.all_sections] + [section.title for section in self.index.table]
+        self.section_dropdown.set_my_value(self.all_sections)
+        self.section_dropdown.grid(row=0, column=1, sticky="nswe", padx=(0, 20), pady=(10, 2))
+        self.column_label = Label(self.filter_frame, text="Column:", font=EF, theme=theme, anchor="w")
+        self.column_label.grid(row=1, column=0, sticky="nswe", padx=(20, 10), pady=2)
+        self.column_dropdown = Ez_Dropdown(self.filter_frame, font=EF)
+        self.column_dropdown["values"] = [self.all_columns] + self.result.parent_columns + self.result.detail_columns
+        self.column_dropdown.set_my_value(self.all_columns)
+        self.column_dropdown.grid(row=1, column=1, sticky="nswe", padx=(0, 20), pady=2)
+        self.id_label = Label(self.filter_frame, text="ID:", font=EF, theme=theme, anchor="w")
+        self.id_label.grid(row=2, column=0, sticky="nswe", padx=(20, 10), pady=(2, 10))
+        self.id_entry = Normal_Entry(self.filter_frame, font=EF, theme=theme)
+        self.id_entry.grid(row=2, column=1, sticky="nswe", padx=(0, 20), pady=(2, 10))
+        self.filter_button = Button(self.filter_frame, text="Filter", style="EF.Std.TButton", command=self.filter)
+        self.filter_button.grid(row=0, column=2, rowspan=2, sticky="nswe", padx=(0, 10), pady=(10, 2))
+        self.clear_button = Button(
+            self.filter_frame, text="Clear filters", style="EF.Std.TButton", command=self.clear_filters
+        )
+        self.clear_button.grid(row=2, column=2, sticky="nswe", padx=(0, 10), pady=(2, 10))
+        self.section_dropdown.bind("<<ComboboxSelected>>", lambda event: self.focus_set())
+        self.column_dropdown.bind("<<ComboboxSelected>>", lambda event: self.focus_set())
+        self.id_entry.bind("<Return>", self.filter)
+
         self.sheetdisplay1 = Sheet(
             self,
             theme=theme,
@@ -906,27 +943,10 @@ class Compare_Report_Popup(tk.Toplevel):
             outline_thickness=1,
             default_column_width=250,
             display_selected_fg_over_highlights=True,
-            treeview=True,
-        )
-        self.sheetdisplay1.insert(text="", values=[self.C.report_header])
-        self.sheetdisplay1.column_width(0, "text")
-        for header_row, rows in self.C.report.items():
-            row = len(self.sheetdisplay1.data)
-            self.sheetdisplay1.insert(iid=header_row, text="Result", values=[header_row])
-            self.sheetdisplay1.highlight(
-                self.sheetdisplay1.span((row, 0)),
-                bg="#648748",
-                fg="white",
-            )
-            row = len(self.sheetdisplay1.data)
-            self.sheetdisplay1.bulk_insert(data=rows, parent=header_row)
-            if len(rows[0]) > 1:
-                self.sheetdisplay1.highlight(
-                    row,
-                    bg="#0078d7",
-                    fg="white",
-                )
+        )
         self.sheetdisplay1.grid(row=1, column=0, sticky="nswe")
+        self.status_bar = Status_Bar(self, text=self.result.report_header, theme=theme)
+        self.status_bar.grid(row=2, column=0, sticky="nswe")
         self.buttonframe = Frame(self, theme=theme)
         self.buttonframe.grid(row=3, column=0, sticky="nswe")
         self.cancel_button = Button(self.buttonframe, text="Done", style="EF.Std.TButton", command=self.cancel)
@@ -938,10 +958,76 @@ class Compare_Report_Popup(tk.Toplevel):
             command=self.save_report,
         )
         self.save_text_button.pack(side="right", padx=(50, 30), pady=20)
+        self.next_button = Button(self.buttonframe, text="Next page", style="EF.Std.TButton", command=self.next_page)
+        self.next_button.pack(side="right", padx=(20, 0), pady=20)
+        self.previous_button = Button(
+            self.buttonframe, text="Previous page", style="EF.Std.TButton", command=self.previous_page
+        )
+        self.previous_button.pack(side="right", padx=(20, 0), pady=20)
+        self.show_page()
+        if self.total_rows:
+            self.sheetdisplay1.column_width(0, "text")
         self.enable_widgets()
         self.bind("<Escape>", self.cancel)
         show_toplevel_chores(self, width, height)
 
+    def show_page(self):
+        # only the rows of the current page are made and put in the sheet
+        data, titles, headers = [], [], []
+        for r, (_, i, row) in enumerate(
+            self.index.page(self.selection, self.page_start, self.page_start + compare_report_page_rows)
+        ):
+            if i == -1:
+                titles.append(r)
+            elif i == 0 and len(row) > 1:
+                headers.append(r)
+            data.append(row)
+        self.sheetdisplay1.dehighlight_all(redraw=False)
+        self.sheetdisplay1.set_sheet_data(data=data, reset_col_positions=False, redraw=False)
+        self.sheetdisplay1.highlight_rows(rows=titles, bg="#648748", fg="white", redraw=False)
+        self.sheetdisplay1.highlight_rows(rows=headers, bg="#0078d7", fg="white", redraw=False)
+        if data:
+            self.sheetdisplay1.see(0, 0, redraw=False)
+        self.sheetdisplay1.refresh()
+        self.status_bar.change_text(self.page_text())
+
+    def page_text(self):
+        if not self.total_rows:
+            return f"{self.result.report_header} | No matching rows"
+        stop = min(self.page_start + compare_report_page_rows, self.total_rows)
+        return f"{self.result.report_header} | Rows {self.page_start + 1:,} to {stop:,} of {self.total_rows:,}"
+
+    def next_page(self, event=None):
+        if self.page_start + compare_report_page_rows < self.total_rows:
+            self.page_start += compare_report_page_rows
+            self.show_page()
+            self.enable_widgets()
+
+    def previous_page(self, event=None):
+        if self.page_start:
+            self.page_start = max(self.page_start - compare_report_page_rows, 0)
+            self.show_page()
+            self.enable_widgets()
+
+    def filter(self, event=None):
+        section = self.section_dropdown.current()
+        column = self.column_dropdown.get_my_value()
+        self.selection = self.index.select(
+            section=section - 1 if section > 0 else None,
+            ID=self.id_entry.get().strip(),
+            column="" if column == self.all_columns else column,
+        )
+        self.total_rows = self.index.count(self.selection)
+        self.page_start = 0
+        self.show_page()
+        self.enable_widgets()
+
+    def clear_filters(self, event=None):
+        self.section_dropdown.set_my_value(self.all_sections)
+        self.column_dropdown.set_my_value(self.all_columns)
+        self.id_entry.delete(0, "end")
+        self.filter()
+
     def start_work(self, msg=""):
         if msg:
             self.C.C.status_bar.change_text(msg)
@@ -970,21 +1056,24 @@ class Compare_Report_Popup(tk.Toplevel):
             "find",
         )
         self.save_text_button.config(state="normal")
+        self.filter_button.config(state="normal")
+        self.clear_button.config(state="normal")
+        self.previous_button.config(state="normal" if self.page_start else "disabled")
+        self.next_button.config(
+            state="normal" if self.page_start + compare_report_page_rows < self.total_rows else "disabled"
+        )
 
     def disable_widgets(self):
         self.sheetdisplay1.disable_bindings()
         self.save_text_button.config(state="disabled")
+        self.filter_button.config(state="disabled")
+        self.clear_button.config(state="disabled")
+        self.previous_button.config(state="disabled")
+        self.next_button.config(state="disabled")
         self.update()
 
-    def try_to_close_wb(self):
-        with suppress(Exception):
-            self.wb_.close()
-        with suppress(Exception):
-            self.wb_ = None
-
     def USER_HAS_CLOSED_WINDOW(self, callback=None):
         self.USER_HAS_QUIT = True
-        self.try_to_close_wb()
         self.destroy()
 
     def save_report(self):
@@ -992,7 +1081,7 @@ class Compare_Report_Popup(tk.Toplevel):
         newfile = filedialog.asksaveasfilename(
             parent=self,
             title="Save as",
-            filetypes=[("Excel file", ".xlsx")],
+            filetypes=[("Excel file", ".xlsx"), ("CSV File", ".csv"), ("TSV File", ".tsv"), ("JSON File", ".json")],
             defaultextension=".xlsx",
             confirmoverwrite=True,
         )
@@ -1000,46 +1089,19 @@ class Compare_Report_Popup(tk.Toplevel):
             self.stop_work()
             return
         newfile = os.path.normpath(newfile)
-        if not newfile.lower().endswith(".xlsx"):
-            self.stop_work("Can only save .xlsx file type")
+        if not newfile.lower().endswith((".csv", ".xlsx", ".json", ".tsv")):
+            self.stop_work("Can only save .csv/.tsv/.xlsx/.json file types")
             return
-        white_font = Font(color="00FFFFFF")
+        self.C.C.status_bar.change_text("Saving...")
         try:
-            if newfile.lower().endswith(".xlsx"):
-                self.wb_ = Workbook(write_only=True)
-                ws = self.wb_.create_sheet(title="Report")
-                row_ctr = 3
-                for rows in self.C.report.values():
-                    ws.row_dimensions.group(
-                        row_ctr,
-                        row_ctr + len(rows) - 1,
-                        outline_level=1,
-                        hidden=True,
-                    )
-                    row_ctr += 1 + len(rows)
-                ws.append([self.C.report_header])
-                for header_row, rows in self.C.report.items():
-                    cell = WriteOnlyCell(ws, value=header_row)
-                    cell.fill = green_fill
-                    cell.font = white_font
-                    ws.append([cell])
-                    if len(rows[0]) > 1:
-                        row = []
-                        for val in rows[0]:
-                            cell = WriteOnlyCell(ws, value=val)
-                            cell.fill = blue_fill
-                            cell.font = white_font
-                            row.append(cell)
-                        ws.append(row)
-                        for row in islice(rows, 1, None):
-                            ws.append(e if e != "" else None for e in row)
-                    else:
-                        for row in rows:
-                            ws.append(e if e != "" else None for e in row)
-                self.wb_.save(newfile)
-                self.try_to_close_wb()
+            # the filtered rows are written as they are made
+            write_report(
+                self.result,
+                newfile,
+                dialect=csv.excel_tab if newfile.lower().endswith(".tsv") else csv.excel,
+                sections=self.index.sections(self.selection),
+            )
         except Exception as error_msg:
-            self.try_to_close_wb()
             self.stop_work(f"Error saving file: {error_msg}")
             return
         self.stop_work("Success! Report saved")
@@ -1509,9 +1571,7 @@ class Sheet_File_Load_Mixin:
         try:
             self.status_bar.change_text("Loading...")
             if filepath.lower().endswith((".csv", ".tsv")):
-                with open(filepath, "r") as fh:
-                    temp_data = fh.read()
-                self.C.new_sheet = _limit_sheet_columns(csv_str_x_data(temp_data), self.load_column_limit)
+                self.C.new_sheet = _limit_sheet_columns(get_csv_data_from_file(filepath), self.load_column_limit)
 
             elif filepath.lower().endswith(".json"):
                 j = get_json_from_file(filepath)
@@ -1534,8 +1594,7 @@ class Sheet_File_Load_Mixin:
                 self.C.new_sheet = _limit_sheet_columns(self.C.new_sheet, self.load_column_limit)
 
             elif filepath.lower().endswith((".xlsx", ".xls", ".xlsm")):
-                in_mem = bytes_io_wb(filepath)
-                self.wb_ = load_workbook(in_mem, read_only=True, data_only=True)
+                self.wb_ = load_xlsx(filepath)
                 wbsheets = self.wb_.sheetnames
                 if not wbsheets:
                     self.stop_work("Error: File/sheet contained no data")
@@ -2434,9 +2493,7 @@ class Merge_Sheets_Popup(tk.Toplevel):
             return
         try:
             if filepath.lower().endswith((".csv", ".tsv")):
-                with open(filepath, "r") as fh:
-                    temp_data = fh.read()
-                self.C.new_sheet = csv_str_x_data(temp_data)
+                self.C.new_sheet = get_csv_data_from_file(filepath)
                 equalize_sublist_lens(self.C.new_sheet)
                 self.load_display(self.C.new_sheet[0])
                 self.stop_work("Ready to merge sheets")
@@ -2462,8 +2519,7 @@ class Merge_Sheets_Popup(tk.Toplevel):
                 self.load_display(self.C.new_sheet[0])
                 self.stop_work("Ready to merge sheets")
             elif filepath.lower().endswith((".xlsx", ".xls", ".xlsm")):
-                in_mem = bytes_io_wb(filepath)
-                self.wb_ = load_workbook(in_mem, read_only=True, data_only=True)
+                self.wb_ = load_xlsx(filepath)
                 wbsheets = self.wb_.sheetnames
                 if not wbsheets:
                     self.stop_work("Error: File/sheet contained no data", sels=True)
@@ -2494,7 +2550,7 @@ class Merge_Sheets_Popup(tk.Toplevel):
                     except Exception:
                         self.C.new_sheet = []
                         self.wb_.close()
-                        self.wb_ = load_workbook(in_mem, read_only=True, data_only=True)
+                        self.wb_ = load_xlsx(filepath)
                         self.stop_work("Error: Error opening program data")
                         self.sheet_dropdown["values"] = wbsheets
                         self.sheet_dropdown.set_my_value(wbsheets[0])
@@ -4181,6 +4237,16 @@ class Settings_Popup(tk.Toplevel):
         )
         self.xlsx_app_data_button.pack(side="top", anchor="nw", fill="x", pady=10)
 
+        self.compact_app_data_button = X_Checkbutton(
+            self.xlsx,
+            text="Compact app data (xlsx & json) ",
+            style="x_button.Std.TButton",
+            command=self.toggle_compact_app_data,
+            checked=self.C.save_compact_program_data,
+            compound="right",
+        )
+        self.compact_app_data_button.pack(side="top", anchor="nw", fill="x", pady=10)
+
         self.xlsx_changelog_button = X_Checkbutton(
             self.xlsx,
             text="Save with changelog ",
@@ -4280,6 +4346,16 @@ class Settings_Popup(tk.Toplevel):
         )
         self.json_app_data_button.pack(side="top", anchor="nw", fill="x", pady=10)
 
+        self.json_indent_button = X_Checkbutton(
+            self.json,
+            text="Indent saved json ",
+            style="x_button.Std.TButton",
+            command=self.toggle_json_indent,
+            checked=self.C.save_json_indented,
+            compound="right",
+        )
+        self.json_indent_button.pack(side="top", anchor="nw", fill="x", pady=10)
+
         self.json_format_label = Label(self.json, text="json Format: ", font=EFB, theme=theme, anchor="nw")
         self.json_format_label.pack(side="top", anchor="nw", fill="x", pady=(10, 0))
 
@@ -4561,6 +4637,10 @@ class Settings_Popup(tk.Toplevel):
         self.C.save_xlsx_with_program_data = self.xlsx_app_data_button.get_checked()
         self.C.C.save_cfg()
 
+    def toggle_compact_app_data(self):
+        self.C.save_compact_program_data = self.compact_app_data_button.get_checked()
+        self.C.C.save_cfg()
+
     def toggle_xlsx_changelog(self):
         self.C.save_xlsx_with_changelog = self.xlsx_changelog_button.get_checked()
         self.C.C.save_cfg()
@@ -4593,6 +4673,10 @@ class Settings_Popup(tk.Toplevel):
         self.C.save_json_with_program_data = self.json_app_data_button.get_checked()
         self.C.C.save_cfg()
 
+    def toggle_json_indent(self):
+        self.C.save_json_indented = self.json_indent_button.get_checked()
+        self.C.C.save_cfg()
+
     def set_json_format(self, event=None):
         self.C.json_format = int(self.json_format_dropdown.get_my_value()[0])
         self.C.C.save_cfg()
@@ -3,17 +3,15 @@
 
 import os
 import tkinter as tk
-from collections import defaultdict
 from contextlib import suppress
-from itertools import repeat
 from tkinter import filedialog, ttk
 
-from openpyxl import load_workbook
 from tksheet import Sheet
 
 from .classes import (
-    TreeBuilder,
+    TaskCancelled,
 )
+from .compare import compare_sheets
 from .constants import (
     EF,
     TF,
@@ -21,12 +19,11 @@ from .constants import (
 )
 from .functions import (
     b32_x_dict,
-    bytes_io_wb,
-    csv_str_x_data,
+    get_csv_data_from_file,
     get_json_format,
     get_json_from_file,
     json_to_sheet,
-    sort_key,
+    load_xlsx,
     ws_x_data,
     ws_x_program_data_str,
 )
@@ -36,11 +33,13 @@ from .toplevels import (
     Error,
 )
 from .widgets import (
+    BackgroundTask,
     Button,
     Frame,
     Id_Parent_Column_Selector,
     Label,
     Readonly_Entry,
+    X_Checkbutton,
 )
 
 
@@ -48,17 +47,9 @@ class Tree_Compare(tk.Frame):
     def __init__(self, parent, C):
         tk.Frame.__init__(self, parent)
         self.C = C
-        self.heads1 = []
-        self.heads2 = []
         self.data1 = []
         self.data2 = []
-        self.sheet1 = []
-        self.sheet2 = []
-        self.nodes1 = {}
-        self.nodes2 = {}
-        self.rns1 = {}
-        self.rns2 = {}
-        self.report = []
+        self.comparison = None
         self.ic1 = 0
         self.ic2 = 0
         self.parent_cols1 = []
@@ -188,6 +179,14 @@ class Tree_Compare(tk.Frame):
         self.selector_2.config(width=400, height=330)
         self.selector_2.grid(row=3, column=0, sticky="nswe")
 
+        self.structural_button = X_Checkbutton(
+            self.r_frame_btns,
+            text="Group moved branches ",
+            style="x_button.Std.TButton",
+            compound="right",
+        )
+        self.structural_button.grid(row=3, column=1, padx=10, pady=20, sticky="ews")
+
         self.sheetdisplay2 = Sheet(
             self.r_frame,
             theme=self.C.theme,
@@ -270,6 +269,7 @@ class Tree_Compare(tk.Frame):
         self.selector_2.enable_me()
         self.sheetdisplay2.enable_bindings("all", "ctrl_select", "find")
         self.run_compare_button.config(state="normal")
+        self.structural_button.config(state="normal")
         self.sheetdisplay2.basic_bindings(True)
         self.sheetdisplay2.bind("<<SheetModified>>", self.sheet_modified2)
 
@@ -295,6 +295,7 @@ class Tree_Compare(tk.Frame):
         self.selector_2.disable_me()
         self.sheetdisplay2.disable_bindings()
         self.run_compare_button.config(state="disabled")
+        self.structural_button.config(state="disabled")
         self.sheetdisplay2.basic_bindings(False)
         self.sheetdisplay2.unbind("<<SheetModified>>")
 
@@ -322,15 +323,8 @@ class Tree_Compare(tk.Frame):
         with suppress(Exception):
             self.C.wb.close()
         self.C.wb = None
-        self.heads1 = []
         self.data1 = []
-        self.sheet1 = []
-        self.sheet2 = []
-        self.nodes1 = {}
-        self.nodes2 = {}
-        self.rns1 = {}
-        self.rns2 = {}
-        self.report = []
+        self.comparison = None
         self.ic1 = 0
         self.parent_cols1 = []
         self.row_len1 = 0
@@ -351,15 +345,8 @@ class Tree_Compare(tk.Frame):
         with suppress(Exception):
             self.C.wb.close()
         self.C.wb = None
-        self.heads2 = []
         self.data2 = []
-        self.sheet1 = []
-        self.sheet2 = []
-        self.nodes1 = {}
-        self.nodes2 = {}
-        self.rns1 = {}
-        self.rns2 = {}
-        self.report = []
+        self.comparison = None
         self.ic2 = 0
         self.parent_cols2 = []
         self.row_len2 = 0
@@ -404,9 +391,7 @@ class Tree_Compare(tk.Frame):
             return
         try:
             if filepath.lower().endswith((".csv", ".tsv")):
-                with open(filepath, "r") as fh:
-                    temp_data = fh.read()
-                self.data1 = csv_str_x_data(temp_data)
+                self.data1 = get_csv_data_from_file(filepath)
                 if not self.data1:
                     Error(self, "File contains no data   ", theme=self.C.theme)
                     self.stop_work("Program ready")
@@ -433,8 +418,7 @@ class Tree_Compare(tk.Frame):
                 self.load_display1()
                 self.stop_work("Program ready")
             else:
-                in_mem = bytes_io_wb(filepath)
-                self.C.wb = load_workbook(in_mem, read_only=True, data_only=True)
+                self.C.wb = load_xlsx(filepath)
                 if len(self.C.wb.sheetnames) < 1:
                     Error(self, "File contains no data   ", theme=self.C.theme)
                     self.stop_work("Program ready")
@@ -459,7 +443,7 @@ class Tree_Compare(tk.Frame):
                     except Exception:
                         self.data1 = []
                         self.C.wb.close()
-                        self.C.wb = load_workbook(in_mem, read_only=True, data_only=True)
+                        self.C.wb = load_xlsx(filepath)
                         Error(self, "Error opening program data, select a sheet   ", theme=self.C.theme)
                         self.sheet_dropdown1["values"] = self.C.wb.sheetnames
                         self.sheet_dropdown_displayed1.set(self.C.wb.sheetnames[0])
@@ -530,9 +514,7 @@ class Tree_Compare(tk.Frame):
             return
         try:
             if filepath.lower().endswith((".csv", ".tsv")):
-                with open(filepath, "r") as fh:
-                    temp_data = fh.read()
-                self.data2 = csv_str_x_data(temp_data)
+                self.data2 = get_csv_data_from_file(filepath)
                 if not self.data2:
                     Error(self, "File contains no data   ", theme=self.C.theme)
                     self.stop_work("Program ready")
@@ -554,9 +536,8 @@ class Tree_Compare(tk.Frame):
                 self.load_display2()
                 self.stop_work("Program ready")
             else:
-                in_mem = bytes_io_wb(filepath)
                 try:
-                    self.C.wb = load_workbook(in_mem, read_only=True, data_only=True)
+                    self.C.wb = load_xlsx(filepath)
                 except Exception:
                     Error(self, "Error opening file   ", theme=self.C.theme)
                     self.stop_work("Program ready")
@@ -585,7 +566,7 @@ class Tree_Compare(tk.Frame):
                     except Exception:
                         self.data2 = []
                         self.C.wb.close()
-                        self.C.wb = load_workbook(in_mem, read_only=True, data_only=True)
+                        self.C.wb = load_xlsx(filepath)
                         Error(self, "Error opening program data, select a sheet   ", theme=self.C.theme)
                         self.sheet_dropdown2["values"] = self.C.wb.sheetnames
                         self.sheet_dropdown_displayed2.set(self.C.wb.sheetnames[0])
@@ -632,33 +613,6 @@ class Tree_Compare(tk.Frame):
         self.row_len1 = max(map(len, self.sheetdisplay1.data), default=0)
         self.row_len2 = max(map(len, self.sheetdisplay2.data), default=0)
 
-    def heads_comparison(self, heads, datavar, addition):
-        if datavar == 1:
-            row_len = self.row_len1
-        elif datavar == 2:
-            row_len = self.row_len2
-        if len(heads) < row_len:
-            heads += list(repeat("", row_len - len(heads)))
-        tally_of_heads = defaultdict(lambda: -1)
-        for coln in range(len(heads)):
-            cell = heads[coln]
-            if not cell:
-                cell = f"MISSING_{coln + 1}"
-                addition.append([f" - Missing header in column #{coln + 1}"])
-            hk = cell.lower()
-            tally_of_heads[hk] += 1
-            if tally_of_heads[hk] > 0:
-                orig = cell
-                x = 1
-                while hk in tally_of_heads:
-                    cell = f"{orig}_DUPLICATED_{x}"
-                    hk = cell.lower()
-                    x += 1
-                tally_of_heads[hk] += 1
-                addition.append([f" - Duplicate header in column #{coln + 1}"])
-            heads[coln] = cell
-        return heads, addition
-
     def run_comparison(self):
         self.ic1 = self.selector_1.get_id_col()
         self.parent_cols1 = list(self.selector_1.get_par_cols())
@@ -682,371 +636,28 @@ class Tree_Compare(tk.Frame):
         else:
             self.sheetname_1 = self.filename_1
             self.sheetname_2 = self.filename_2
-        self.sheet1 = []
-        self.sheet2 = []
-        self.nodes1 = {}
-        self.nodes2 = {}
-        self.rns1 = {}
-        self.rns2 = {}
-        self.set_row_lens()
-        self.report = defaultdict(list)
-        self.report_header = f"Comparison report for:  {self.filename_1}  and  {self.filename_2}"
-        self.heads1, addition1 = self.heads_comparison(self.sheetdisplay1.data[0].copy(), 1, [])
-        self.sheet1, self.nodes1, addition1, self.rns1 = TreeBuilder().build(
-            input_sheet=self.sheetdisplay1.data,
-            output_sheet=self.sheet1,
-            row_len=self.row_len1,
-            ic=self.ic1,
-            hiers=self.parent_cols1,
-            nodes=self.nodes1,
-            warnings=addition1,
-            rns=self.rns1,
-            add_warnings=True,
-            skip_1st=True,
-            compare=True,
-            fix_associate=True,
-            strip=False,
-        )
-        self.heads2, addition2 = self.heads_comparison(self.sheetdisplay2.data[0].copy(), 2, [])
-        self.sheet2, self.nodes2, addition2, self.rns2 = TreeBuilder().build(
-            input_sheet=self.sheetdisplay2.data,
-            output_sheet=self.sheet2,
-            row_len=self.row_len2,
-            ic=self.ic2,
-            hiers=self.parent_cols2,
-            nodes=self.nodes2,
-            warnings=addition2,
-            rns=self.rns2,
-            add_warnings=True,
-            skip_1st=True,
-            compare=True,
-            fix_associate=True,
-            strip=False,
-        )
-
-        if addition1:
-            self.report[f"Warnings {self.sheetname_1}:"].extend([[warning] for warning in addition1])
-        if addition2:
-            self.report[f"Warnings {self.sheetname_2}:"].extend([[warning] for warning in addition2])
-
-        parcolset1 = set(self.parent_cols1)
-        parcolset2 = set(self.parent_cols2)
-        pcold = defaultdict(list)
-        for i, h in enumerate(self.heads1):
-            if i in parcolset1:
-                pcold[h].append(i)
-        for i, h in enumerate(self.heads2):
-            if i in parcolset2:
-                pcold[h].append(i)
-        detcold = defaultdict(list)
-        ic_parcolset1 = {self.ic1} | parcolset1
-        ic_parcolset2 = {self.ic2} | parcolset2
-        for i, h in enumerate(self.heads1):
-            if i not in ic_parcolset1:
-                detcold[h].append(i)
-        for i, h in enumerate(self.heads2):
-            if i not in ic_parcolset2:
-                detcold[h].append(i)
-        matching_hrs_names = sorted((k for k, v in pcold.items() if len(v) > 1), key=sort_key)
-        matching_details_names = sorted((k for k, v in detcold.items() if len(v) > 1), key=sort_key)
-
-        # id column index
-        if self.ic1 != self.ic2:
-            self.report["Difference in ID Column Index"].append([f"{self.sheetname_1}", f"{self.sheetname_2}"])
-            self.report["Difference in ID Column Index"].append(
-                [
-                    f"{self.ic1 + 1}",
-                    f"{self.ic2 + 1}",
-                ]
-            )
-
-        # id column names
-        if self.heads1[self.ic1] != self.heads2[self.ic2]:
-            self.report["Difference in ID Column Name"].append([f"{self.sheetname_1}", f"{self.sheetname_2}"])
-            self.report["Difference in ID Column Name"].append(
-                [
-                    f"{self.heads1[self.ic1]}",
-                    f"{self.heads2[self.ic2]}",
-                ]
-            )
-
-        # sheets have some or all matching parent column names
-        if matching_hrs_names:
-            hdset1 = {h for i, h in enumerate(self.heads1) if i in parcolset1}
-            hdset2 = {h for i, h in enumerate(self.heads2) if i in parcolset2}
-            if any(h not in hdset2 for h in hdset1):
-                self.report[f"New Parent Columns {self.sheetname_1}"].extend(
-                    [[f"{h}"] for h in hdset1 if h not in hdset2]
-                )
-            if any(h not in hdset1 for h in hdset2):
-                self.report[f"New Parent Columns {self.sheetname_2}"].extend(
-                    [[f"{h}"] for h in hdset2 if h not in hdset1]
-                )
-            if any(col_indexes[0] != col_indexes[1] for col_indexes in pcold.values() if len(col_indexes) > 1):
-                self.report["Differences in Parent Column Indexes"].append(
-                    [
-                        "NAME",
-                        f"{self.sheetname_1}",
-                        f"{self.sheetname_2}",
-                    ]
-                )
-                self.report["Differences in Parent Column Indexes"].extend(
-                    [
-                        [name, col_indexes[0], col_indexes[1]]
-                        for name, col_indexes in pcold.items()
-                        if len(col_indexes) > 1 and col_indexes[0] != col_indexes[1]
-                    ]
-                )
-        # sheets have no matching parent column names
-        else:
-            self.report["Parent Columns"].append(["Sheets have no matching parent column names."])
-
-        # sheets have some or all matching detail column names
-        if matching_details_names:
-            hdset1 = {h for i, h in enumerate(self.heads1) if i not in ic_parcolset1}
-            hdset2 = {h for i, h in enumerate(self.heads2) if i not in ic_parcolset2}
-            if any(h not in hdset2 for h in hdset1):
-                self.report[f"New Detail Columns {self.sheetname_1}"].extend(
-                    [[f"{h}"] for h in hdset1 if h not in hdset2]
-                )
-            if any(h not in hdset1 for h in hdset2):
-                self.report[f"New Detail Columns {self.sheetname_2}"].extend(
-                    [[f"{h}"] for h in hdset2 if h not in hdset1]
-                )
-            if any(col_indexes[0] != col_indexes[1] for col_indexes in detcold.values() if len(col_indexes) > 1):
-                self.report["Differences in Detail Column Indexes"].append(
-                    [
-                        "NAME",
-                        f"{self.sheetname_1}",
-                        f"{self.sheetname_2}",
-                    ]
-                )
-                self.report["Differences in Detail Column Indexes"].extend(
-                    [
-                        [name, col_indexes[0], col_indexes[1]]
-                        for name, col_indexes in detcold.items()
-                        if len(col_indexes) > 1 and col_indexes[0] != col_indexes[1]
-                    ]
-                )
-        # sheets have no matching detail column names
-        else:
-            self.report["Detail Columns"].append(["Sheets have no matching detail column names."])
-
-        # sheets have no matching ids
-        if not any(node in self.nodes2 for node in self.nodes1) and not any(
-            node in self.nodes1 for node in self.nodes2
-        ):
-            self.report["IDs"].append(["Sheets have no matching IDs"])
-
-        # sheets share some or all ids
-        else:
-            if any(ik not in self.nodes2 for ik in self.nodes1):
-                self.report[f"New IDs {self.sheetname_1}"].extend(
-                    [[f"{self.nodes1[ik].name}"] for ik in self.nodes1 if ik not in self.nodes2]
-                )
-            if any(ik not in self.nodes1 for ik in self.nodes2):
-                self.report[f"New IDs {self.sheetname_2}"].extend(
-                    [[f"{self.nodes2[ik].name}"] for ik in self.nodes2 if ik not in self.nodes1]
-                )
-
-            if matching_hrs_names:
-                if self.row_len1 >= self.row_len2:
-                    for row in self.sheet2:
-                        ID = row[self.ic2]
-                        if (ik := ID.lower()) in self.nodes1:
-                            for nx in matching_hrs_names:
-                                h1 = pcold[nx][0]
-                                h2 = pcold[nx][1]
-                                p1 = self.nodes1[ik].ps[h1]
-                                p2 = self.nodes2[ik].ps[h2]
-                                if p1 != p2 and p1 is None:
-                                    if p2 == "":
-                                        self.report["Differences in Parents/Details of Matched IDs"].append(
-                                            [
-                                                f"{ID}",
-                                                f"Present in hierarchy: {nx} in {self.sheetname_2} and not {self.sheetname_1}",
-                                                "Not present",
-                                                "Appears as top ID",
-                                            ]
-                                        )
-                                    elif p2:
-                                        self.report["Differences in Parents/Details of Matched IDs"].append(
-                                            [
-                                                f"{ID}",
-                                                f"Present in hierarchy: {nx} in {self.sheetname_2} and not {self.sheetname_1}",
-                                                "Not present",
-                                                f"{self.nodes2[self.nodes2[ik].ps[h2]].name}",
-                                            ]
-                                        )
-                                elif p1 != p2 and p2 is None:
-                                    if p1 == "":
-                                        self.report["Differences in Parents/Details of Matched IDs"].append(
-                                            [
-                                                f"{ID}",
-                                                f"Present in hierarchy: {nx} in {self.sheetname_1} and not {self.sheetname_2}",
-                                                "Appears as top ID",
-                                                "Not present",
-                                            ]
-                                        )
-                                    elif p1:
-                                        self.report["Differences in Parents/Details of Matched IDs"].append(
-                                            [
-                                                f"{ID}",
-                                                f"Present in hierarchy: {nx} in {self.sheetname_1} and not {self.sheetname_2}",
-                                                f"{self.nodes1[self.nodes1[ik].ps[h1]].name}",
-                                                "Not present",
-                                            ]
-                                        )
-                                elif p1 != p2 and p1 == "":
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [
-                                            f"{ID}",
-                                            f"Parents in hierarchy: {nx}",
-                                            "Appears as top ID",
-                                            f"{self.nodes2[self.nodes2[ik].ps[h2]].name}",
-                                        ]
-                                    )
-                                elif p1 != p2 and p2 == "":
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [
-                                            f"{ID}",
-                                            f"Parents in hierarchy: {nx}",
-                                            f"{self.nodes1[self.nodes1[ik].ps[h1]].name}",
-                                            "Appears as top ID",
-                                        ]
-                                    )
-                                elif p1 != p2:
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [
-                                            f"{ID}",
-                                            f"Parents in hierarchy: {nx}",
-                                            f"{self.nodes1[self.nodes1[ik].ps[h1]].name}",
-                                            f"{self.nodes2[self.nodes2[ik].ps[h2]].name}",
-                                        ]
-                                    )
-                            for nx in matching_details_names:
-                                c1 = self.sheet1[self.rns1[ik]][detcold[nx][0]]
-                                c2 = row[detcold[nx][1]]
-                                if c1.lower() != c2.lower():
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [f"{ID}", f"Details in column: {nx}", f"{c1}", f"{c2}"]
-                                    )
-                elif self.row_len1 < self.row_len2:
-                    for row in self.sheet1:
-                        ID = row[self.ic1]
-                        if (ik := ID.lower()) in self.nodes2:
-                            for nx in matching_hrs_names:
-                                h1 = pcold[nx][0]
-                                h2 = pcold[nx][1]
-                                p1 = self.nodes1[ik].ps[h1]
-                                p2 = self.nodes2[ik].ps[h2]
-                                if p1 != p2 and p1 is None:
-                                    if p2 == "":
-                                        self.report["Differences in Parents/Details of Matched IDs"].append(
-                                            [
-                                                f"{ID}",
-                                                f"Present in hierarchy: {nx} in {self.sheetname_2} and not {self.sheetname_1}",
-                                                "Not present",
-                                                "Appears as top ID",
-                                            ]
-                                        )
-                                    elif p2:
-                                        self.report["Differences in Parents/Details of Matched IDs"].append(
-                                            [
-                                                f"{ID}",
-                                                f"Present in hierarchy: {nx} in {self.sheetname_2} and not {self.sheetname_1}",
-                                                "Not present",
-                                                f"{self.nodes2[self.nodes2[ik].ps[h2]].name}",
-                                            ]
-                                        )
-                                elif p1 != p2 and p2 is None:
-                                    if p1 == "":
-                                        self.report["Differences in Parents/Details of Matched IDs"].append(
-                                            [
-                                                f"{ID}",
-                                                f"Present in hierarchy: {nx} in {self.sheetname_1} and not {self.sheetname_2}",
-                                                "Appears as top ID",
-                                                "Not present",
-                                            ]
-                                        )
-                                    elif p1:
-                                        self.report["Differences in Parents/Details of Matched IDs"].append(
-                                            [
-                                                f"{ID}",
-                                                f"Present in hierarchy: {nx} in {self.sheetname_1} and not {self.sheetname_2}",
-                                                f"{self.nodes1[self.nodes1[ik].ps[h1]].name}",
-                                                "Not present",
-                                            ]
-                                        )
-                                elif p1 != p2 and p1 == "":
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [
-                                            f"{ID}",
-                                            f"Parents in hierarchy: {nx}",
-                                            "Appears as top ID",
-                                            f"{self.nodes2[self.nodes2[ik].ps[h2]].name}",
-                                        ]
-                                    )
-                                elif p1 != p2 and p2 == "":
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [
-                                            f"{ID}",
-                                            f"Parents in hierarchy: {nx}",
-                                            f"{self.nodes1[self.nodes1[ik].ps[h1]].name}",
-                                            "Appears as top ID",
-                                        ]
-                                    )
-                                elif p1 != p2:
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [
-                                            f"{ID}",
-                                            f"Parents in hierarchy: {nx}",
-                                            f"{self.nodes1[self.nodes1[ik].ps[h1]].name}",
-                                            f"{self.nodes2[self.nodes2[ik].ps[h2]].name}",
-                                        ]
-                                    )
-                            for nx in matching_details_names:
-                                c1 = row[detcold[nx][0]]
-                                c2 = self.sheet2[self.rns2[ik]][detcold[nx][1]]
-                                if c1.lower() != c2.lower():
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [f"{ID}", f"Details in column: {nx}", f"{c1}", f"{c2}"]
-                                    )
-
-            elif not matching_hrs_names:
-                if self.row_len1 >= self.row_len2:
-                    for row in self.sheet2:
-                        ID = row[self.ic2]
-                        if (ik := ID.lower()) in self.nodes1:
-                            for nx in matching_details_names:
-                                c1 = self.sheet1[self.rns1[ik]][detcold[nx][0]]
-                                c2 = row[detcold[nx][1]]
-                                if c1.lower() != c2.lower():
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [f"{ID}", f"Details in column: {nx}", f"{c1}", f"{c2}"]
-                                    )
-                elif self.row_len1 < self.row_len2:
-                    for row in self.sheet1:
-                        ID = row[self.ic1]
-                        if (ik := ID.lower()) in self.nodes2:
-                            for nx in matching_details_names:
-                                c1 = row[detcold[nx][0]]
-                                c2 = self.sheet2[self.rns2[ik]][detcold[nx][1]]
-                                if c1.lower() != c2.lower():
-                                    self.report["Differences in Parents/Details of Matched IDs"].append(
-                                        [f"{ID}", f"Details in column: {nx}", f"{c1}", f"{c2}"]
-                                    )
-            if "Differences in Parents/Details of Matched IDs" in self.report:
-                self.report["Differences in Parents/Details of Matched IDs"] = [
-                    [
-                        "ID",
-                        "DIFFERENCE",
-                        self.sheetname_1,
-                        self.sheetname_2,
-                    ]
-                ] + self.report["Differences in Parents/Details of Matched IDs"]
-
-        if not self.report:
-            self.report_header += " - Sheets are identical"
+        task = BackgroundTask(self, self.C.status_bar)
+        try:
+            task.run(self.build_comparison_report, task)
+        except TaskCancelled:
+            self.stop_work("Comparison cancelled")
+            return
         self.stop_work("Program ready")
         Compare_Report_Popup(self, theme=self.C.theme)
+
+    def build_comparison_report(self, task: BackgroundTask) -> None:
+        self.set_row_lens()
+        self.comparison = compare_sheets(
+            self.sheetdisplay1.data,
+            self.sheetdisplay2.data,
+            self.ic1,
+            self.ic2,
+            self.parent_cols1,
+            self.parent_cols2,
+            filename_1=self.filename_1,
+            filename_2=self.filename_2,
+            sheetname_1=self.sheetname_1,
+            sheetname_2=self.sheetname_2,
+            task=task,
+            structural=self.structural_button.get_checked(),
+        )
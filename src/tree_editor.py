@@ -9,21 +9,21 @@ import json
 import os
 import pickle
 import re
+import threading
 import tkinter as tk
 import zlib
 from bisect import bisect_left
-from collections import defaultdict, deque
-from collections.abc import Generator, Iterator, Sequence
+from collections import defaultdict
+from collections.abc import Callable, Generator, Iterable, Iterator, Sequence
 from contextlib import suppress
-from itertools import cycle, filterfalse, islice, repeat
+from itertools import chain, cycle, filterfalse, islice, repeat
 from locale import getdefaultlocale
 from math import floor
 from operator import attrgetter, itemgetter
 from tkinter import filedialog, font, ttk
 from typing import Literal
 
-from openpyxl import Workbook, load_workbook
-from openpyxl.cell import WriteOnlyCell
+from openpyxl import Workbook
 from tksheet import (
     ICON_ADD,
     ICON_CLEAR,
@@ -50,10 +50,16 @@ from tksheet import (
 
 from .classes import (
     Header,
+    ImportCheck,
     Node,
+    ProjectFile,
     RowStorage,
+    SearchIndex,
     SearchResult,
+    TaskCancelled,
     TreeBuilder,
+    TreeIndex,
+    UndoHistory,
 )
 from .constants import (
     BF,
@@ -67,7 +73,12 @@ from .constants import (
     date_formats_usable,
     date_icon,
     detail_column_types,
+    importable_changes,
+    lazy_tree_min_nodes,
     letters_icon,
+    max_cached_tree_rows,
+    max_incremental_edits,
+    max_typed_cells,
     menu_kwargs,
     nums_icon,
     rc_button,
@@ -84,40 +95,48 @@ from .constants import (
     themes,
     tree_bindings,
     tv_lvls_colors,
+    undo_mem_limit_mb,
     validation_allowed_date_chars,
     validation_allowed_num_chars,
     warnings_header,
+    whole_sheet_changes,
 )
 from .functions import (
-    bytes_io_wb,
+    bisect_left_key,
+    compile_condition,
     convert_old_xl_to_xlsx,
-    create_cell_align_selector_menu,
     csv_str_x_data,
     dict_x_b32,
     equalize_sublist_lens,
     frame_w_to_nchars,
     full_sheet_to_dict,
+    get_csv_data_from_file,
     get_json_format,
     get_json_from_file,
     increment_file_version,
+    insort_key,
     isfloat,
     isint,
     isintlike,
     isreal,
     json_to_sheet,
     level_to_color,
+    load_xlsx,
     new_info_storage,
     new_saved_info,
     path_numbers,
     path_without_numbers,
     process_search_results,
     search_results_max_column_chars,
+    sheet_to_json_dict,
     sort_key,
     str_io_csv_writer,
     to_clipboard,
     try_remove,
+    write_json,
     ws_x_data,
     xlsx_changelog_header,
+    xlsx_string_sheet,
 )
 from .toplevels import (
     Add_Child_Or_Sibling_Id_Popup,
@@ -151,10 +170,13 @@ from .toplevels import (
     View_Id_Popup,
 )
 from .widgets import (
+    BackgroundTask,
     Button,
     Ez_Dropdown,
     Frame,
+    Lazy_Tree,
     Normal_Entry,
+    create_cell_align_selector_menu,
 )
 
 # OVERRIDE LOCALE DETECTION FOR DATE FORMAT
@@ -198,14 +220,32 @@ class Tree_Editor(tk.Frame):
         self.tagged_ids = set()
         self.date_split_regex = "|".join(map(re.escape, ("/", "-")))
         self.find_popup = None
+        self.search_index = SearchIndex()
+        self.search_index_building = None
+        self.search_index_queue = []
+        self.typed_cells = {}
+        # built treeviews of other hierarchies, pc: (tree_generation, state)
+        self.tree_generation = 0
+        # bumped only when nodes are added, removed, moved or reordered
+        self.structure_generation = 0
+        self.tree_cache = {}
+        # pc: TreeIndex, stale when its generation isn't structure_generation
+        self.tree_indexes = {}
+        # rows / columns whose formatting and treeview cells need refreshing, dirty_cols None for all
+        self.dirty_rows = set()
+        self.dirty_cols = set()
         self.fixed_font_w = font.nametofont("TkFixedFont").measure("0")
 
         self.auto_resize_indexes = True
+        self.undo_mem_limit_mb = undo_mem_limit_mb
         self.mirror_var = False
         self.allow_spaces_ids_var = False
         self.allow_spaces_columns_var = False
         self.save_xlsx_with_program_data = bool(save_xlsx_and_json_with_program_data)
         self.save_json_with_program_data = bool(save_xlsx_and_json_with_program_data)
+        # program data without the nodes, they're rebuilt from the records on load
+        self.save_compact_program_data = False
+        self.save_json_indented = True
         self.save_xlsx_with_changelog = False
         self.save_xlsx_with_treeview = False
         self.save_xlsx_with_flattened = False
@@ -279,7 +319,7 @@ class Tree_Editor(tk.Frame):
             **menu_kwargs,
         )
         self.edit_menu.add_command(
-            label="Undo  0/30",
+            label="Undo  0",
             accelerator="Ctrl+Z",
             state="disabled",
             command=self.undo,
@@ -287,6 +327,15 @@ class Tree_Editor(tk.Frame):
             compound="left",
             **menu_kwargs,
         )
+        self.edit_menu.add_command(
+            label="Redo  0",
+            accelerator="Ctrl+Shift+Z",
+            state="disabled",
+            command=self.redo,
+            image=self.icons["ICON_REDO"],
+            compound="left",
+            **menu_kwargs,
+        )
         self.edit_menu.add_separator()
         self.copy_clipboard_menu = tk.Menu(self.edit_menu, tearoff=0, **menu_kwargs)
         self.copy_clipboard_menu.add_command(
@@ -563,7 +612,7 @@ class Tree_Editor(tk.Frame):
         self.treeframe.grid_rowconfigure(0, weight=1)
         self.treeframe.grid_columnconfigure(0, weight=1)
 
-        self.tree = Sheet(
+        self.tree = Lazy_Tree(
             self.treeframe,
             name="tree",
             header_font=sheet_header_font,
@@ -576,6 +625,12 @@ class Tree_Editor(tk.Frame):
             max_undos=0,
         )
         self.tree.grid(row=0, column=0, sticky="nswe")
+        self.tree.set_lazy_callbacks(
+            children=lambda iid: self.nodes[iid].cn[self.pc],
+            parent=lambda iid: self.nodes[iid].ps[self.pc] if iid in self.nodes else None,
+            row=self.tree_lazy_row,
+            loaded=self.tree_rows_loaded,
+        )
 
         # status bar tree
         self.sts_tree = Frame(self.l_frame)
@@ -1627,7 +1682,12 @@ class Tree_Editor(tk.Frame):
             self.sheet.header_align(program_data.sheet_header_align, redraw=False)
             self.tree.align(program_data.sheet_table_align, redraw=False)
             self.tree.header_align(program_data.sheet_header_align, redraw=False)
-            self.nodes = self.nodes_json_x_dict(program_data.nodes, hiers=self.hiers)
+            self.structure_changed()
+            if "nodes" in program_data:
+                self.nodes = self.nodes_json_x_dict(program_data.nodes, hiers=self.hiers)
+            else:
+                self.auto_sort_nodes_bool = bool(program_data.auto_sort_nodes_bool)
+                self.nodes = self.nodes_from_records(program_data.records, program_data.node_overrides)
             self.topnodes_order = {int(h): v for h, v in program_data.topnodes_order.items()}
             self.auto_sort_nodes_bool = bool(program_data.auto_sort_nodes_bool)
             self.tv_label_col = int(program_data.tv_label_col)
@@ -1679,14 +1739,15 @@ class Tree_Editor(tk.Frame):
         self.C.file.entryconfig("New", command=self.create_new_from_within_treeframe)
         self.C.file.entryconfig("Open", command=self.open_from_within_treeframe)
         self.refresh_hier_dropdown(self.hiers.index(self.pc))
-        self.edit_menu.entryconfig(0, label="Undo  0/30", state="disabled")
+        self.edit_menu.entryconfig(0, label="Undo  0", state="disabled")
+        self.edit_menu.entryconfig(1, label="Redo  0", state="disabled")
         self.tree.unbind("<z>")
         self.tree.unbind("<Z>")
         self.sheet.unbind("<z>")
         self.sheet.unbind("<Z>")
         self.copied_details = {"copied": [], "id": ""}
         self.copied_detail = {"copied": "", "id": ""}
-        self.vs = deque(maxlen=30)
+        self.reset_undo_history()
         self.cut = []
         self.copied = []
         self.cut_children_dct = {}
@@ -1856,7 +1917,12 @@ class Tree_Editor(tk.Frame):
         self.rns = {}
         self.sheet.MT.data = []
         self.new_sheet = []
-        self.vs = deque(maxlen=30)
+        self.reset_undo_history()
+        self.search_index = SearchIndex()
+        self.search_index_building = None
+        self.search_index_queue = []
+        self.tree_cache = {}
+        self.tree_indexes = {}
         self.row_len = 0
         self.headers = []
         self.ic = 0
@@ -1905,6 +1971,10 @@ class Tree_Editor(tk.Frame):
             widget.bind(f"<{ctrl_button}-R>", self.collapse_id)
             widget.bind(f"<{ctrl_button}-z>", self.undo)
             widget.bind(f"<{ctrl_button}-Z>", self.undo)
+            widget.bind(f"<{ctrl_button}-Shift-z>", self.redo)
+            widget.bind(f"<{ctrl_button}-Shift-Z>", self.redo)
+            widget.bind(f"<{ctrl_button}-y>", self.redo)
+            widget.bind(f"<{ctrl_button}-Y>", self.redo)
             widget.bind(f"<{ctrl_button}-l>", self.show_changelog)
             widget.bind(f"<{ctrl_button}-L>", self.show_changelog)
             widget.bind(f"<{ctrl_button}-v>", self.paste_key)
@@ -1986,6 +2056,10 @@ class Tree_Editor(tk.Frame):
             x.unbind(f"<{ctrl_button}-R>")
             x.unbind(f"<{ctrl_button}-z>")
             x.unbind(f"<{ctrl_button}-Z>")
+            x.unbind(f"<{ctrl_button}-Shift-z>")
+            x.unbind(f"<{ctrl_button}-Shift-Z>")
+            x.unbind(f"<{ctrl_button}-y>")
+            x.unbind(f"<{ctrl_button}-Y>")
             x.unbind(f"<{ctrl_button}-l>")
             x.unbind(f"<{ctrl_button}-L>")
             x.unbind(f"<{ctrl_button}-t>")
@@ -2051,6 +2125,7 @@ class Tree_Editor(tk.Frame):
             self.remake_topnodes_order()
 
     def sort_all_children(self):
+        self.structure_changed()
         for n in self.nodes.values():
             for h, cn in n.cn.items():
                 if cn:
@@ -2069,14 +2144,14 @@ class Tree_Editor(tk.Frame):
         iids = set(self.tree.selection(cells=True))
         if not iids:
             return
-        h = int(self.pc)
+        index = self.tree_index()
         tc = set()
-        for iid in iids:
-            if self.nodes[iid.lower()].ps[h]:
-                if all(pk not in iids and pk not in tc for pk in self.check_ps(self.nodes[iid.lower()].ps[h], h)):
-                    tc.add(iid)
-            elif iid not in tc:
+        end = -1
+        # in tour order an iid is under a kept one while it's before that one's exit
+        for iid in sorted(iids, key=lambda x: index.tin[x.lower()]):
+            if index.tin[iid.lower()] >= end:
                 tc.add(iid)
+                end = index.tout[iid.lower()]
         s, writer = str_io_csv_writer(dialect=csv.excel_tab)
         writer.writerow(h.name for h in self.headers)
         for iid in sorted(tc, key=lambda x: self.rns[x]):
@@ -2143,8 +2218,14 @@ class Tree_Editor(tk.Frame):
 
     def edit_cell_rebuild(self, r, c, value) -> object:
         self.snapshot_ctrl_x_v_del_key_id_par()
-        self.edit_cell_single(r, c, value)
-        self.rebuild_tree()
+        self.journal_cells(((r, c),))
+        old = f"{self.sheet.MT.data[r][c]}"
+        value = self.edit_cell_single(r, c, value)
+        if self.headers[c].type_ == "Parent" and self.edit_ids_pars_incremental([(r, c, old, value)]):
+            self.refresh_after_incremental_edit([(r, c, old, value)], rows={r}, columns={c})
+        else:
+            self.full_id_par_snapshot()
+            self.rebuild_tree()
         self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
         return value
 
@@ -2221,7 +2302,7 @@ class Tree_Editor(tk.Frame):
                 self.redo_tree_display()
                 self.refresh_rows = set()
                 if tree_sel:
-                    if self.tree.exists(tree_sel[0]):
+                    if self.tree.ensure_item(tree_sel[0]):
                         self.tree.scroll_to_item(tree_sel[0])
                         self.tree.selection_set(tree_sel[0])
                     else:
@@ -2254,16 +2335,15 @@ class Tree_Editor(tk.Frame):
                     self.disable_paste()
                     self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
                 else:
-                    self.vs.pop()
-                    self.set_undo_label()
+                    self.drop_snapshot()
                     self.edit_cell_rebuild(y1, x1, newtext)
             else:
                 if self.detail_is_valid_for_col(x1, newtext):
                     self.snapshot_ctrl_x_v_del_key()
                     self.vs[-1]["cells"][(y1, x1)] = f"{self.sheet.MT.data[y1][x1]}"
                     newtext = self.edit_cell_single(y1, x1, newtext)
-                    self.refresh_formatting(rows=y1, columns=x1)
-                    self.refresh_tree_item(ID)
+                    self.mark_dirty(y1, x1)
+                    self.refresh_dirty()
                     self.sheet.set_cell_size_to_text(y1, x1, only_set_if_too_small=True)
                     self.tree_set_cell_size_to_text(y1, x1)
                     self.disable_paste()
@@ -2287,6 +2367,7 @@ class Tree_Editor(tk.Frame):
             refresh_cols = set()
             edit_ctr = 0
             tree = event.sheetname == "tree"
+            id_par_edits = []
             if need_rebuild:
                 self.snapshot_ctrl_x_v_del_key_id_par()
             else:
@@ -2297,8 +2378,11 @@ class Tree_Editor(tk.Frame):
                 if (need_rebuild and c in idcols) or (
                     self.detail_is_valid_for_col(c, value) and self.sheet.MT.data[r][c] != value
                 ):
-                    if not need_rebuild:
-                        self.vs[-1]["cells"][(r, c)] = f"{self.sheet.MT.data[r][c]}"
+                    self.vs[-1]["cells"][(r, c)] = f"{self.sheet.MT.data[r][c]}"
+                    if need_rebuild and c in idcols:
+                        if not self.allow_spaces_ids_var:
+                            value = re.sub(r"[\n\t\s]*", "", value)
+                        id_par_edits.append((r, c, f"{self.sheet.MT.data[r][c]}", value))
                     self.edit_cell_multiple(r, c, value)
                     refresh_rows.add(r)
                     refresh_cols.add(c)
@@ -2306,11 +2390,14 @@ class Tree_Editor(tk.Frame):
             self.disable_paste()
             if edit_ctr:
                 if need_rebuild:
-                    self.rebuild_tree()
+                    if self.edit_ids_pars_incremental(id_par_edits):
+                        self.refresh_after_incremental_edit(id_par_edits, rows=refresh_rows, columns=refresh_cols)
+                    else:
+                        self.full_id_par_snapshot()
+                        self.rebuild_tree()
                 else:
-                    self.refresh_formatting(rows=refresh_rows, columns=refresh_cols)
-                    for rn in refresh_rows:
-                        self.refresh_tree_item(self.sheet.MT.data[rn][self.ic])
+                    self.mark_dirty(refresh_rows, refresh_cols)
+                    self.refresh_dirty()
                 if edit_ctr > 1:
                     self.changelog_append(
                         f"Edit {edit_ctr} cells",
@@ -2323,8 +2410,7 @@ class Tree_Editor(tk.Frame):
                 self.redraw_sheets()
                 self.stop_work(self.get_tree_editor_status_bar_text())
             else:
-                self.vs.pop()
-                self.set_undo_label()
+                self.drop_snapshot()
                 self.redraw_sheets()
                 self.stop_work(self.get_tree_editor_status_bar_text())
         event.data = {}
@@ -2387,6 +2473,7 @@ class Tree_Editor(tk.Frame):
         if deselect:
             self.sheet.deselect("all", redraw=False)
         self.nodes = {}
+        self.structure_changed()
         self.clear_copied_details()
         self.auto_sort_nodes_bool = True
         self.save_info_get_saved_info()
@@ -2422,6 +2509,162 @@ class Tree_Editor(tk.Frame):
         self.redo_tree_display()
         self.sheet.recreate_all_selection_boxes()
 
+    def edit_ids_pars_incremental(self, edits: list[tuple[int, int, str, str]]) -> bool:
+        # edits are (row, column, old value, new value) and have already been written to the sheet
+        # on False the nodes may be partially updated, the caller must use rebuild_tree()
+        self.new_parent_rows = set()
+        if not edits or len(edits) > max_incremental_edits:
+            return False
+        columns = {c for _, c, _, _ in edits}
+        if self.ic in columns:
+            if len(columns) > 1:
+                return False
+            refresh_rows = set()
+            self.journal_topnodes(self.hiers)
+            for _, _, old, new in edits:
+                if old == new:
+                    continue
+                if not old:
+                    return False
+                if node := self.nodes.get(old.lower()):
+                    self.journal_nodes(
+                        chain(
+                            (old.lower(), new.lower()),
+                            chain.from_iterable(node.cn.values()),
+                            node.ps.values(),
+                        )
+                    )
+                    self.journal_cells((self.rns[ciid], h) for h, cn in node.cn.items() for ciid in cn)
+                if not self.change_ID_name(old, new, snapshot=False, errors=False):
+                    return False
+                refresh_rows.update(self.refresh_rows)
+                if old.lower() in self.tagged_ids:
+                    self.tagged_ids.discard(old.lower())
+                    self.tagged_ids.add(new.lower())
+            self.refresh_rows = refresh_rows
+            self.reset_tagged_ids_dropdowns()
+            return True
+        if any(self.headers[c].type_ != "Parent" for c in columns):
+            return False
+        affected = set()
+        self.journal_topnodes(self.hiers)
+        for r, h, old, new in edits:
+            ik = self.sheet.MT.data[r][self.ic].lower()
+            npk = new.lower()
+            if ik not in self.nodes or ik == npk:
+                return False
+            if old.lower() == npk:
+                continue
+            # the parents of these are journaled too, reassociate_nodes() sorts their children
+            self.journal_nodes(chain((ik, npk), self.iids_and_parents((ik, self.nodes[ik].ps[h], npk), h)))
+            if npk and npk not in self.nodes:
+                self.nodes[npk] = Node(new, self.hiers)
+                newrow = list(repeat("", self.row_len))
+                newrow[self.ic] = new
+                self.sheet.insert_row(newrow, redraw=False)
+                self.rns[npk] = len(self.sheet.MT.data) - 1
+                self.new_parent_rows.add(self.rns[npk])
+            if npk and self.nodes[npk].ps[h] is None:
+                self.nodes[npk].ps[h] = ""
+                if not self.auto_sort_nodes_bool:
+                    self.topnodes_order[h].append(npk)
+            pk = self.nodes[ik].ps[h]
+            if not self.cut_paste_edit_cell(self.nodes[ik].name, pk if pk else "", h, new, snapshot=False):
+                return False
+            affected.update(((ik, h), (pk, h), (npk, h)))
+        self.reassociate_nodes(affected)
+        return True
+
+    def reassociate_nodes(self, affected: set[tuple[str, int]]) -> None:
+        # applies the rules of fix_associate_sort_edit_cells() to only the affected nodes
+        self.structure_changed()
+        first_hier = self.hiers[0]
+        for iid in {iid for iid, _ in affected if iid and iid in self.nodes}:
+            node = self.nodes[iid]
+            for h in self.hiers:
+                if not node.cn[h] and not node.ps[h]:
+                    if node.ps[h] == "" and not self.auto_sort_nodes_bool:
+                        try_remove(self.topnodes_order[h], iid)
+                    node.ps[h] = None
+            if all(p is None for p in node.ps.values()):
+                node.ps[first_hier] = ""
+                if not self.auto_sort_nodes_bool:
+                    self.topnodes_order[first_hier].append(iid)
+        if self.auto_sort_nodes_bool:
+            for iid, h in affected:
+                if iid and iid in self.nodes and (pk := self.nodes[iid].ps[h]):
+                    self.nodes[pk].cn[h] = self.sort_node_cn(self.nodes[pk].cn[h], h)
+
+    def refresh_after_incremental_edit(
+        self, edits: list[tuple[int, int, str, str]], rows: set[int], columns: set[int]
+    ) -> None:
+        self.clear_copied_details()
+        refresh_rows = self.refresh_rows
+        self.refresh_formatting(
+            rows=rows | refresh_rows,
+            columns=columns | set(self.hiers) if refresh_rows else columns,
+        )
+        # rows made for new parents are formatted and indexed in every column
+        if self.new_parent_rows:
+            self.refresh_formatting(rows=self.new_parent_rows)
+        self.refresh_rows = set()
+        if not self.patch_tree_items(edits, rows | refresh_rows | self.new_parent_rows):
+            self.redo_tree_display()
+
+    def patch_tree_items(self, edits: list[tuple[int, int, str, str]], rows: set[int]) -> bool:
+        # renames, moves, inserts and removes only the treeview items an incremental edit affected
+        # False if the treeview has to be rebuilt instead
+        if self.tree.lazy or not self.sheet.data:
+            return False
+        pc = self.pc
+        try:
+            for _, c, old, new in edits:
+                if c == self.ic and (ok := old.lower()) != (nk := new.lower()) and self.tree.exists(ok):
+                    self.tree.item(ok, iid=nk, undo=False, emit_event=False, redraw=False)
+            refresh = {self.sheet.MT.data[r][self.ic].lower() for r in rows}
+            moved = {self.sheet.MT.data[r][self.ic].lower() for r, c, _, _ in edits if c == pc}
+            if moved:
+                place = []
+                for iid in moved.union(*({old.lower(), new.lower()} for _, c, old, new in edits if c == pc)):
+                    if iid in self.nodes and self.nodes[iid].ps[pc] is not None:
+                        place.append(iid)
+                    elif iid and self.tree.exists(iid):
+                        self.tree.del_items(iid, undo=False)
+                top = list(self.top_iids()) if any(self.nodes[iid].ps[pc] == "" for iid in place) else []
+
+                def position(iid: str) -> tuple[bool, int]:
+                    pk = self.nodes[iid].ps[pc]
+                    return bool(pk), (self.nodes[pk].cn[pc] if pk else top).index(iid)
+
+                # top IDs first so new parents exist before their children are put under them
+                for iid in sorted(place, key=position):
+                    pk = self.nodes[iid].ps[pc]
+                    if self.tree.exists(iid):
+                        self.tree.move(iid, pk, position(iid)[1], select=False, undo=False)
+                    else:
+                        self.tree.insert(
+                            parent=pk,
+                            index=position(iid)[1],
+                            iid=iid,
+                            text="",
+                            values=self.sheet.MT.data[self.rns[iid]],
+                            undo=False,
+                        )
+                refresh.update(place)
+                if self.tv_lvls_bool:
+                    # levels change for everything under a moved ID
+                    stack = [iid for iid in moved if iid in self.nodes]
+                    while stack:
+                        cn = self.nodes[stack.pop()].cn[pc]
+                        refresh.update(cn)
+                        stack.extend(cn)
+            for iid in refresh:
+                self.refresh_tree_item(iid)
+        except Exception:
+            return False
+        self.tree.set_refresh_timer(redraw=True)
+        return True
+
     def cut_key(self, event: object = None) -> None:
         if self.tree.has_focus():
             if iids := tuple(
@@ -2534,8 +2777,8 @@ class Tree_Editor(tk.Frame):
         except Exception:
             Error(self, "Filepath invalid   ", theme=self.C.theme)
             return
-        if not fp.lower().endswith((".json", ".xlsx", ".xls", ".xlsm", ".csv", ".tsv")):
-            Error(self, "Please select json/excel/csv   ", theme=self.C.theme)
+        if not fp.lower().endswith((".json", ".xlsx", ".xls", ".xlsm", ".csv", ".tsv", ".tktrees")):
+            Error(self, "Please select json/excel/csv/tktrees   ", theme=self.C.theme)
             return
         self.disable_widgets()
         if os.path.isfile(fp):
@@ -2938,6 +3181,7 @@ class Tree_Editor(tk.Frame):
         iid = self._tree_rc_iid()
         if iid is None:
             return
+        self.tree.load_subtree(iid)
         self._tree_select_add(self.tree.descendants(iid))
 
     def tree_select_ancestors(self, event=None):
@@ -2955,20 +3199,12 @@ class Tree_Editor(tk.Frame):
         iid = self._tree_rc_iid()
         if iid is None:
             return
-        target = self.get_node_level(self.nodes[iid])
-        found = []
-        stack = [(top, 1) for top in self.top_iids()]
-        while stack:
-            current, level = stack.pop()
-            if level == target:
-                if current != iid:
-                    found.append(current)
-            elif level < target:
-                stack.extend((child, level + 1) for child in self.nodes[current].cn[self.pc])
-        self._tree_select_add(found)
+        depth = self.tree_index().depth
+        target = depth[iid]
+        self._tree_select_add(ciid for ciid, d in depth.items() if d == target and ciid != iid)
 
     def tree_select_tagged(self, event=None):
-        self._tree_select_add(ik for ik in self.tagged_ids if self.tree.exists(ik))
+        self._tree_select_add(ik for ik in self.tagged_ids if self.tree.ensure_item(ik))
 
     def sheet_select_event(self, event=None):
         self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
@@ -3207,6 +3443,7 @@ class Tree_Editor(tk.Frame):
         self.reset_tree_drag_vars()
 
     def tree_sort_children(self, event=None):
+        self.structure_changed()
         for iid in self.tree.selection():
             self.nodes[iid].cn[self.pc] = self.sort_node_cn(self.nodes[iid].cn[self.pc], self.pc)
         self.save_info_get_saved_info()
@@ -3282,9 +3519,10 @@ class Tree_Editor(tk.Frame):
                 self.focus_tree()
                 return
         self.save_info_get_saved_info()
-        self.pc = int(self.hiers[index])
         self.tree.close_dropdown()
-        self.redo_tree_display()
+        self.cache_tree_view()
+        self.pc = int(self.hiers[index])
+        self.redo_tree_display(use_cache=True)
         self.move_tree_pos()
         self.mirror_sels_disabler = True
         self.refresh_tree_dropdowns()
@@ -3312,6 +3550,7 @@ class Tree_Editor(tk.Frame):
             current = self.nodes[current].ps[h]
 
     def add(self, ID, parent, insert_row=None, snapshot=True, errors=True):
+        self.structure_changed()
         ik = ID.lower()
         pk = parent.lower()
         if ik in self.nodes and self.nodes[ik].ps[self.pc] is not None:
@@ -3320,13 +3559,15 @@ class Tree_Editor(tk.Frame):
             return False
         if snapshot:
             self.snapshot_add_id()
+            self.journal_nodes(chain((ik,), self.iids_and_parents((pk,), self.pc)))
+            self.journal_topnodes((self.pc,))
         if ik not in self.nodes:
             self.nodes[ik] = Node(ID, self.hiers)
             newrow = list(repeat("", self.row_len))
             newrow[self.ic] = ID
             newrow[self.pc] = parent
             if insert_row is None:
-                self.sheet.insert_row(newrow)
+                self.sheet.insert_row(newrow, redraw=snapshot)
                 rn = len(self.sheet.MT.data) - 1
                 self.rns[ik] = rn
             else:
@@ -3348,10 +3589,7 @@ class Tree_Editor(tk.Frame):
             self.nodes[ik].ps[self.pc] = pk
             self.nodes[pk].cn[self.pc].append(ik)
             if self.auto_sort_nodes_bool:
-                self.nodes[pk].cn[self.pc] = self.sort_node_cn(self.nodes[pk].cn[self.pc], self.pc)
-                if self.nodes[pk].ps[self.pc]:
-                    parent_parent_node = self.nodes[self.nodes[pk].ps[self.pc]]
-                    parent_parent_node.cn[self.pc] = self.sort_node_cn(parent_parent_node.cn[self.pc], self.pc)
+                self.sort_added_child(pk, self.pc)
         if not self.auto_sort_nodes_bool and parent == "":
             self.topnodes_order[self.pc].append(ik)
         if insert_row is not None and snapshot:
@@ -3361,6 +3599,7 @@ class Tree_Editor(tk.Frame):
         return True
 
     def change_ID_name(self, ID, new_name, snapshot=True, errors=True):
+        self.structure_changed()
         self.refresh_rows = set()
         ik = ID.lower()
         if ik not in self.nodes:
@@ -3379,6 +3618,14 @@ class Tree_Editor(tk.Frame):
         if snapshot:
             self.snapshot_rename_id()
             qvsrwsapp = self.vs[-1]["rows"].append
+            self.journal_nodes(
+                chain(
+                    (ik, nnk),
+                    chain.from_iterable(self.nodes[ik].cn.values()),
+                    self.nodes[ik].ps.values(),
+                )
+            )
+            self.journal_topnodes(self.hiers)
         ik_rn = self.rns[ik]
         self.sheet.MT.data[ik_rn][self.ic] = new_name
         for h, cn in self.nodes[ik].cn.items():
@@ -3397,11 +3644,13 @@ class Tree_Editor(tk.Frame):
         self.nodes[ik].name = new_name
         self.nodes[nnk] = self.nodes.pop(ik)
         self.rns[nnk] = self.rns.pop(ik)
+        self.index_cells(chain((ik_rn,), self.refresh_rows))
         if self.auto_sort_nodes_bool:
             for h, p in self.nodes[nnk].ps.items():
                 if p:
-                    parent_node = self.nodes[self.nodes[nnk].ps[h]]
-                    parent_node.cn[h] = self.sort_node_cn(parent_node.cn[h], h)
+                    cn = self.nodes[p].cn[h]
+                    cn.remove(nnk)
+                    insort_key(cn, nnk, self.cn_sort_key(h))
 
         else:
             for h in self.hiers:
@@ -3424,6 +3673,7 @@ class Tree_Editor(tk.Frame):
         errors=True,
         sort_later=False,
     ):
+        self.structure_changed()
         self.refresh_rows = set()
         if self.sort_later_dct is None:
             self.sort_later_dct = {
@@ -3456,6 +3706,16 @@ class Tree_Editor(tk.Frame):
                     Error(self, f"ID: {ID} already has this parent   ", theme=self.C.theme)
                 return False
         auto_sort_quick = self.auto_sort_nodes_bool
+        if snapshot:
+            self.journal_nodes(
+                chain(
+                    (ik, pk),
+                    self.nodes[ik].cn[hier],
+                    self.iids_and_parents((parent_of_ik,), hier),
+                    self.iids_and_parents((npk,), self.pc),
+                )
+            )
+            self.journal_topnodes({hier, self.pc})
         for ciid in self.nodes[ik].cn[hier]:
             child = self.nodes[ciid]
             child.ps[hier] = parent_of_ik
@@ -3498,10 +3758,7 @@ class Tree_Editor(tk.Frame):
                             self.pc,
                         )
                 elif not sort_later:
-                    self.nodes[npk].cn[self.pc] = self.sort_node_cn(self.nodes[npk].cn[self.pc], self.pc)
-                    if self.nodes[npk].ps[self.pc]:
-                        parent_parent_node = self.nodes[self.nodes[npk].ps[self.pc]]
-                        parent_parent_node.cn[self.pc] = self.sort_node_cn(parent_parent_node.cn[self.pc], self.pc)
+                    self.sort_added_child(npk, self.pc)
         if not auto_sort_quick:
             if pk == "":
                 try_remove(self.topnodes_order[hier], ik)
@@ -3547,6 +3804,7 @@ class Tree_Editor(tk.Frame):
         errors=True,
         sort_later=False,
     ):
+        self.structure_changed()
         self.refresh_rows = set()
         if self.sort_later_dct is None:
             self.sort_later_dct = {
@@ -3576,7 +3834,7 @@ class Tree_Editor(tk.Frame):
                         )
                     return False
         else:
-            if any(npk == ck for ck in self.check_cn(ik, hier)):
+            if self.is_under(npk, ik, hier):
                 if errors:
                     Error(self, f"Cannot add ID: {ID} to same line   ", theme=self.C.theme)
                 return False
@@ -3591,6 +3849,18 @@ class Tree_Editor(tk.Frame):
                     Error(self, f"ID: {ID} already has this parent   ", theme=self.C.theme)
                 return False
 
+        if snapshot:
+            self.journal_nodes(
+                chain(
+                    (ik,),
+                    self.iids_and_parents((pk,), hier),
+                    self.iids_and_parents((npk,), self.pc),
+                )
+            )
+            self.journal_topnodes({hier, self.pc})
+            if hier != self.pc:
+                self.journal_subtree(ik, hier, self.pc)
+
         # Update node relationships
         self.nodes[ik].ps[hier] = None
         if pk != "":
@@ -3681,18 +3951,14 @@ class Tree_Editor(tk.Frame):
                         self.sort_later_dct["old_hier"] = hier
             elif not sort_later:
                 if npk:
-                    self.nodes[npk].cn[self.pc] = self.sort_node_cn(self.nodes[npk].cn[self.pc], self.pc)
-                    if self.nodes[npk].ps[self.pc]:
-                        parent_parent_node = self.nodes[self.nodes[npk].ps[self.pc]]
-                        parent_parent_node.cn[self.pc] = self.sort_node_cn(parent_parent_node.cn[self.pc], self.pc)
-                if pk and self.nodes[pk].ps[hier]:
-                    parent_parent_node = self.nodes[self.nodes[pk].ps[hier]]
-                    parent_parent_node.cn[hier] = self.sort_node_cn(parent_parent_node.cn[hier], hier)
+                    self.sort_added_child(npk, self.pc)
+                self.sort_removed_child(pk, hier)
 
         self.sort_later_dct["filled"] = True
         return True
 
     def copy_paste(self, ID, hier, newparent, snapshot=True, errors=True, sort_later=False):
+        self.structure_changed()
         self.refresh_rows = set()
         if self.sort_later_dct is None:
             self.sort_later_dct = {
@@ -3708,6 +3974,9 @@ class Tree_Editor(tk.Frame):
             if errors:
                 Error(self, f"ID {ID} already in hierarchy   ", theme=self.C.theme)
             return False
+        if snapshot:
+            self.journal_nodes(chain((ik,), self.iids_and_parents((npk,), self.pc)))
+            self.journal_topnodes((self.pc,))
         if npk == "":
             self.nodes[ik].ps[self.pc] = ""
         else:
@@ -3722,10 +3991,7 @@ class Tree_Editor(tk.Frame):
                             self.pc,
                         )
                 elif not sort_later:
-                    self.nodes[npk].cn[self.pc] = self.sort_node_cn(self.nodes[npk].cn[self.pc], self.pc)
-                    if self.nodes[npk].ps[self.pc]:
-                        parent_parent_node = self.nodes[self.nodes[npk].ps[self.pc]]
-                        parent_parent_node.cn[self.pc] = self.sort_node_cn(parent_parent_node.cn[self.pc], self.pc)
+                    self.sort_added_child(npk, self.pc)
         if not self.auto_sort_nodes_bool and npk == "":
             self.topnodes_order[self.pc].append(ik)
         rn = self.rns[ik]
@@ -3749,6 +4015,7 @@ class Tree_Editor(tk.Frame):
         return True
 
     def copy_paste_all(self, ID, hier, newparent, snapshot=True, errors=True, sort_later=False):
+        self.structure_changed()
         self.refresh_rows = set()
         if self.sort_later_dct is None:
             self.sort_later_dct = {
@@ -3776,6 +4043,10 @@ class Tree_Editor(tk.Frame):
                     )
                 return False
 
+        if snapshot:
+            self.journal_nodes(chain(self.check_cn(ik, hier), self.iids_and_parents((npk,), self.pc)))
+            self.journal_topnodes((self.pc,))
+
         # Update root node relationships
         if npk == "":
             self.nodes[ik].ps[self.pc] = ""
@@ -3844,15 +4115,13 @@ class Tree_Editor(tk.Frame):
                         self.pc,
                     )
             elif not sort_later:
-                self.nodes[npk].cn[self.pc] = self.sort_node_cn(self.nodes[npk].cn[self.pc], self.pc)
-                if self.nodes[npk].ps[self.pc]:
-                    parent_parent_node = self.nodes[self.nodes[npk].ps[self.pc]]
-                    parent_parent_node.cn[self.pc] = self.sort_node_cn(parent_parent_node.cn[self.pc], self.pc)
+                self.sort_added_child(npk, self.pc)
 
         self.sort_later_dct["filled"] = True
         return True
 
     def cut_paste_children(self, oldparent, newparent, hier, snapshot=True, errors=True):
+        self.structure_changed()
         self.refresh_rows = set()
         pk = oldparent.lower()
         npk = newparent.lower()
@@ -3880,7 +4149,7 @@ class Tree_Editor(tk.Frame):
                     )
                 return
         else:
-            if any(npk == ck for ck in self.check_cn(pk, hier)):
+            if self.is_under(npk, pk, hier):
                 if errors:
                     Error(self, "Cannot add ID to same line   ", theme=self.C.theme)
                 return False
@@ -3896,6 +4165,19 @@ class Tree_Editor(tk.Frame):
             )
             if not confirm.boolean:
                 return False
+        if snapshot:
+            self.journal_nodes(
+                chain(
+                    self.nodes[pk].cn[hier],
+                    self.iids_and_parents((pk,), hier),
+                    self.iids_and_parents((npk,), self.pc),
+                )
+            )
+            self.journal_topnodes((self.pc,))
+            if hier != self.pc:
+                for ciid in self.nodes[pk].cn[hier]:
+                    if ciid not in already_in:
+                        self.journal_subtree(ciid, hier, self.pc)
 
         for ciid in tuple(self.nodes[pk].cn[hier]):
             if ciid not in already_in:
@@ -3980,6 +4262,7 @@ class Tree_Editor(tk.Frame):
         return True
 
     def cut_paste_edit_cell(self, ID, oldparent, hier, newparent, snapshot=True):
+        self.structure_changed()
         ik = ID.lower()
         pk = oldparent.lower()
         npk = newparent.lower()
@@ -3995,12 +4278,15 @@ class Tree_Editor(tk.Frame):
         else:
             if self.nodes[ik].ps[hier] == "":
                 return False
-        if any(npk == ck for ck in self.check_cn(ik, hier)):
+        if self.is_under(npk, ik, hier):
             return False
         if oldparent == "" and self.nodes[ik].ps[hier] is None and newparent:
             for ck in self.check_cn(ik, hier):
                 if self.nodes[ck].ps[hier] is not None:
                     return False
+        if snapshot:
+            self.journal_nodes(chain((ik, pk), self.iids_and_parents((npk,), hier)))
+            self.journal_topnodes((hier,))
         self.nodes[ik].ps[hier] = None
         if pk != "":
             self.nodes[pk].cn[hier].remove(ik)
@@ -4010,10 +4296,7 @@ class Tree_Editor(tk.Frame):
             self.nodes[ik].ps[hier] = npk
             self.nodes[npk].cn[hier].append(ik)
             if self.auto_sort_nodes_bool:
-                self.nodes[npk].cn[hier] = self.sort_node_cn(self.nodes[npk].cn[hier], hier)
-                if self.nodes[npk].ps[hier]:
-                    parent_parent_node = self.nodes[self.nodes[npk].ps[hier]]
-                    parent_parent_node.cn[hier] = self.sort_node_cn(parent_parent_node.cn[hier], hier)
+                self.sort_added_child(npk, hier)
         if not self.auto_sort_nodes_bool:
             if pk == "":
                 try_remove(self.topnodes_order[hier], ik)
@@ -4038,6 +4321,7 @@ class Tree_Editor(tk.Frame):
         return True
 
     def _del_id_core(self, name: str, to_del: list[str] | None = None, snapshot: bool = True) -> list[str]:
+        self.structure_changed()
         if to_del is None:
             to_del = []
         iid = name.lower()
@@ -4056,9 +4340,9 @@ class Tree_Editor(tk.Frame):
                     self.nodes[pk].cn[self.pc].append(ciid)
         else:
             if pk:
+                key = self.cn_sort_key(self.pc)
                 for ciid in self.nodes[iid].cn[self.pc]:
-                    self.nodes[pk].cn[self.pc].append(ciid)
-                self.nodes[pk].cn[self.pc] = self.sort_node_cn(self.nodes[pk].cn[self.pc], self.pc)
+                    insort_key(self.nodes[pk].cn[self.pc], ciid, key)
         if pk:
             for ciid in self.nodes[iid].cn[self.pc]:
                 rn = self.rns[ciid]
@@ -4099,12 +4383,12 @@ class Tree_Editor(tk.Frame):
             self.nodes[iid].ps[self.pc] = None
             self.sheet.MT.data[rn][self.pc] = ""
             self.refresh_rows.add(iid)
-        if self.auto_sort_nodes_bool and pk and self.nodes[pk].ps[self.pc]:
-            parent_parent_node = self.nodes[self.nodes[pk].ps[self.pc]]
-            parent_parent_node.cn[self.pc] = self.sort_node_cn(parent_parent_node.cn[self.pc], self.pc)
+        if self.auto_sort_nodes_bool:
+            self.sort_removed_child(pk, self.pc)
         return to_del
 
     def _del_id_all_core(self, name: str, to_del: list[str] | None = None, snapshot: bool = True) -> list[str]:
+        self.structure_changed()
         if to_del is None:
             to_del = []
         iid = name.lower()
@@ -4187,10 +4471,15 @@ class Tree_Editor(tk.Frame):
                     self.nodes[node_id].cn[h] = self.sort_node_cn(self.nodes[node_id].cn[h], h)
         return to_del
 
-    def _del_id_orphan_core(self, name: str, parent: str, snapshot: bool = True) -> None:
+    def _del_id_orphan_core(
+        self, name: str, parent: str, to_del: list[str] | None = None, snapshot: bool = True
+    ) -> list[str]:
+        self.structure_changed()
+        if to_del is None:
+            to_del = []
         ik = name.lower()
         if ik not in self.nodes or self.nodes[ik].ps[self.pc] is None:
-            return
+            return to_del
         pk = parent.lower()
         self.refresh_rows = set()
         if pk:
@@ -4216,8 +4505,8 @@ class Tree_Editor(tk.Frame):
             if snapshot:
                 self.vs[-1]["rows"][rn] = RowStorage(1, self.sheet.MT.data[rn])
             del self.nodes[ik]
-            self.sheet.delete_row(rn, redraw=False)
             self.untag_id(ik)
+            to_del.append(ik)
         else:
             if snapshot and rn not in self.vs[-1]["rows"]:
                 self.vs[-1]["rows"][rn] = RowStorage(
@@ -4231,11 +4520,15 @@ class Tree_Editor(tk.Frame):
         if self.auto_sort_nodes_bool and pk and self.nodes[pk].ps[self.pc]:
             parent_parent_node = self.nodes[self.nodes[pk].ps[self.pc]]
             parent_parent_node.cn[self.pc] = self.sort_node_cn(parent_parent_node.cn[self.pc], self.pc)
+        return to_del
 
-    def _del_id_all_orphan_core(self, name: str, snapshot: bool = True) -> None:
+    def _del_id_all_orphan_core(self, name: str, to_del: list[str] | None = None, snapshot: bool = True) -> list[str]:
+        self.structure_changed()
+        if to_del is None:
+            to_del = []
         ik = name.lower()
         if ik not in self.nodes:
-            return
+            return to_del
         self.refresh_rows = set()
         to_sort = set()
         self.untag_id(ik)
@@ -4267,11 +4560,12 @@ class Tree_Editor(tk.Frame):
         if snapshot:
             self.vs[-1]["rows"][rn] = RowStorage(1, self.sheet.MT.data[rn])
         del self.nodes[ik]
-        self.sheet.delete_row(rn, redraw=False)
+        to_del.append(ik)
         if self.auto_sort_nodes_bool:
             for node_id, h in to_sort:
                 if node_id in self.nodes:
                     self.nodes[node_id].cn[h] = self.sort_node_cn(self.nodes[node_id].cn[h], h)
+        return to_del
 
     def get_lvls(self, iid: str, lvl=1):
         # Initialize stack with the initial node at lvl - 1
@@ -4297,6 +4591,7 @@ class Tree_Editor(tk.Frame):
                 stack.append((child, next_lvl))
 
     def _del_id_children_core(self, name: str, to_del: list[str] | None = None, snapshot: bool = True) -> list[str]:
+        self.structure_changed()
         if to_del is None:
             to_del = []
         ik = name.lower()
@@ -4357,6 +4652,7 @@ class Tree_Editor(tk.Frame):
         return to_del
 
     def _del_id_children_all_core(self, name: str, to_del: list[str] | None = None, snapshot: bool = True) -> list[str]:
+        self.structure_changed()
         if to_del is None:
             to_del = []
         ik = name.lower()
@@ -4539,6 +4835,7 @@ class Tree_Editor(tk.Frame):
         return "\n".join(allrows)
 
     def fix_associate_sort(self, startup=True):
+        self.structure_changed()
         first_hier = self.hiers[0]
         quick_hiers = self.hiers[1:]
         lh = len(self.hiers)
@@ -4612,6 +4909,7 @@ class Tree_Editor(tk.Frame):
                 self.sheet.insert_rows(rows=to_insert)
 
     def fix_associate_sort_edit_cells(self):
+        self.structure_changed()
         first_hier = self.hiers[0]
         quick_hiers = self.hiers[1:]
         lh = len(self.hiers)
@@ -4655,6 +4953,7 @@ class Tree_Editor(tk.Frame):
         return "break"
 
     def associate(self):
+        self.structure_changed()
         first_hier = self.hiers[0]
         quick_hiers = self.hiers[1:]
         lh = len(self.hiers)
@@ -4683,14 +4982,38 @@ class Tree_Editor(tk.Frame):
             )
 
     def sort_node_cn(self, cn: list[str], h: int):
-        wc = []
-        woc = []
-        for ciid in cn:
-            if self.nodes[ciid].cn[h]:
-                wc.append(ciid)
-            else:
-                woc.append(ciid)
-        return sorted(wc, key=sort_key) + sorted(woc, key=sort_key)
+        return sorted(cn, key=self.cn_sort_key(h))
+
+    def cn_sort_key(self, h: int, nodes: dict[str, Node] | None = None) -> Callable[[str], tuple]:
+        # IDs with children first then natural order, the order auto sort keeps children lists in
+        if nodes is None:
+            nodes = self.nodes
+        return lambda iid: (not nodes[iid].cn[h], sort_key(iid))
+
+    def sort_added_child(self, pk: str, h: int) -> None:
+        # the last of pk's children was just appended to an otherwise sorted list
+        cn = self.nodes[pk].cn[h]
+        insort_key(cn, cn.pop(), self.cn_sort_key(h))
+        if len(cn) == 1:
+            self.resort_in_parent(pk, h, had_children=False)
+
+    def sort_removed_child(self, pk: str, h: int) -> None:
+        # removing keeps pk's children sorted, pk only moves if it no longer has any
+        if pk and not self.nodes[pk].cn[h]:
+            self.resort_in_parent(pk, h, had_children=True)
+
+    def resort_in_parent(self, iid: str, h: int, had_children: bool) -> None:
+        # top IDs are sorted when they're read so only children lists need updating
+        if not (pk := self.nodes[iid].ps[h]):
+            return
+        cn = self.nodes[pk].cn[h]
+        key = self.cn_sort_key(h)
+        i = bisect_left_key(cn, (not had_children, sort_key(iid)), key)
+        if i < len(cn) and cn[i] == iid:
+            del cn[i]
+        else:
+            cn.remove(iid)
+        insort_key(cn, iid, key)
 
     def top_iids(self):
         pc = self.pc
@@ -4725,6 +5048,7 @@ class Tree_Editor(tk.Frame):
                 stack.extend(reversed(self.nodes[iid].cn[self.pc]))
 
     def remake_topnodes_order(self):
+        self.structure_changed()
         self.topnodes_order = {}
         for h in self.hiers:
             wc = []
@@ -4737,9 +5061,43 @@ class Tree_Editor(tk.Frame):
                         woc.append(iid)
             self.topnodes_order[h] = sorted(wc, key=sort_key) + sorted(woc, key=sort_key)
 
-    def gen_sheet_w_headers(self):
+    def lazy_pc_iids(self, open_ids: dict[str, None] | set[str]) -> Generator[str]:
+        # like pc_iids() but only goes into the children of open nodes
+        for top_iid in self.top_iids():
+            yield top_iid
+            if top_iid in open_ids:
+                stack = list(reversed(self.nodes[top_iid].cn[self.pc]))
+                while stack:
+                    iid = stack.pop()
+                    yield iid
+                    if iid in open_ids:
+                        stack.extend(reversed(self.nodes[iid].cn[self.pc]))
+
+    def tree_lazy_row(self, iid: str) -> tuple[str, list[str]]:
+        row = self.sheet.data[self.rns[iid]]
+        if self.tv_lvls_bool:
+            return f"{self.get_node_level(self.nodes[iid])}. {row[self.tv_label_col]}", row.copy()
+        return row[self.tv_label_col], row.copy()
+
+    def tree_rows_loaded(self, iids: list[str]) -> None:
+        # gives rows the lazy treeview has just inserted the highlights redo_tree_display() would have
+        tree_rns = self.tree.RI.rns
+        index_options = self.tree.RI.cell_options
+        options = self.tree.MT.cell_options
+        sheet_options = self.sheet.MT.cell_options
+        for iid in iids:
+            if iid in self.tagged_ids:
+                index_options[tree_rns[iid]] = {}
+                index_options[tree_rns[iid]]["highlight"] = Highlight(bg="orange", fg="black", end=False)
+            rn = self.rns[iid]
+            for c in range(self.row_len):
+                if (rn, c) in sheet_options and "highlight" in sheet_options[(rn, c)]:
+                    options[key := (tree_rns[iid], c)] = {}
+                    options[key]["highlight"] = sheet_options[(rn, c)]["highlight"]
+
+    def gen_sheet_w_headers(self, data: list[list[str]] | None = None):
         yield (h.name for h in self.headers)
-        yield from ((e if e else None for e in r) for r in self.sheet.MT.data)
+        yield from ((e if e else None for e in r) for r in (self.sheet.MT.data if data is None else data))
 
     def check_validation_validity(self, col: int, validation: list[str]) -> str | list[str]:
         if not validation:
@@ -5085,6 +5443,20 @@ class Tree_Editor(tk.Frame):
                 pass
         return s
 
+    def typed_cell(self, s: str, type_: str) -> tuple[object, str]:
+        if type_ == "Number":
+            value = self.format_str_number(s)
+            return value, f"{value}"
+        value = self.format_str_date(s)
+        return value, self.format_date_str(value)
+
+    def typed_cells_cache(self, type_: str) -> dict[str, tuple[object, str]]:
+        # {cell string: (number or date value, tidied cell string)}, date results depend on the date format
+        key = (type_, self.DATE_FORM if type_ == "Date" else "")
+        if key not in self.typed_cells or len(self.typed_cells[key]) > max_typed_cells:
+            self.typed_cells[key] = {}
+        return self.typed_cells[key]
+
     def format_date_str(self, d):
         if isinstance(d, datetime.timedelta):
             return f"{d.days}"
@@ -5092,6 +5464,61 @@ class Tree_Editor(tk.Frame):
             return d.strftime(self.DATE_FORM)
         return f"{d}"
 
+    def rebuild_search_index(self) -> None:
+        # the thread builds into its own index, the unready one in use until the swap answers
+        # every search with None, edits made while building are queued and added on the swap
+        index = SearchIndex()
+        self.search_index = SearchIndex()
+        self.search_index_building = index
+        self.search_index_queue = []
+        thread = threading.Thread(
+            target=index.build,
+            args=(list(self.sheet.MT.data), self.ic),
+            daemon=True,
+        )
+        thread.start()
+        self.after(50, self.swap_search_index, thread, index)
+
+    def swap_search_index(self, thread: threading.Thread, index: SearchIndex) -> None:
+        if index is not self.search_index_building:
+            # a newer rebuild has started
+            return
+        if thread.is_alive():
+            self.after(50, self.swap_search_index, thread, index)
+            return
+        for iid, values in self.search_index_queue:
+            index.add(iid, values)
+        self.search_index = index
+        self.search_index_building = None
+        self.search_index_queue = []
+
+    def index_cells(self, rows: Iterable[int], columns: Iterable[int] | None = None) -> None:
+        quick_data = self.sheet.MT.data
+        for rn in rows:
+            row = quick_data[rn]
+            values = row if columns is None else [row[c] for c in columns]
+            self.search_index.add(row[self.ic].lower(), values)
+            if self.search_index_building is not None:
+                self.search_index_queue.append((row[self.ic].lower(), values.copy()))
+
+    def search_candidates(self, search: str) -> list[int] | None:
+        # row numbers which might contain search in sheet order, None if every row must be searched
+        if (iids := self.search_index.candidates(search)) is None:
+            return None
+        return sorted(self.rns[iid] for iid in iids if iid in self.rns)
+
+    def search_nodes(self, search: str) -> Iterable[tuple[str, Node]]:
+        if (rows := self.search_candidates(search)) is None:
+            return self.nodes.items()
+        quick_data = self.sheet.MT.data
+        return ((iid, self.nodes[iid]) for rn in rows if (iid := quick_data[rn][self.ic].lower()) in self.nodes)
+
+    def search_rows(self, search: str) -> Iterable[list[str]]:
+        if (rows := self.search_candidates(search)) is None:
+            return self.sheet.MT.data
+        quick_data = self.sheet.MT.data
+        return (quick_data[rn] for rn in rows)
+
     def refresh_formatting(
         self,
         rows: int | Iterator | None = None,
@@ -5099,9 +5526,12 @@ class Tree_Editor(tk.Frame):
         dehighlight: bool = False,
         ignore_empty: bool = False,
     ):
+        # highlights are copied into the treeview when it's built
+        self.tree_changed()
         if dehighlight:
             self.sheet.dehighlight_cells(all_=True, redraw=False)
 
+        full = rows is None and columns is None
         if rows is None:
             rows = range(len(self.sheet.MT.data))
         elif isinstance(rows, int):
@@ -5115,108 +5545,71 @@ class Tree_Editor(tk.Frame):
         if not rows:
             return
 
-        # used within eval if a date column condition contains "cd"
+        # used if a date column condition contains "cd"
         try:
             cd = datetime.datetime.strptime(
                 datetime.datetime.today().strftime(self.DATE_FORM),
                 self.DATE_FORM,
             )
         except Exception:
-            cd = datetime.timedelta(days=0)  # noqa: F841
+            cd = datetime.timedelta(days=0)
+        slash_date_form = self.convert_hyphen_to_slash_date_form(self.DATE_FORM)
 
+        # Text columns get {lowercase condition: color}, the first condition wins,
+        # Number and Date columns get [(predicate, color), ...]
         all_conditions = {}
-        number_cols = set()
-        date_cols = set()
-        for col, hdr in enumerate(self.headers):
-            if hdr.type_ == "Number":
-                number_cols.add(col)
-            elif hdr.type_ == "Date":
-                date_cols.add(col)
-
         for col in columns:
             if ignore_empty and not self.headers[col].formatting:
                 continue
-            modified_conditions = []
-            all_conditions[col] = {}
-
-            if self.headers[col].type_ in ("ID", "Parent", "Text"):
-                all_conditions[col] = self.headers[col].formatting
-
-            elif self.headers[col].type_ == "Number":
-                for condition in self.headers[col].formatting:
-                    cond, color = condition
-                    if cond:
-                        cond = "cell " + cond.replace("and", "and cell").replace("or", "or cell")
-                        modified_conditions.append((cond, color))
-                    else:
-                        modified_conditions.append(("not cell", color))
-                all_conditions[col] = modified_conditions
-
-            elif self.headers[col].type_ == "Date":
-                for condition in self.headers[col].formatting:
-                    cond, color = condition
-                    if cond:
-                        cond = cond.replace("and", "and cell").replace("or", "or cell")
-                        cond = "cell " + "".join(
-                            [
-                                (
-                                    f"datetime.timedelta(days=int({e}))"
-                                    if isreal(e)
-                                    else (
-                                        f"datetime.datetime.strptime('{e}',self.convert_hyphen_to_slash_date_form(self.DATE_FORM))"
-                                        if "/" in e
-                                        else e
-                                    )
-                                )
-                                for e in re.split("([0-9/]+)", cond)
-                            ]
-                        )
-                        modified_conditions.append((cond, color))
-                    else:
-                        modified_conditions.append(("not cell", color))
-                all_conditions[col] = modified_conditions
+            type_ = self.headers[col].type_
+            if type_ in ("Number", "Date"):
+                all_conditions[col] = [
+                    (predicate, color)
+                    for cond, color in self.headers[col].formatting
+                    if (predicate := compile_condition(type_, cond, slash_date_form, cd)) is not None
+                ]
+            else:
+                all_conditions[col] = {}
+                for cond, color in self.headers[col].formatting:
+                    all_conditions[col].setdefault(cond.lower(), color)
 
         quick_data = self.sheet.MT.data
         for col in filter(all_conditions.__contains__, columns):
+            conditions = all_conditions[col]
+            type_ = self.headers[col].type_
+            typed = self.typed_cells_cache(type_) if type_ in ("Number", "Date") else None
             for rn in rows:
                 self.sheet.dehighlight_cells(row=rn, column=col, redraw=False)
                 cell = quick_data[rn][col]
 
-                # convert cell to number/date
+                if typed is None:
+                    if (color := conditions.get(cell.lower())) is not None:
+                        self.sheet.highlight_cells(row=rn, column=col, bg=color, fg="black")
+                    continue
+
+                # convert cell to number/date and store its tidied string
                 if cell:
-                    if col in number_cols:
-                        cell = self.format_str_number(cell)
-                    elif col in date_cols:
-                        cell = self.format_str_date(cell)
-
-                # apply highlights
-                if col in number_cols or col in date_cols:
-                    for cond, color in all_conditions[col]:
-                        try:
-                            if eval(cond):
-                                self.sheet.highlight_cells(
-                                    row=rn,
-                                    column=col,
-                                    bg=color,
-                                    fg="black",
-                                )
-                                break
-                        except Exception:
-                            continue
+                    if (cached := typed.get(cell)) is None:
+                        cached = typed[cell] = self.typed_cell(cell, type_)
+                    cell, quick_data[rn][col] = cached
 
-                else:
-                    for cond, color in all_conditions[col]:
-                        if cell.lower() == cond.lower():
-                            self.sheet.highlight_cells(row=rn, column=col, bg=color, fg="black")
+                for predicate, color in conditions:
+                    try:
+                        if predicate(cell):
+                            self.sheet.highlight_cells(
+                                row=rn,
+                                column=col,
+                                bg=color,
+                                fg="black",
+                            )
                             break
+                    except Exception:
+                        continue
 
-                # convert cell back to string
-                if cell != "":
-                    if col in number_cols:
-                        quick_data[rn][col] = f"{cell}"
-                    elif col in date_cols:
-                        quick_data[rn][col] = self.format_date_str(cell)
-
+        if full:
+            self.rebuild_search_index()
+        else:
+            self.index_cells(rows, columns)
         self.refresh_rows = set()
 
     def rc_edit_validation(self, event=None):
@@ -5485,6 +5878,7 @@ class Tree_Editor(tk.Frame):
     def add_hier_col(self, col, name, snapshot=True):
         if snapshot:
             self.snapshot_add_col(col)
+            self.structure_changed()
         self.ic = push_n(self.ic, [col])
         self.pc = push_n(self.pc, [col])
         self.tv_label_col = push_n(self.tv_label_col, [col])
@@ -5620,6 +6014,8 @@ class Tree_Editor(tk.Frame):
             self.associate()
         self.row_len -= len(cols)
         self.adjust_hiers_del_cols(cols)
+        # hierarchy column numbers have moved
+        self.structure_changed()
         if snapshot:
             self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
 
@@ -5727,23 +6123,140 @@ class Tree_Editor(tk.Frame):
             if not self.changelog[idx][1].startswith(prefix):
                 yield idx
 
+    def reset_undo_history(self) -> None:
+        self.close_undo_history()
+        # the redo stack gets a quarter of the budget, undone whole sheet actions store whole sheets
+        mem_limit = int(self.undo_mem_limit_mb * 1024**2)
+        self.vs = UndoHistory(mem_limit=mem_limit)
+        self.redo_vs = UndoHistory(mem_limit=mem_limit // 4)
+        # redo entries set aside by snapshot_chore() until the new undo entry is known to be kept
+        self.stashed_redo_vs = None
+
+    def snapshot_state(self) -> dict:
+        return {
+            "type": "state",
+            "og_file": self.warnings_filepath,
+            "og_sheet": self.warnings_sheet,
+            "build_warnings": self.warnings,
+            "date_form": self.DATE_FORM,
+            "sheet_changes": self.sheet_changes,
+            "changelog": zlib.compress(pickle.dumps(self.changelog)),
+            "sheet": zlib.compress(pickle.dumps(self.sheet.MT.data)),
+            "required_data": self.get_required_snapshot_data(),
+        }
+
+    def close_undo_history(self) -> None:
+        for stack in ("vs", "redo_vs", "stashed_redo_vs"):
+            if isinstance(getattr(self, stack, None), UndoHistory):
+                getattr(self, stack).clear()
+
     def undo(self, event=None):
         if self.C.working or not self.vs:
             return "break"
         self.start_work("Undoing last action...")
+        self.swap_snapshot(self.vs.pop(), self.redo_vs)
+
+    def redo(self, event=None):
+        if self.C.working or not self.redo_vs:
+            return "break"
+        self.start_work("Redoing last undone action...")
+        self.swap_snapshot(self.redo_vs.pop(), self.vs)
+
+    def swap_snapshot(self, new_vs: dict, other: UndoHistory) -> None:
+        # restores new_vs and puts what it replaces on the other stack
+        self.clear_stashed_redo()
+        inverse = self.inverse_snapshot(new_vs)
+        if inverse is None:
+            other.append(self.snapshot_state())
+            self.restore_snapshot(new_vs)
+            return
+        changelog, sheet_changes = self.changelog, self.sheet_changes
+        self.restore_snapshot(new_vs)
+        if "redo_changelog" not in new_vs:
+            # the changelog rows the undo removed, redoing puts them back
+            inverse["redo_changelog"] = changelog[len(self.changelog) :]
+            inverse["redo_sheet_changes"] = sheet_changes - self.sheet_changes
+        other.append(inverse)
+        self.set_undo_label()
+
+    def inverse_snapshot(self, vs: dict) -> dict | None:
+        # a delta entry holding the current state of what restoring vs will change,
+        # None for whole sheet entries, their inverse is snapshot_state()
+        if "nodes" not in vs:
+            return None
+        self.save_info_get_saved_info()
+        inverse = {
+            "type": vs["type"],
+            "nodes": {},
+            "topnodes_order": {h: list(self.topnodes_order.get(h, ())) for h in vs["topnodes_order"]},
+            "required_data": self.get_required_snapshot_data(delta=True),
+        }
+        for iid in vs["nodes"]:
+            if node := self.nodes.get(iid):
+                inverse["nodes"][iid] = (node.name, {h: cn.copy() for h, cn in node.cn.items()}, node.ps.copy())
+            else:
+                inverse["nodes"][iid] = None
+        if "subtrees" in vs:
+            inverse["subtrees"] = [(iid, new_h, old_h) for iid, old_h, new_h in reversed(vs["subtrees"])]
+        quick_data = self.sheet.MT.data
+        if vs["type"] == "ctrl x, v, del key":
+            inverse["cells"] = {(r, c): f"{quick_data[r][c]}" for r, c in vs["cells"]}
+        elif vs["type"] == "ctrl x, v, del key id par":
+            inverse["cells"] = {(r, c): f"{quick_data[r][c]}" for r, c in vs["cells"]}
+            inverse["nrows"] = vs["nrows"]
+            inverse["added_rows"] = [row.copy() for row in islice(quick_data, vs["nrows"], None)]
+        elif vs["type"] == "rename id":
+            inverse["rows"] = []
+            for tup in vs["rows"]:
+                rn, h, _ = pickle.loads(zlib.decompress(tup))
+                inverse["rows"].append(zlib.compress(pickle.dumps((rn, h, quick_data[rn][h]))))
+            rn, _, old, new = vs["ikrow"]
+            inverse["ikrow"] = (rn, new.lower(), quick_data[rn][self.ic], old)
+        elif vs["type"] == "paste id":
+            inverse["rows"] = []
+            for tup in vs["rows"]:
+                rn, fromcol, _, tocol, _ = pickle.loads(zlib.decompress(tup))
+                inverse["rows"].append(
+                    zlib.compress(pickle.dumps((rn, fromcol, quick_data[rn][fromcol], tocol, quick_data[rn][tocol])))
+                )
+        elif vs["type"] == "add id":
+            rn = vs["row"]["rn"]
+            if vs["row"]["added_or_changed"] == "added":
+                inverse["row"] = {"added_or_changed": "removed", "rn": rn, "stored": quick_data[rn].copy()}
+            elif vs["row"]["added_or_changed"] == "removed":
+                inverse["row"] = {"added_or_changed": "added", "rn": rn}
+            else:
+                inverse["row"] = {"added_or_changed": "changed", "rn": rn, "stored": quick_data[rn].copy()}
+        return inverse
+
+    def restore_snapshot(self, new_vs: dict) -> None:
+        self.structure_changed()
         self.C.unsaved_changes = True
         self.C.change_app_title(star="add")
-        new_vs = self.vs.pop()
+        delta = "nodes" in new_vs
+        if delta:
+            self.save_info_get_saved_info()
+        tree_layout = (self.ic, self.pc, tuple(self.hiers), self.row_len, self.tv_label_col)
         self.ic = new_vs["required_data"]["ic"]
         self.pc = new_vs["required_data"]["pc"]
         self.hiers = new_vs["required_data"]["hiers"]
-        self.nodes = pickle.loads(new_vs["required_data"]["nodes"])
         self.tv_label_col = new_vs["required_data"]["tv_label_col"]
         self.row_len = new_vs["required_data"]["row_len"]
         self.mirror_var = new_vs["required_data"]["mirror_bool"]
         self.auto_sort_nodes_bool = new_vs["required_data"]["auto_sort_nodes_bool"]
-        self.topnodes_order = new_vs["required_data"]["topnodes_order"]
-        self.saved_info = pickle.loads(new_vs["required_data"]["saved_info"])
+        if delta:
+            self.undo_journal(new_vs)
+            view = new_vs["required_data"]["view"]
+            self.saved_info[self.pc].update(
+                scrolls=DotDict(view["scrolls"]),
+                opens=dict(view["opens"]),
+                boxes=list(view["boxes"]),
+                selected=view["selected"],
+            )
+        else:
+            self.nodes = pickle.loads(new_vs["required_data"]["nodes"])
+            self.topnodes_order = new_vs["required_data"]["topnodes_order"]
+            self.saved_info = pickle.loads(new_vs["required_data"]["saved_info"])
         self.tagged_ids = new_vs["required_data"]["tagged_ids"]
         self.sheet.align_columns(
             columns=new_vs["required_data"]["sheet_column_alignments"],
@@ -5757,7 +6270,13 @@ class Tree_Editor(tk.Frame):
         self.clear_copied_details()
         self.headers = new_vs["required_data"]["headers"]
 
-        if new_vs["type"] in (
+        if new_vs["type"] == "state":
+            self.sheet_changes = new_vs["sheet_changes"]
+            self.changelog = pickle.loads(zlib.decompress(new_vs["changelog"]))
+        elif "redo_changelog" in new_vs:
+            self.sheet_changes += new_vs["redo_sheet_changes"]
+            self.changelog = self.changelog + new_vs["redo_changelog"]
+        elif new_vs["type"] in (
             "full sheet",
             "ctrl x, v, del key",
             "ctrl x, v, del key id par",
@@ -5774,14 +6293,18 @@ class Tree_Editor(tk.Frame):
                 self.sheet_changes = 0
                 self.changelog = []
         else:
-            del self.changelog[-1]
+            # a new list, swap_snapshot() keeps the old one to find the removed rows
+            self.changelog = self.changelog[:-1]
         if new_vs["type"] == "add id":
             rn = new_vs["row"]["rn"]
             if new_vs["row"]["added_or_changed"] == "changed":
                 self.sheet.MT.data[rn] = new_vs["row"]["stored"]
                 self.refresh_formatting(rows=rn)
             elif new_vs["row"]["added_or_changed"] == "added":
-                del self.sheet.MT.data[rn]
+                self.sheet.del_rows(rn, redraw=False)
+            elif new_vs["row"]["added_or_changed"] == "removed":
+                self.sheet.insert_row(new_vs["row"]["stored"], idx=rn, redraw=False)
+                self.refresh_formatting(rows=rn)
             self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
 
         elif new_vs["type"] == "rename id":
@@ -5886,7 +6409,9 @@ class Tree_Editor(tk.Frame):
                     self.sheet.MT.data[rn][col] = cell
             self.refresh_formatting(columns=date_cols)
 
-        elif new_vs["type"].startswith("full"):
+        elif new_vs["type"].startswith("full") or new_vs["type"] == "state":
+            if "date_form" in new_vs:
+                self.DATE_FORM = new_vs["date_form"]
             self.warnings_filepath = new_vs["og_file"]
             self.warnings_sheet = new_vs["og_sheet"]
             self.warnings = new_vs["build_warnings"]
@@ -5894,11 +6419,24 @@ class Tree_Editor(tk.Frame):
             self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
             self.refresh_formatting(dehighlight=True)
 
-        elif new_vs["type"] == "ctrl x, v, del key id par":
+        elif new_vs["type"] == "ctrl x, v, del key id par" and "sheet" in new_vs:
             self.sheet.MT.data = pickle.loads(zlib.decompress(new_vs["sheet"]))
             self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
             self.refresh_formatting(dehighlight=True)
 
+        elif new_vs["type"] == "ctrl x, v, del key id par":
+            nrows = new_vs["nrows"]
+            if len(self.sheet.MT.data) > nrows:
+                self.sheet.del_rows(range(nrows, len(self.sheet.MT.data)), undo=False, redraw=False)
+            for row in new_vs["added_rows"]:
+                self.sheet.insert_row(row, undo=False, redraw=False)
+            for (r, c), v in new_vs["cells"].items():
+                self.sheet.MT.data[r][c] = v
+                self.mark_dirty(r, c)
+            if new_vs["added_rows"]:
+                self.mark_dirty(range(nrows, len(self.sheet.MT.data)))
+            self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
+
         elif new_vs["type"] == "ctrl x, v, del key":
             rows = set()
             cols = set()
@@ -5906,12 +6444,23 @@ class Tree_Editor(tk.Frame):
                 self.sheet.MT.data[k[0]][k[1]] = v
                 rows.add(k[0])
                 cols.add(k[1])
-            self.refresh_formatting(rows=rows, columns=cols)
+            self.mark_dirty(rows, cols)
 
         self.sheet.row_index(newindex=self.ic)
         self.sheet.set_column_widths(new_vs["required_data"]["sheet_col_positions"], canvas_positions=True)
-        self.sheet.set_safe_row_heights(new_vs["required_data"]["sheet_row_positions"])
-        self.redo_tree_display()
+        if "sheet_row_positions" in new_vs["required_data"]:
+            self.sheet.set_safe_row_heights(new_vs["required_data"]["sheet_row_positions"])
+        # cell only changes with the same tree layout only need their own cells refreshing
+        if (
+            new_vs["type"] == "ctrl x, v, del key"
+            and not new_vs["nodes"]
+            and tree_layout == (self.ic, self.pc, tuple(self.hiers), self.row_len, self.tv_label_col)
+        ):
+            self.refresh_dirty()
+        else:
+            self.refresh_formatting(rows=self.dirty_rows, columns=self.dirty_cols)
+            self.clear_dirty()
+            self.redo_tree_display()
         self.set_headers()
         self.refresh_hier_dropdown(self.hiers.index(self.pc))
         self.rehighlight_tagged_ids()
@@ -5948,9 +6497,13 @@ class Tree_Editor(tk.Frame):
 
     def set_undo_label(self, event=None):
         if self.vs:
-            self.edit_menu.entryconfig(0, label=f"Undo {len(self.vs)}/30")
+            self.edit_menu.entryconfig(0, label=f"Undo {len(self.vs)}", state="normal")
         else:
-            self.edit_menu.entryconfig(0, label=f"Undo {len(self.vs)}/30", state="disabled")
+            self.edit_menu.entryconfig(0, label=f"Undo {len(self.vs)}", state="disabled")
+        if self.redo_vs:
+            self.edit_menu.entryconfig(1, label=f"Redo {len(self.redo_vs)}", state="normal")
+        else:
+            self.edit_menu.entryconfig(1, label=f"Redo {len(self.redo_vs)}", state="disabled")
 
     def copy_headers(self):
         return [
@@ -5982,7 +6535,32 @@ class Tree_Editor(tk.Frame):
         )
         return self.saved_info
 
-    def get_required_snapshot_data(self):
+    def get_required_snapshot_data(self, delta: bool = False):
+        # delta snapshots do not store the nodes, saved info or row heights,
+        # the action records the nodes it changes using journal_nodes()
+        if delta:
+            return {
+                # copies, the live view info is edited in place, e.g. opens by change_ID_name()
+                "view": {
+                    "scrolls": DotDict(self.saved_info[self.pc].scrolls),
+                    "opens": dict(self.saved_info[self.pc].opens),
+                    "boxes": list(self.saved_info[self.pc].boxes),
+                    "selected": self.saved_info[self.pc].selected,
+                },
+                "sheet_col_positions": list(self.sheet.get_column_widths(canvas_positions=True)),
+                "tv_label_col": int(self.tv_label_col),
+                "tagged_ids": set(self.tagged_ids),
+                "sheet_column_alignments": dict(self.sheet.get_column_alignments()),
+                "headers": self.copy_headers(),
+                "ic": int(self.ic),
+                "pc": int(self.pc),
+                "hiers": list(self.hiers),
+                "row_len": int(self.row_len),
+                "auto_sort_nodes_bool": bool(self.auto_sort_nodes_bool),
+                "mirror_bool": bool(self.mirror_var),
+                "focus": self.tree.has_focus(),
+                "sheet_selections": self.get_sheet_sel(),
+            }
         return {
             "saved_info": pickle.dumps(self.save_info_get_saved_info()),
             "sheet_col_positions": list(self.sheet.get_column_widths(canvas_positions=True)),
@@ -6004,13 +6582,48 @@ class Tree_Editor(tk.Frame):
         }
 
     def snapshot_ctrl_x_v_del_key_id_par(self):
+        # rows past nrows are parents made by the edit, full_id_par_snapshot()
+        # replaces the entry if the edit needs rebuild_tree()
         self.snapshot_chore()
-        self.save_sheet_row_heights()
         self.vs.append(
             {
                 "type": "ctrl x, v, del key id par",
-                "sheet": zlib.compress(pickle.dumps(self.sheet.MT.data)),
-                "required_data": self.get_required_snapshot_data(),
+                "cells": {},
+                "nrows": len(self.sheet.MT.data),
+                "added_rows": [],
+                "nodes": {},
+                "topnodes_order": {},
+                "required_data": self.get_required_snapshot_data(delta=True),
+            }
+        )
+
+    def full_id_par_snapshot(self) -> None:
+        # a rebuilt tree can't be undone from a delta entry, the whole sheet entry is made
+        # from the current sheet and nodes with the journaled changes taken back out
+        vs = self.vs.pop()
+        quick_data = self.sheet.MT.data
+        sheet = quick_data[: vs["nrows"]]
+        for (r, c), v in vs["cells"].items():
+            if sheet[r] is quick_data[r]:
+                sheet[r] = sheet[r].copy()
+            sheet[r][c] = v
+        nodes = dict(self.nodes)
+        for iid, state in vs["nodes"].items():
+            if state is None:
+                nodes.pop(iid, None)
+            else:
+                nodes[iid] = Node(state[0], self.hiers, cn=state[1], ps=state[2])
+        self.save_sheet_row_heights()
+        required_data = self.get_required_snapshot_data()
+        required_data.update((k, v) for k, v in vs["required_data"].items() if k != "view")
+        required_data["nodes"] = pickle.dumps(nodes)
+        required_data["topnodes_order"].update(vs["topnodes_order"])
+        required_data["sheet_row_positions"] = required_data["sheet_row_positions"][: vs["nrows"]]
+        self.vs.append(
+            {
+                "type": vs["type"],
+                "sheet": zlib.compress(pickle.dumps(sheet)),
+                "required_data": required_data,
             }
         )
 
@@ -6020,7 +6633,9 @@ class Tree_Editor(tk.Frame):
             {
                 "type": "ctrl x, v, del key",
                 "cells": {},
-                "required_data": self.get_required_snapshot_data(),
+                "nodes": {},
+                "topnodes_order": {},
+                "required_data": self.get_required_snapshot_data(delta=True),
             }
         )
 
@@ -6043,7 +6658,9 @@ class Tree_Editor(tk.Frame):
             {
                 "type": "add id",
                 "row": {},
-                "required_data": self.get_required_snapshot_data(),
+                "nodes": {},
+                "topnodes_order": {},
+                "required_data": self.get_required_snapshot_data(delta=True),
             }
         )
 
@@ -6054,7 +6671,9 @@ class Tree_Editor(tk.Frame):
                 "type": "rename id",
                 "rows": [],
                 "ikrow": (),
-                "required_data": self.get_required_snapshot_data(),
+                "nodes": {},
+                "topnodes_order": {},
+                "required_data": self.get_required_snapshot_data(delta=True),
             }
         )
 
@@ -6064,7 +6683,10 @@ class Tree_Editor(tk.Frame):
             {
                 "type": "paste id",
                 "rows": [],
-                "required_data": self.get_required_snapshot_data(),
+                "subtrees": [],
+                "nodes": {},
+                "topnodes_order": {},
+                "required_data": self.get_required_snapshot_data(delta=True),
             }
         )
 
@@ -6226,6 +6848,9 @@ class Tree_Editor(tk.Frame):
             if self.auto_sort_nodes_bool:
                 self.auto_sort_nodes_bool = False
                 self.remake_topnodes_order()
+            if successful:
+                self.journal_nodes(self.get_ids_parent(iid) for iid in index_only)
+                self.journal_topnodes((self.pc,))
             self.redo_tree_display(selections=False)
             move_to_index = self.tree.index(move_to_iid)
             if (
@@ -6234,6 +6859,7 @@ class Tree_Editor(tk.Frame):
                 and min(moved_rows) < self.tree.data_r(event.value)
             ):
                 move_to_index -= 1
+            self.structure_changed()
             if parik := self.get_ids_parent(index_only[0]):
                 self.nodes[parik].cn[self.pc].insert(
                     move_to_index,
@@ -6404,9 +7030,85 @@ class Tree_Editor(tk.Frame):
             }
         )
 
+    def journal_nodes(self, iids: Iterable[str]) -> None:
+        # stores the state of nodes before the first change to them for a delta snapshot
+        if not self.vs or (journal := self.vs[-1].get("nodes")) is None:
+            return
+        for iid in iids:
+            if iid and iid not in journal:
+                if node := self.nodes.get(iid):
+                    journal[iid] = (node.name, {h: cn.copy() for h, cn in node.cn.items()}, node.ps.copy())
+                else:
+                    journal[iid] = None
+
+    def journal_cells(self, cells: Iterable[tuple[int, int]]) -> None:
+        # stores the values of cells before the first change to them for a delta snapshot
+        if not self.vs or (journal := self.vs[-1].get("cells")) is None:
+            return
+        quick_data = self.sheet.MT.data
+        for r, c in cells:
+            if (r, c) not in journal:
+                journal[(r, c)] = f"{quick_data[r][c]}"
+
+    def journal_subtree(self, iid: str, old_h: int, new_h: int) -> None:
+        # iid's descendants are about to move from old_h to new_h, their state in old_h is
+        # what it will be in new_h so the move is stored instead of the nodes
+        if self.vs and (journal := self.vs[-1].get("subtrees")) is not None:
+            journal.append((iid, old_h, new_h))
+
+    def journal_topnodes(self, hiers: Iterable[int]) -> None:
+        if self.auto_sort_nodes_bool or not self.vs or (journal := self.vs[-1].get("topnodes_order")) is None:
+            return
+        for h in hiers:
+            if h not in journal:
+                journal[h] = list(self.topnodes_order[h])
+
+    def iids_and_parents(self, iids: Iterable[str], h: int) -> Generator[str]:
+        for iid in iids:
+            if iid and iid in self.nodes:
+                yield iid
+                if pk := self.nodes[iid].ps[h]:
+                    yield pk
+
+    def undo_journal(self, vs: dict) -> None:
+        # subtrees first, their roots are still where the move put them
+        for iid, old_h, new_h in reversed(vs.get("subtrees", ())):
+            stack = list(self.nodes[iid].cn[new_h])
+            while stack:
+                node = self.nodes[stack.pop()]
+                node.ps[old_h], node.ps[new_h] = node.ps[new_h], None
+                node.cn[old_h], node.cn[new_h] = node.cn[new_h], []
+                stack.extend(node.cn[old_h])
+        for iid, state in vs["nodes"].items():
+            if state is None:
+                self.nodes.pop(iid, None)
+            else:
+                self.nodes[iid] = Node(state[0], self.hiers, cn=state[1], ps=state[2])
+        for h, order in vs["topnodes_order"].items():
+            self.topnodes_order[h] = order
+
     def snapshot_chore(self):
+        self.tree_changed()
         self.save_info_get_saved_info()
-        self.edit_menu.entryconfig(0, label=f"Undo {len(self.vs)}/30", state="normal")
+        self.clear_stashed_redo()
+        if self.redo_vs:
+            self.stashed_redo_vs, self.redo_vs = self.redo_vs, UndoHistory(mem_limit=self.redo_vs.mem_limit)
+        self.edit_menu.entryconfig(0, label=f"Undo {len(self.vs) + 1}", state="normal")
+        self.edit_menu.entryconfig(1, label="Redo  0", state="disabled")
+
+    def clear_stashed_redo(self) -> None:
+        # the entry made after the redo entries were set aside has been kept
+        if self.stashed_redo_vs is not None:
+            self.stashed_redo_vs.clear()
+            self.stashed_redo_vs = None
+
+    def drop_snapshot(self) -> None:
+        # for an action which turned out to change nothing, the redo entries it set aside come back
+        self.vs.pop()
+        if self.stashed_redo_vs is not None:
+            self.redo_vs.clear()
+            self.redo_vs, self.stashed_redo_vs = self.stashed_redo_vs, None
+        self.set_undo_label()
 
     def sort_sheet_choice(self):
         popup = Sort_Sheet_Popup(self, [h.name for h in self.headers], theme=self.C.theme)
@@ -6484,15 +7186,17 @@ class Tree_Editor(tk.Frame):
                 self.sheet.MT.data.sort(key=ak, reverse=True)
         row_heights = self.sheet.get_row_heights()
         nrhs = []
+        moved = {}
         for i, r in enumerate(self.sheet.MT.data):
             ik = r[self.ic].lower()
             nrhs.append(row_heights[self.rns[ik]])
+            moved[self.rns[ik]] = i
             self.rns[ik] = i
         self.sheet.set_row_heights(nrhs)
         if snapshot:
             self.disable_paste()
             self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
-            self.refresh_formatting()
+            self.move_sheet_cell_options(moved)
             self.reset_tagged_ids_dropdowns()
             self.rehighlight_tagged_ids()
             self.redraw_sheets()
@@ -6523,7 +7227,7 @@ class Tree_Editor(tk.Frame):
         self.sheet.set_row_heights(nrhs)
         if snapshot:
             self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
-            self.refresh_formatting()
+            self.move_sheet_cell_options({oldrns[ik]: rn for ik, rn in self.rns.items()})
             self.reset_tagged_ids_dropdowns()
             self.rehighlight_tagged_ids()
             self.disable_paste()
@@ -6588,7 +7292,7 @@ class Tree_Editor(tk.Frame):
             return
         self.reset_tree_search_dropdown()
         search = search.lower()
-        for iid, node in self.nodes.items():
+        for iid, node in self.search_nodes(search):
             for i, e in enumerate(self.sheet.MT.data[self.rns[iid]]):
                 if search in e.lower():
                     for h, par in node.ps.items():
@@ -6627,7 +7331,11 @@ class Tree_Editor(tk.Frame):
             return
         self.reset_tree_search_dropdown()
         search = search.lower()
-        for iid, node in self.nodes.items():
+        if exact:
+            nodes = ((search, self.nodes[search]),) if search in self.nodes else ()
+        else:
+            nodes = self.search_nodes(search)
+        for iid, node in nodes:
             if (exact and search == iid) or (not exact and search in iid):
                 for h, par in node.ps.items():
                     if par is not None:
@@ -6664,7 +7372,7 @@ class Tree_Editor(tk.Frame):
         self.reset_tree_search_dropdown()
         search = search.lower()
         idcol_hiers = set(self.hiers) | {self.ic}
-        for iid, node in self.nodes.items():
+        for iid, node in self.search_nodes(search):
             for i, e in enumerate(self.sheet.MT.data[self.rns[iid]]):
                 if i not in idcol_hiers and ((exact and search == e.lower()) or (not exact and search in e.lower())):
                     for h, par in node.ps.items():
@@ -6710,7 +7418,7 @@ class Tree_Editor(tk.Frame):
             return
         self.reset_sheet_search_dropdown()
         search = search.lower()
-        for r in self.sheet.MT.data:
+        for r in self.search_rows(search):
             for i, e in enumerate(r):
                 if search in e.lower():
                     self.sheet_search_results.append(
@@ -6746,7 +7454,11 @@ class Tree_Editor(tk.Frame):
             return
         self.reset_sheet_search_dropdown()
         search = search.lower()
-        for r in self.sheet.MT.data:
+        if exact:
+            rows = (self.sheet.MT.data[self.rns[search]],) if search in self.rns else ()
+        else:
+            rows = self.search_rows(search)
+        for r in rows:
             if (exact and search == r[self.ic].lower()) or (not exact and search in r[self.ic].lower()):
                 self.sheet_search_results.append(
                     SearchResult(
@@ -6778,7 +7490,7 @@ class Tree_Editor(tk.Frame):
         self.reset_sheet_search_dropdown()
         search = search.lower()
         idcol_hiers = set(self.hiers) | {self.ic}
-        for r in self.sheet.MT.data:
+        for r in self.search_rows(search):
             for i, e in enumerate(r):
                 if i not in idcol_hiers and ((exact and search == e.lower()) or (not exact and search in e.lower())):
                     self.sheet_search_results.append(
@@ -6927,8 +7639,7 @@ class Tree_Editor(tk.Frame):
             self.cut_children_dct["id"], f"{self.selected_ID}", self.cut_children_dct["hier"]
         )
         if not success:
-            self.vs.pop()
-            self.set_undo_label()
+            self.drop_snapshot()
             return
         iid = self.nodes[self.cut_children_dct["id"]].name
         np = self.nodes[self.selected_ID.lower()].name
@@ -6960,8 +7671,7 @@ class Tree_Editor(tk.Frame):
             select_iids = ()
         success = self.cut_paste_children(self.cut_children_dct["id"], "", self.cut_children_dct["hier"])
         if not success:
-            self.vs.pop()
-            self.set_undo_label()
+            self.drop_snapshot()
             return
         iid = self.nodes[self.cut_children_dct["id"]].name
         self.changelog_append(
@@ -7616,8 +8326,7 @@ class Tree_Editor(tk.Frame):
         self.stop_work(self.get_tree_editor_status_bar_text())
 
     def unsuccessful_paste(self):
-        self.vs.pop()
-        self.set_undo_label()
+        self.drop_snapshot()
         self.stop_work(self.get_tree_editor_status_bar_text())
 
     def copy_ID(self, iids: Sequence[str]) -> None | Literal["break"]:
@@ -7630,15 +8339,11 @@ class Tree_Editor(tk.Frame):
         first_iid_par = self.tree.parent(first_iid)
         h = int(self.pc)
         self.copied.append({"id": first_iid.lower(), "parent": first_iid_par.lower(), "hier": h})
-        self.levels = defaultdict(list)
-        self.get_par_lvls(h, first_iid.lower())
-        first_iid_level = max(self.levels, default=0)
+        depth = self.tree_index(h).depth
+        first_iid_level = depth[first_iid.lower()]
         tr = []
         for iid in islice(iids, 1, None):
-            self.levels = defaultdict(list)
-            self.get_par_lvls(h, iid.lower())
-            iid_level = max(self.levels, default=0)
-            if self.tree.parent(iid) == first_iid_par or iid_level == first_iid_level:
+            if self.tree.parent(iid) == first_iid_par or depth[iid.lower()] == first_iid_level:
                 self.copied.append(
                     {
                         "id": iid.lower(),
@@ -7651,7 +8356,6 @@ class Tree_Editor(tk.Frame):
         if tr:
             self.tree.selection_remove(tr)
         self.enable_copy_paste()
-        self.levels = defaultdict(list)
         self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
         return "break"
 
@@ -7667,15 +8371,11 @@ class Tree_Editor(tk.Frame):
         first_iid_par = self.tree.parent(first_iid)
         h = int(self.pc)
         self.cut.append({"id": first_iid.lower(), "parent": first_iid_par.lower(), "hier": h})
-        self.levels = defaultdict(list)
-        self.get_par_lvls(h, first_iid.lower())
-        first_iid_level = max(self.levels, default=0)
+        depth = self.tree_index(h).depth
+        first_iid_level = depth[first_iid.lower()]
         tr = []
         for iid in islice(iids, 1, None):
-            self.levels = defaultdict(list)
-            self.get_par_lvls(h, iid.lower())
-            iid_level = max(self.levels, default=0)
-            if self.tree.parent(iid) == first_iid_par or iid_level == first_iid_level:
+            if self.tree.parent(iid) == first_iid_par or depth[iid.lower()] == first_iid_level:
                 self.cut.append(
                     {
                         "id": iid.lower(),
@@ -7688,7 +8388,6 @@ class Tree_Editor(tk.Frame):
         if tr:
             self.tree.selection_remove(tr)
         self.enable_cut_paste()
-        self.levels = defaultdict(list)
         if status_bar:
             self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
         return "break"
@@ -7826,7 +8525,7 @@ class Tree_Editor(tk.Frame):
         self.disable_paste()
         self.redo_tree_display()
         self.refresh_dropdowns()
-        if self.tree.exists(new_ik):
+        if self.tree.ensure_item(new_ik):
             self.tree.scroll_to_item(new_ik)
             self.tree.selection_set(new_ik)
         self.redraw_sheets()
@@ -8037,7 +8736,8 @@ class Tree_Editor(tk.Frame):
         self.snapshot_delete_ids()
         self.sheet.deselect("all", redraw=False)
         self.disable_paste()
-        self._del_id_orphan_core(self.selected_ID, self.selected_PAR if self.selected_PAR else "")
+        if to_del := self._del_id_orphan_core(self.selected_ID, self.selected_PAR if self.selected_PAR else ""):
+            self.sheet.del_rows(map(self.rns.__getitem__, to_del), redraw=False)
         self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
         self.refresh_formatting(rows=map(self.rns.__getitem__, self.refresh_rows))
         self.move_tree_pos()
@@ -8176,7 +8876,7 @@ class Tree_Editor(tk.Frame):
         self.snapshot_delete_ids()
         self.sheet.deselect("all", redraw=False)
         self.disable_paste()
-        self._del_id_all_orphan_core(self.selected_ID)
+        self.sheet.del_rows(map(self.rns.__getitem__, self._del_id_all_orphan_core(self.selected_ID)), redraw=False)
         self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
         self.refresh_formatting(rows=map(self.rns.__getitem__, self.refresh_rows))
         self.redo_tree_display()
@@ -8369,6 +9069,7 @@ class Tree_Editor(tk.Frame):
         toggle: bool = True,
         do_tree: bool = True,
     ):
+        self.tree_changed()
         if selection is None:
             if self.tree_has_focus:
                 selection = self.tree.selection(cells=True)
@@ -8417,6 +9118,7 @@ class Tree_Editor(tk.Frame):
         self.redraw_sheets()
 
     def tree_sheet_align(self, align):
+        self.tree_changed()
         boxes = self.sheet.boxes if self.sheet.has_focus() else self.tree.boxes
         for box in boxes:
             if box.type_ == "columns":
@@ -8430,6 +9132,7 @@ class Tree_Editor(tk.Frame):
                 )
 
     def untag_id(self, ik):
+        self.tree_changed()
         if ik in self.tagged_ids:
             self.tagged_ids.discard(ik)
             self.sheet.dehighlight_cells(row=self.rns[ik], canvas="row_index")
@@ -8437,6 +9140,7 @@ class Tree_Editor(tk.Frame):
                 self.tree.dehighlight_rows(self.tree.itemrow(ik))
 
     def clear_tagged_ids(self, event=None):
+        self.tree_changed()
         self.tagged_ids = set()
         self.reset_tagged_ids_dropdowns()
         self.sheet.dehighlight_cells(canvas="row_index", all_=True, redraw=True)
@@ -8460,6 +9164,7 @@ class Tree_Editor(tk.Frame):
         return "break"
 
     def rehighlight_tagged_ids(self, event=None):
+        self.tree_changed()
         self.sheet.dehighlight_cells(canvas="row_index", all_=True, redraw=False)
         self.tree.dehighlight_cells(canvas="row_index", all_=True, redraw=False)
         for ik in tuple(self.tagged_ids):
@@ -8501,7 +9206,7 @@ class Tree_Editor(tk.Frame):
         if not (ik := self.tree_tagged_ids_dropdown.get_my_value().lower()):
             return
         if ik in self.nodes:
-            if self.tree.exists(ik):
+            if self.tree.ensure_item(ik):
                 self.tree.scroll_to_item(ik)
                 self.tree.selection_set(ik)
             else:
@@ -8523,7 +9228,7 @@ class Tree_Editor(tk.Frame):
         if ik in self.rns:
             self.sheet.select_row(self.rns[ik])
             self.sheet.see(row=self.rns[ik], keep_xscroll=True)
-            if self.tree.exists(ik):
+            if self.tree.ensure_item(ik):
                 self.tree.scroll_to_item(ik)
                 self.tree.selection_set(ik)
         else:
@@ -8788,7 +9493,7 @@ class Tree_Editor(tk.Frame):
                 try:
                     if newfile.lower().endswith(".xlsx"):
                         self.C.wb = Workbook(write_only=True)
-                        ws = self.C.wb.create_sheet(title="Changelog")
+                        ws = xlsx_string_sheet(self.C.wb, title="Changelog")
                         ws.append(xlsx_changelog_header(ws))
                         for row in self.changelog:
                             ws.append(e if e else None for e in row)
@@ -8827,7 +9532,7 @@ class Tree_Editor(tk.Frame):
                 try:
                     if newfile.lower().endswith(".xlsx"):
                         self.C.wb = Workbook(write_only=True)
-                        ws = self.C.wb.create_sheet(title="Changelog")
+                        ws = xlsx_string_sheet(self.C.wb, title="Changelog")
                         ws.append(xlsx_changelog_header(ws))
                         if self.sheet_changes:
                             for row in islice(self.changelog, from_row, to_row):
@@ -8883,9 +9588,14 @@ class Tree_Editor(tk.Frame):
     def expand_id(self, event=None):
         if current := self.tree.selected:
             selections = self.tree.selection()
+            self.tree.load_subtree(self.selected_ID.lower())
             self.tree.tree_open({self.selected_ID.lower()} | set(self.tree.descendants(self.selected_ID.lower())))
             self.tree.selection_set(selections)
             self.tree.selected = current
+        elif self.tree.lazy:
+            self.save_info_get_saved_info()
+            self.saved_info[self.pc].opens = {iid: None for iid, node in self.nodes.items() if node.cn[self.pc]}
+            self.redo_tree_display()
         else:
             self.tree.tree_open()
 
@@ -8897,6 +9607,10 @@ class Tree_Editor(tk.Frame):
             self.tree.selection_set(set(filter(self.tree.item_displayed, selections)))
             if self.tree.item_displayed(current_iid):
                 self.tree.selected = current
+        elif self.tree.lazy:
+            self.save_info_get_saved_info()
+            self.saved_info[self.pc].opens = {}
+            self.redo_tree_display()
         else:
             self.tree.tree_close()
 
@@ -8965,26 +9679,26 @@ class Tree_Editor(tk.Frame):
         sheet = self.sheet.MT.data
         label_col = self.tv_label_col
         if self.tv_lvls_bool:
-            nodes = self.nodes
-            for node in row_index:
-                label = sheet[self.rns[node.iid]][label_col]
-                node.text = f"{self.get_node_level(nodes[node.iid])}. {label}"
+            for node, level in zip(row_index, self.tree_levels(node.iid for node in row_index)):
+                node.text = f"{level}. {sheet[self.rns[node.iid]][label_col]}"
         else:
             for node in row_index:
                 node.text = sheet[self.rns[node.iid]][label_col]
         self.tree.set_refresh_timer(redraw=True)
 
-    def refresh_tree_item(self, ID):
+    def refresh_tree_item(self, ID, columns: Iterable[int] | None = None):
+        self.tree_changed()
         iid = ID.lower()
         if self.tree.exists(iid):
             rn = self.rns[iid]
+            columns = range(self.row_len) if columns is None else tuple(columns)
             highlights = {
                 (rn, c): self.sheet.MT.cell_options[(rn, c)]["highlight"]
-                for c in range(self.row_len)
+                for c in columns
                 if (rn, c) in self.sheet.MT.cell_options and "highlight" in self.sheet.MT.cell_options[(rn, c)]
             }
             tree_row = self.tree.itemrow(iid)
-            self.tree.dehighlight_cells(cells=[(tree_row, c) for c in range(self.row_len)])
+            self.tree.dehighlight_cells(cells=[(tree_row, c) for c in columns])
             if highlights:
                 for cell, highlight in highlights.items():
                     self.tree.highlight_cells(tree_row, cell[1], bg=highlight.bg, fg="black")
@@ -9002,6 +9716,39 @@ class Tree_Editor(tk.Frame):
                     values=r,
                 )
 
+    def mark_dirty(self, rows: int | Iterable[int], columns: int | Iterable[int] | None = None) -> None:
+        # columns None for every column of the rows
+        self.dirty_rows.update((rows,) if isinstance(rows, int) else rows)
+        if columns is None:
+            self.dirty_cols = None
+        elif self.dirty_cols is not None:
+            self.dirty_cols.update((columns,) if isinstance(columns, int) else columns)
+
+    def clear_dirty(self) -> None:
+        self.dirty_rows = set()
+        self.dirty_cols = set()
+
+    def refresh_dirty(self) -> None:
+        # formatting and treeview cells for only the region given to mark_dirty(),
+        # for edits which don't change the tree structure
+        if not self.dirty_rows:
+            return
+        rows, columns = self.dirty_rows, self.dirty_cols
+        self.clear_dirty()
+        self.refresh_formatting(rows=rows, columns=columns)
+        quick_data = self.sheet.MT.data
+        for rn in rows:
+            if rn < len(quick_data):
+                self.refresh_tree_item(quick_data[rn][self.ic], columns)
+
+    def move_sheet_cell_options(self, moved: dict[int, int]) -> None:
+        # rows were reordered, {old row: new row}, move their highlights rather than
+        # evaluating all the formatting again
+        options = self.sheet.MT.cell_options
+        moved_options = {(moved.get(r, r), c): dct for (r, c), dct in options.items()}
+        options.clear()
+        options.update(moved_options)
+
     def redraw_sheets(self):
         self.sheet.set_refresh_timer()
         self.tree.set_refresh_timer()
@@ -9017,6 +9764,8 @@ class Tree_Editor(tk.Frame):
         self.sheet_search_results = []
 
     def get_node_level(self, node, level=1):
+        if self.tree_index_fresh():
+            return self.tree_indexes[self.pc].depth[node.name.lower()] + level
         current_node = node
         current_level = level
         while True:
@@ -9026,7 +9775,67 @@ class Tree_Editor(tk.Frame):
             current_level += 1
         return current_level
 
-    def redo_tree_display(self, selections=True):
+    def tree_changed(self) -> None:
+        # makes the cached treeviews stale
+        self.tree_generation += 1
+
+    def structure_changed(self) -> None:
+        # makes the tree indexes stale as well as the cached treeviews
+        self.structure_generation += 1
+        self.tree_changed()
+
+    def tree_index_fresh(self, h: int | None = None) -> bool:
+        index = self.tree_indexes.get(self.pc if h is None else h)
+        return index is not None and index.generation == self.structure_generation
+
+    def tree_levels(self, iids: Iterable[str]) -> Generator[int]:
+        # a lazy treeview shows few rows, walking up from each is cheaper than
+        # an O(n) index rebuild after every structural edit
+        if self.tree.lazy and not self.tree_index_fresh():
+            for iid in iids:
+                yield self.get_node_level(self.nodes[iid])
+        else:
+            depth = self.tree_index().depth
+            for iid in iids:
+                yield depth[iid] + 1
+
+    def tree_index(self, h: int | None = None) -> TreeIndex:
+        h = self.pc if h is None else h
+        if (index := self.tree_indexes.get(h)) is None or index.generation != self.structure_generation:
+            index = self.tree_indexes[h] = TreeIndex(self.nodes, h, self.structure_generation)
+        return index
+
+    def is_under(self, iid: str, ancestor: str, h: int) -> bool:
+        # inclusive, walks up from iid so it stays correct while nodes are being moved
+        while iid:
+            if iid == ancestor:
+                return True
+            iid = self.nodes[iid].ps[h] if iid in self.nodes else None
+        return False
+
+    def cache_tree_view(self) -> None:
+        if not self.sheet.data:
+            return
+        self.tree_cache = {
+            pc: cached for pc, cached in self.tree_cache.items() if cached[0] == self.tree_generation and pc != self.pc
+        }
+        self.tree_cache[self.pc] = (self.tree_generation, self.tree.get_tree_state())
+        # oldest entries go first, the one just cached is always kept
+        while (
+            len(self.tree_cache) > 1
+            and sum(len(cached[1]["data"]) for cached in self.tree_cache.values()) > max_cached_tree_rows
+        ):
+            del self.tree_cache[next(iter(self.tree_cache))]
+
+    def restore_tree_selections(self) -> None:
+        try:
+            self.tree.boxes = self.saved_info[self.pc].boxes
+            self.tree.selected = self.saved_info[self.pc].selected
+        except Exception:
+            self.saved_info[self.pc].boxes = ()
+            self.saved_info[self.pc].selected = ()
+
+    def redo_tree_display(self, selections=True, use_cache=False):
         if self.saved_info[self.pc].twidths:
             self.tree.set_column_widths(self.tree_gen_widths_from_saved())
         else:
@@ -9034,16 +9843,25 @@ class Tree_Editor(tk.Frame):
         self.selected_ID = ""
         self.selected_PAR = ""
         self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
+        if use_cache:
+            cached = self.tree_cache.pop(self.pc, None)
+            if cached and cached[0] == self.tree_generation and self.sheet.data:
+                self.tree.set_tree_state(cached[1])
+                if selections:
+                    self.restore_tree_selections()
+                return "break"
+        else:
+            self.tree_changed()
         if self.sheet.data:
             open_ids = self.saved_info[self.pc].opens if self.saved_info[self.pc].opens else None
+            self.tree.lazy = len(self.nodes) >= lazy_tree_min_nodes
+            iids = list(self.lazy_pc_iids(open_ids or {}) if self.tree.lazy else self.pc_iids())
             if self.tv_lvls_bool:
                 data = []
                 labels = []
-                for iid in self.pc_iids():
+                for iid, level in zip(iids, self.tree_levels(iids)):
                     data.append(self.sheet.data[self.rns[iid]])
-                    labels.append(
-                        f"{self.get_node_level(self.nodes[iid])}. {self.sheet.data[self.rns[iid]][self.tv_label_col]}"
-                    )
+                    labels.append(f"{level}. {self.sheet.data[self.rns[iid]][self.tv_label_col]}")
                 self.tree.tree_build(
                     data=data,
                     iid_column=self.ic,
@@ -9057,7 +9875,7 @@ class Tree_Editor(tk.Frame):
                 ).dehighlight_all()
             else:
                 self.tree.tree_build(
-                    data=[self.sheet.data[self.rns[iid]] for iid in self.pc_iids()],
+                    data=[self.sheet.data[self.rns[iid]] for iid in iids],
                     iid_column=self.ic,
                     parent_column=self.pc,
                     text_column=self.tv_label_col,
@@ -9067,7 +9885,10 @@ class Tree_Editor(tk.Frame):
                     ncols=self.row_len,
                     lower=True,
                 ).dehighlight_all()
+            if self.tree.lazy:
+                self.tree.lazy_built(iids, open_ids)
         else:
+            self.tree.lazy = False
             self.tree.reset(cell_options=False, column_widths=False, header=False, redraw=False)
 
         if self.saved_info[self.pc].theights:
@@ -9075,12 +9896,7 @@ class Tree_Editor(tk.Frame):
         else:
             self.tree.set_row_heights()
         if selections:
-            try:
-                self.tree.boxes = self.saved_info[self.pc].boxes
-                self.tree.selected = self.saved_info[self.pc].selected
-            except Exception:
-                self.saved_info[self.pc].boxes = ()
-                self.saved_info[self.pc].selected = ()
+            self.restore_tree_selections()
         tree_rns = self.tree.RI.rns
         if self.tagged_ids:
             options = self.tree.RI.cell_options
@@ -9271,59 +10087,37 @@ class Tree_Editor(tk.Frame):
             Error(self, "Filepath invalid   ", theme=self.C.theme)
             self.stop_work(self.get_tree_editor_status_bar_text())
             return
-        changes = []
-        row_len = 0
-        if fp.lower().endswith((".csv", ".tsv")):
-            try:
-                with open(fp, "r") as fh:
-                    temp_data = fh.read()
-                if not temp_data:
-                    Error(
-                        self,
-                        "No data found in file",
-                        theme=self.C.theme,
-                    )
-                    self.stop_work(self.get_tree_editor_status_bar_text())
-                    return
-                changes = csv_str_x_data(temp_data)
-            except Exception as error_msg:
-                Error(self, f"Error: {error_msg}", theme=self.C.theme)
-                self.stop_work(self.get_tree_editor_status_bar_text())
-                return
-        elif fp.lower().endswith(".json"):
-            try:
-                j = get_json_from_file(fp)
-                json_format = get_json_format(j)
-                if not json_format:
-                    Error(
-                        self,
-                        "Error opening file, could not find data of correct format   ",
-                        theme=self.C.theme,
-                    )
-                    self.stop_work(self.get_tree_editor_status_bar_text())
-                    return
-                changes, row_len = json_to_sheet(
+
+        def read_changes(task: BackgroundTask) -> list[list[str]]:
+            if fp.lower().endswith((".csv", ".tsv")):
+                return get_csv_data_from_file(fp, task=task)
+            elif fp.lower().endswith(".json"):
+                j = get_json_from_file(fp, task=task)
+                if not (json_format := get_json_format(j)):
+                    raise ValueError("Could not find data of correct format")
+                return json_to_sheet(
                     j,
                     format_=json_format[0],
                     key=json_format[1],
                     get_format=False,
                     return_rowlen=True,
-                )
-            except Exception as error_msg:
-                Error(self, f"Error: {error_msg}", theme=self.C.theme)
-                self.stop_work(self.get_tree_editor_status_bar_text())
-                return
-        elif fp.lower().endswith((".xls", ".xlsx", ".xlsm")):
-            try:
-                wb = load_workbook(bytes_io_wb(fp), read_only=True, data_only=True)
-                ws = wb[wb.sheetnames[0]]
-                ws.reset_dimensions()
-                changes = ws_x_data(ws)
-                wb.close()
-            except Exception as error_msg:
-                Error(self, f"Error: {error_msg}", theme=self.C.theme)
-                self.stop_work(self.get_tree_editor_status_bar_text())
-                return
+                )[0]
+            wb = load_xlsx(fp)
+            ws = wb[wb.sheetnames[0]]
+            ws.reset_dimensions()
+            changes = ws_x_data(ws)
+            wb.close()
+            return changes
+
+        try:
+            changes = self.C.run_task(read_changes, pass_task=True)
+        except TaskCancelled:
+            self.stop_work(self.get_tree_editor_status_bar_text())
+            return
+        except Exception as error_msg:
+            Error(self, f"Error: {error_msg}", theme=self.C.theme)
+            self.stop_work(self.get_tree_editor_status_bar_text())
+            return
         if not changes:
             Error(self, "File contains no data   ", theme=self.C.theme)
             self.stop_work(self.get_tree_editor_status_bar_text())
@@ -9334,19 +10128,76 @@ class Tree_Editor(tk.Frame):
             self.stop_work(self.get_tree_editor_status_bar_text())
             return
         equalize_sublist_lens(seq=changes, len_=row_len)
-        successful = []
-        excluded = 0
-        self.snapshot_sheet()
-        changes_len = len(changes)
-        for changenum, change in enumerate(changes):
-            if not changenum % 10:
-                self.C.update()
-                self.C.status_bar.change_text(f"Imported {changenum} / {changes_len} changes")
+        # the whole file is checked first against the sheet as the earlier changes leave it,
+        # only the changes which pass are applied
+        check = ImportCheck(self.headers, self.sheet.MT.data, self.nodes, self.rns)
+        to_apply = []
+        rejected = {}
+        for i, change in enumerate(changes):
             ctyp = change[1]
             if ctyp.startswith("Imported change |"):
                 ctyp = ctyp.split("Imported change | ")[1]
             elif ctyp.startswith("Merge |"):
                 ctyp = ctyp.split("Merge | ")[1]
+            if ctyp.removesuffix(" |") not in importable_changes:
+                rejected[i] = f"{change[1]} can't be imported"
+            elif reason := check.check(ctyp, change):
+                rejected[i] = reason
+            else:
+                to_apply.append((i, ctyp, change))
+        if not to_apply:
+            self.stop_work(self.get_tree_editor_status_bar_text())
+            Post_Import_Changes_Popup(self, changes, [False] * len(changes), theme=self.C.theme)
+            return
+        if rejected:
+            shown = "\n".join(f"Row {i + 1}: {reason}" for i, reason in islice(rejected.items(), 20))
+            confirm = Ask_Confirm(
+                self,
+                f"{len(rejected)} of {len(changes)} changes can't be applied and will be skipped:\n{shown}"
+                + ("\n..." if len(rejected) > 20 else ""),
+                theme=self.C.theme,
+            )
+            if not confirm.boolean:
+                self.stop_work(self.get_tree_editor_status_bar_text())
+                return
+        # None for changes which were already in the sheet
+        successful = []
+        # one undo entry for the whole import
+        self.snapshot_sheet()
+        # children are sorted and deleted rows removed once, before any change that needs them
+        deferred = {"sort": False, "rows": set()}
+
+        def defer_tree_work() -> None:
+            if self.auto_sort_nodes_bool:
+                self.auto_sort_nodes_bool = False
+                self.remake_topnodes_order()
+                deferred["sort"] = True
+
+        def finish_tree_work() -> None:
+            if deferred["rows"]:
+                self.sheet.del_rows(sorted(deferred["rows"]), redraw=False)
+                deferred["rows"] = set()
+                self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
+            if deferred["sort"]:
+                self.auto_sort_nodes_bool = True
+                self.sort_all_children()
+                deferred["sort"] = False
+
+        def delete_rows(to_del: list[str]) -> None:
+            # rows stay in the sheet until finish_tree_work(), so row numbers in rns stay correct
+            for iid in to_del:
+                if (rn := self.rns.pop(iid, None)) is not None:
+                    deferred["rows"].add(rn)
+
+        changes_len = len(to_apply)
+        for changenum, (_, ctyp, change) in enumerate(to_apply):
+            if not changenum % 1000:
+                self.C.update()
+                self.C.status_bar.change_text(f"Imported {changenum} / {changes_len} changes")
+            if ctyp.removesuffix(" |") in whole_sheet_changes:
+                finish_tree_work()
+            else:
+                defer_tree_work()
             try:
                 #  "Edit cell"
                 if ctyp == "Edit cell |" or ctyp == "Edit cell":
@@ -9377,8 +10228,12 @@ class Tree_Editor(tk.Frame):
                                 change[4],
                             )
                             self.sheet.MT.data[self.rns[cik]][col] = change[4]
-                            if oldv != newv and type_ == "ID" or type_ == "Parent":
+                            if (
+                                oldv != newv and type_ == "ID" or type_ == "Parent"
+                            ) and not self.edit_ids_pars_incremental([(self.rns[cik], col, oldv, newv)]):
+                                finish_tree_work()
                                 self.nodes = {}
+                                self.structure_changed()
                                 self.auto_sort_nodes_bool = True
                                 self.sheet.MT.data, self.nodes = TreeBuilder().build(
                                     self.sheet.MT.data,
@@ -9395,7 +10250,7 @@ class Tree_Editor(tk.Frame):
                                 self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
                             successful.append(True)
                         else:
-                            excluded += 1
+                            successful.append(None)
                     else:
                         successful.append(False)
 
@@ -9556,9 +10411,9 @@ class Tree_Editor(tk.Frame):
 
                 elif ctyp == "Column rename":
                     c3s = change[2].split(" ")
-                    coltype = f"{c3s[-2]} {c3s[-1]}"
+                    coltype = c3s[-1]
                     colname = "".join(change[4].split(" ")).strip()
-                    colnum = next(i for i, h in enumerate(self.headers) if h.name.lower() == colname.lower())
+                    colnum = next(i for i, h in enumerate(self.headers) if h.name.lower() == change[3].lower())
                     if (
                         self.headers[colnum].name.lower() == change[3].lower()
                         and self.headers[colnum].type_ == coltype
@@ -9945,7 +10800,6 @@ class Tree_Editor(tk.Frame):
                         oldpc = int(self.pc)
                         self.pc = newcol
                         if self.add(cid, newpar, snapshot=False, errors=False):
-                            self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
                             self.changelog_append_no_unsaved(
                                 "Imported change | Add ID",
                                 change[2],
@@ -9972,7 +10826,6 @@ class Tree_Editor(tk.Frame):
                                 change[3],
                                 change[4],
                             )
-                            self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
                             if oldname.lower() in self.tagged_ids:
                                 self.tagged_ids.discard(oldname.lower())
                                 self.tagged_ids.add(newname.lower())
@@ -10003,10 +10856,8 @@ class Tree_Editor(tk.Frame):
                     if cid.lower() in self.rns and cpar_check and self.headers[colnum].type_ == "Parent":
                         oldpc = int(self.pc)
                         self.pc = colnum
-                        to_del = self._del_id_core(cid.lower(), snapshot=False)
-                        self.sheet.del_rows(map(self.rns.__getitem__, to_del), redraw=False)
+                        delete_rows(self._del_id_core(cid.lower(), snapshot=False))
                         self.pc = int(oldpc)
-                        self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
                         self.changelog_append_no_unsaved(
                             "Imported change | Delete ID",
                             change[2],
@@ -10038,9 +10889,8 @@ class Tree_Editor(tk.Frame):
                     if cid.lower() in self.rns and cpar_check and self.headers[colnum].type_ == "Parent":
                         oldpc = int(self.pc)
                         self.pc = colnum
-                        self._del_id_orphan_core(cid.lower(), cpar.lower(), snapshot=False)
+                        delete_rows(self._del_id_orphan_core(cid.lower(), cpar.lower(), snapshot=False))
                         self.pc = int(oldpc)
-                        self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
                         self.changelog_append_no_unsaved(
                             "Imported change | Delete ID",
                             change[2],
@@ -10072,11 +10922,8 @@ class Tree_Editor(tk.Frame):
                     if cid.lower() in self.rns and cpar_check and self.headers[colnum].type_ == "Parent":
                         oldpc = int(self.pc)
                         self.pc = colnum
-                        to_del = self._del_id_children_core(cid.lower(), snapshot=False)
-                        if to_del:
-                            self.sheet.del_rows(map(self.rns.__getitem__, to_del), redraw=False)
+                        delete_rows(self._del_id_children_core(cid.lower(), snapshot=False))
                         self.pc = int(oldpc)
-                        self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
                         self.changelog_append_no_unsaved(
                             "Imported change | Delete ID + all children",
                             change[2],
@@ -10111,11 +10958,8 @@ class Tree_Editor(tk.Frame):
                     if cid.lower() in self.rns and cpar_check and self.headers[colnum].type_ == "Parent":
                         oldpc = int(self.pc)
                         self.pc = colnum
-                        to_del = self._del_id_children_all_core(cid.lower(), snapshot=False)
-                        if to_del:
-                            self.sheet.del_rows(map(self.rns.__getitem__, to_del), redraw=False)
+                        delete_rows(self._del_id_children_all_core(cid.lower(), snapshot=False))
                         self.pc = int(oldpc)
-                        self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
                         self.changelog_append_no_unsaved(
                             "Imported change | Delete ID + all children from all hierarchies",
                             change[2],
@@ -10131,9 +10975,7 @@ class Tree_Editor(tk.Frame):
                 elif ctyp == "Delete ID from all hierarchies |" or ctyp == "Delete ID from all hierarchies":
                     cid = change[2]
                     if cid.lower() in self.rns:
-                        to_del = self._del_id_all_core(cid.lower(), snapshot=False)
-                        self.sheet.del_rows(map(self.rns.__getitem__, to_del), redraw=False)
-                        self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
+                        delete_rows(self._del_id_all_core(cid.lower(), snapshot=False))
                         self.changelog_append_no_unsaved(
                             "Imported change | Delete ID from all hierarchies",
                             change[2],
@@ -10149,8 +10991,7 @@ class Tree_Editor(tk.Frame):
                 elif ctyp == "Delete ID from all hierarchies, orphan children":
                     cid = change[2]
                     if cid.lower() in self.rns:
-                        self._del_id_all_orphan_core(cid.lower(), snapshot=False)
-                        self.rns = {r[self.ic].lower(): i for i, r in enumerate(self.sheet.data)}
+                        delete_rows(self._del_id_all_orphan_core(cid.lower(), snapshot=False))
                         self.changelog_append_no_unsaved(
                             "Imported change | Delete ID from all hierarchies, orphan children",
                             change[2],
@@ -10178,11 +11019,11 @@ class Tree_Editor(tk.Frame):
                             successful.append(False)
                     else:
                         c3s = change[2].split(" ")
-                        colname = info[6]
+                        colname = c3s[6]
                         colnum = next(
                             i for i, h in enumerate(self.headers) if h.name.lower() == colname.lower()
                         )  # checks if column name exists
-                        order = info[8]
+                        order = c3s[8]
                         if order in ("ASCENDING", "DESCENDING"):
                             self.sort_sheet(colname, order, snapshot=False)
                             self.changelog_append_no_unsaved(
@@ -10197,17 +11038,20 @@ class Tree_Editor(tk.Frame):
             except Exception:
                 successful.append(False)
                 continue
-        num_successful = sum(successful)
+        finish_tree_work()
+        results = [False] * len(changes)
+        for (i, _, _), result in zip(to_apply, successful):
+            results[i] = result
+        num_successful = results.count(True)
         if num_successful:
             self.changelog_append(
                 f"Imported {num_successful} changes from: {os.path.basename(fp)}",
-                f"Unsuccessful: {len(successful) - num_successful} Unnecessary: {excluded}",
+                f"Unsuccessful: {results.count(False)} Unnecessary: {results.count(None)}",
                 "",
                 "",
             )
         else:
-            self.vs.pop()
-            self.set_undo_label()
+            self.drop_snapshot()
         self.pc = int(self.hiers[0])
         self.clear_copied_details()
         self.refresh_hier_dropdown(0)
@@ -10220,47 +11064,10 @@ class Tree_Editor(tk.Frame):
         self.redo_tree_display()
         self.refresh_dropdowns()
         self.stop_work(self.get_tree_editor_status_bar_text())
-        applicable_changes = {
-            "Edit cell",
-            "Edit cell |",
-            "Move rows",
-            "Move columns",
-            "Add new hierarchy column",
-            "Add new detail column",
-            "Delete hierarchy column",
-            "Delete detail column",
-            "Column rename",
-            "Edit validation",
-            "Change detail column type",
-            "Date format change",
-            "Cut and paste ID",
-            "Cut and paste ID |",
-            "Cut and paste ID + children",
-            "Cut and paste ID + children |",
-            "Cut and paste children",
-            "Copy and paste ID",
-            "Copy and paste ID |",
-            "Copy and paste ID + children",
-            "Copy and paste ID + children |",
-            "Add ID",
-            "Rename ID",
-            "Delete ID",
-            "Delete ID |",
-            "Delete ID, orphan children",
-            "Delete ID + all children",
-            "Delete ID + all children |",
-            "Delete ID + all children from all hierarchies",
-            "Delete ID + all children from all hierarchies |",
-            "Delete ID from all hierarchies",
-            "Delete ID from all hierarchies |",
-            "Delete ID from all hierarchies, orphan children",
-            "Sort sheet",
-        }
-        applicable_changes = applicable_changes | {f"Imported change | {change}" for change in applicable_changes}
         Post_Import_Changes_Popup(
             self,
-            [change for change in changes if change[1] in applicable_changes or change[1].startswith("Merge | ")],
-            successful,
+            changes,
+            results,
             theme=self.C.theme,
         )
         self.focus_tree()
@@ -10297,30 +11104,25 @@ class Tree_Editor(tk.Frame):
                 ns_row_len = popup.row_len
                 ns_headers = self.fix_headers(self.new_sheet.pop(0), ns_row_len)
                 equalize_sublist_lens(seq=self.new_sheet, len_=len(ns_headers))
-            elif fmt in (1, 2, 3, 4):
-                self.new_sheet, ns_row_len, ns_ic, ns_hiers = TreeBuilder().convert_flattened_to_normal(
-                    data=self.new_sheet,
-                    hier_cols=popup.flattened_pcols,
-                    rowlen=popup.row_len,
-                    fmt=fmt,
-                    warnings=self.warnings,
-                )
-            elif fmt == 5:
-                self.new_sheet, ns_row_len, ns_ic, ns_hiers = (
-                    TreeBuilder().convert_indented_tree_detail_adjacent_to_normal(
-                        data=self.new_sheet,
-                    )
-                )
-            elif fmt == 6:
-                self.new_sheet, ns_row_len, ns_ic, ns_hiers = (
-                    TreeBuilder().convert_indented_tree_details_adjacent_to_normal(
-                        data=self.new_sheet,
-                    )
-                )
-            elif fmt == 7:
-                self.new_sheet, ns_row_len, ns_ic, ns_hiers = TreeBuilder().convert_indented_tree_with_header_to_normal(
-                    data=self.new_sheet,
-                )
+            elif fmt in (1, 2, 3, 4, 5, 6, 7):
+
+                def convert() -> tuple[list[list[str]], int, int, list[int]]:
+                    if fmt in (1, 2, 3, 4):
+                        return TreeBuilder().convert_flattened_to_normal(
+                            data=self.new_sheet,
+                            hier_cols=popup.flattened_pcols,
+                            rowlen=popup.row_len,
+                            fmt=fmt,
+                            warnings=self.warnings,
+                        )
+                    elif fmt == 5:
+                        return TreeBuilder().convert_indented_tree_detail_adjacent_to_normal(data=self.new_sheet)
+                    elif fmt == 6:
+                        return TreeBuilder().convert_indented_tree_details_adjacent_to_normal(data=self.new_sheet)
+                    return TreeBuilder().convert_indented_tree_with_header_to_normal(data=self.new_sheet)
+
+                # the sheet snapshot is already taken so the conversion runs to completion
+                self.new_sheet, ns_row_len, ns_ic, ns_hiers = self.C.run_task(convert, cancellable=False)
             if fmt > 0:
                 ns_hiers_set = set(ns_hiers)
                 ns_headers = self.fix_headers(self.new_sheet.pop(0), ns_row_len)
@@ -10679,6 +11481,7 @@ class Tree_Editor(tk.Frame):
                 self.new_sheet = []
                 self.nodes = {}
                 self.clear_copied_details()
+                self.structure_changed()
                 self.auto_sort_nodes_bool = True
                 self.sheet.MT.data, self.nodes, self.warnings = TreeBuilder().build(
                     self.sheet.MT.data,
@@ -10704,23 +11507,13 @@ class Tree_Editor(tk.Frame):
                 self.refresh_dropdowns()
                 self.show_warnings("n/a - Data imported from: " + popup.file_opened, popup.sheet_opened)
             else:
-                self.vs.pop()
-                self.set_undo_label()
+                self.drop_snapshot()
                 Error(self, "No applicable changes were made", theme=self.C.theme)
             self.stop_work(self.get_tree_editor_status_bar_text())
             self.focus_sheet()
         except Exception as error_msg:
             Error(self, f"Error: {error_msg}", theme=self.C.theme)
 
-    def get_par_lvls(self, h: int, iid: str, lvl=1):
-        current_iid = iid
-        current_level = lvl
-        while self.nodes[current_iid].ps[h]:
-            pid = self.nodes[current_iid].ps[h]
-            self.levels[current_level] = self.nodes[pid].name
-            current_iid = pid
-            current_level += 1
-
     def export_flattened(self, event=None):
         self.start_work("Flattening sheet...")
         self.new_sheet = []
@@ -10730,7 +11523,7 @@ class Tree_Editor(tk.Frame):
 
     def get_save_json(self, program_data=False):
         if not program_data:
-            d = full_sheet_to_dict(
+            d = sheet_to_json_dict(
                 [h.name for h in self.headers],
                 self.sheet.MT.data,
                 format_=self.json_format,
@@ -10744,7 +11537,9 @@ class Tree_Editor(tk.Frame):
             d["program_data"] = dict_x_b32(self.get_program_data_dict())
         return d
 
-    def get_program_data_dict(self, sheetname="n/a"):
+    def get_program_data_dict(self, sheetname="n/a", compact=None):
+        if compact is None:
+            compact = self.save_compact_program_data
         d = {}
         d["records"] = self.sheet.data
         d["ic"] = self.ic
@@ -10759,7 +11554,10 @@ class Tree_Editor(tk.Frame):
             }
             for h in self.headers
         ]
-        d["nodes"] = self.jsonify_nodes()
+        if compact:
+            d["node_overrides"] = self.get_node_overrides()
+        else:
+            d["nodes"] = self.jsonify_nodes()
         d["changelog"] = self.changelog
         d["row_heights"] = self.sheet.get_safe_row_heights()
         d["column_widths"] = self.sheet.get_column_widths()
@@ -10787,6 +11585,48 @@ class Tree_Editor(tk.Frame):
             for n in self.nodes.values()
         }
 
+    def get_node_overrides(self) -> dict:
+        # what nodes_from_records() can't get from the records alone, parents that are
+        # top IDs without children or not in the hierarchy and non auto sorted children orders
+        first_hier = self.hiers[0]
+        overrides = {"ps": {}, "cn": {}}
+        for iid, node in self.nodes.items():
+            row = self.sheet.data[self.rns[iid]]
+            ps = {h: row[h].lower() if row[h] else "" if node.cn[h] else None for h in self.hiers}
+            if all(p is None for p in ps.values()):
+                ps[first_hier] = ""
+            if ps != node.ps:
+                overrides["ps"][node.name] = node.ps
+            if not self.auto_sort_nodes_bool:
+                cn = {h: v for h, v in node.cn.items() if any(self.rns[a] > self.rns[b] for a, b in zip(v, v[1:]))}
+                if cn:
+                    overrides["cn"][node.name] = cn
+        return overrides
+
+    def nodes_from_records(self, records: list[list[str]], overrides: dict) -> dict[str, Node]:
+        nodes = {}
+        TreeBuilder().build(records, [], self.row_len, self.ic, self.hiers, nodes, add_warnings=False, strip=False)
+        first_hier = self.hiers[0]
+        for r in records:
+            nodes[r[self.ic].lower()].name = r[self.ic]
+        for node in nodes.values():
+            for h in self.hiers:
+                if not node.ps[h] and not node.cn[h]:
+                    node.ps[h] = None
+            if all(p is None for p in node.ps.values()):
+                node.ps[first_hier] = ""
+        for name, ps in overrides["ps"].items():
+            nodes[name.lower()].ps = {int(h): p for h, p in ps.items()}
+        for name, cn in overrides["cn"].items():
+            for h, v in cn.items():
+                nodes[name.lower()].cn[int(h)] = v
+        if self.auto_sort_nodes_bool:
+            for node in nodes.values():
+                for h, v in node.cn.items():
+                    if v:
+                        node.cn[h] = sorted(v, key=self.cn_sort_key(h, nodes))
+        return nodes
+
     def nodes_json_x_dict(self, njson: dict, hiers: Sequence[int]) -> dict:
         return {
             name.lower(): Node(
@@ -10805,7 +11645,7 @@ class Tree_Editor(tk.Frame):
     def write_program_data_to_workbook(self, wb, sheetnames_):
         with suppress(Exception):
             wb.remove(wb["program_data"])
-        ws = wb.create_sheet(title="program_data")
+        ws = xlsx_string_sheet(wb, title="program_data")
         ws.append([f"{software_version_number}"])
         for chunk in self.xlsx_chunker(dict_x_b32(self.get_program_data_dict(sheetnames_[1]))):
             ws.append([chunk])
@@ -10819,7 +11659,7 @@ class Tree_Editor(tk.Frame):
                 wb.remove(wb[sname])
             except Exception:
                 continue
-        ws = wb.create_sheet(title=new_title1)
+        ws = xlsx_string_sheet(wb, title=new_title1)
         ws.append(xlsx_changelog_header(ws))
         for r in reversed(self.changelog):
             ws.append(e if e else None for e in r)
@@ -10832,7 +11672,7 @@ class Tree_Editor(tk.Frame):
                 wb.remove(wb[sname])
             except Exception:
                 continue
-        ws = wb.create_sheet(title=new_title1)
+        ws = xlsx_string_sheet(wb, title=new_title1)
         ws.freeze_panes = "A2"
         self.new_sheet = []
         for r in TreeBuilder().build_flattened(
@@ -10859,28 +11699,22 @@ class Tree_Editor(tk.Frame):
                 wb.remove(wb[sname])
             except Exception:
                 continue
-        ws = wb.create_sheet(title=new_title1)
+        ws = xlsx_string_sheet(wb, title=new_title1)
         ws.freeze_panes = "A2"
         oldpc = int(self.pc)
-        self.levels = defaultdict(list)
-        for h in self.hiers:
-            for iid, node in self.nodes.items():
-                if node.ps[h] and not node.cn[h]:
-                    self.get_par_lvls(h, iid)
-        maxlvls = max(self.levels, default=0) + 1
+        maxlvls = max((max(self.tree_index(h).depth.values(), default=0) for h in self.hiers), default=0) + 1
         self.xl_tv_detail_cols = tuple(i for i, h in enumerate(self.headers) if h.type_ not in ("ID", "Parent"))
-        self.level_colors = tuple(tv_lvls_colors[level_to_color(i)] for i in range(maxlvls + 1))
-        cycle_colors = cycle(tv_lvls_colors)
+        # styles are added to the workbook once and referenced by id in each row
+        fill_styles = [ws.style_id(fill=fill) for fill in tv_lvls_colors]
+        self.level_colors = tuple(fill_styles[level_to_color(i)] for i in range(maxlvls + 1))
+        cycle_colors = cycle(fill_styles)
 
         # Write header row
         row = []
         for lvl in range(1, maxlvls + 1):
-            cell = WriteOnlyCell(ws, value=lvl)
-            cell.fill = next(cycle_colors)
-            row.append(cell)
-        for _, hdr in enumerate((h for h in self.headers if h.type_ not in ("ID", "Parent")), start=maxlvls + 1):
-            cell = WriteOnlyCell(ws, value=hdr.name)
-            row.append(cell)
+            row.append((lvl, next(cycle_colors)))
+        for hdr in (h for h in self.headers if h.type_ not in ("ID", "Parent")):
+            row.append(hdr.name)
         ws.append(row)
 
         # Process hierarchies iteratively
@@ -10895,20 +11729,13 @@ class Tree_Editor(tk.Frame):
             while stack:
                 iid, level = stack.pop()
                 # Construct row with indentation
+                datarow = self.sheet.MT.data[self.rns[iid]]
                 row = list(repeat(None, level - 1))
-                cell = WriteOnlyCell(
-                    ws,
-                    value=f"{self.hier_disp}{self.sheet.MT.data[self.rns[iid]][self.tv_label_col]}",
-                )
-                cell.fill = self.level_colors[level - 1]
-                row.append(cell)
+                row.append((f"{self.hier_disp}{datarow[self.tv_label_col]}", self.level_colors[level - 1]))
                 # Add None values up to detail columns
-                num_nones = maxlvls - level
-                row.extend(list(repeat(None, num_nones)))
+                row.extend(repeat(None, maxlvls - level))
                 # Add detail columns
-                for col in self.xl_tv_detail_cols:
-                    cell = WriteOnlyCell(ws, value=self.sheet.MT.data[self.rns[iid]][col])
-                    row.append(cell)
+                row.extend(datarow[col] for col in self.xl_tv_detail_cols)
                 ws.append(row)
                 # Push children in reverse order to maintain original order
                 for ciid in reversed(self.nodes[iid].cn[self.pc]):
@@ -10916,7 +11743,6 @@ class Tree_Editor(tk.Frame):
 
         # Restore state
         self.pc = int(oldpc)
-        self.levels = defaultdict(list)
 
     def write_additional_sheets_to_workbook(self, new_sheet_name=None):
         if self.save_xlsx_with_flattened:
@@ -10959,42 +11785,80 @@ class Tree_Editor(tk.Frame):
 
     def save_workbook(self, filepath, sheetname):
         self.C.wb = Workbook(write_only=True)
-        ws = self.C.wb.create_sheet(title=sheetname)
+        ws = xlsx_string_sheet(self.C.wb, title=sheetname)
         if not self.ic:
             ws.freeze_panes = "B2"
         else:
             ws.freeze_panes = "A2"
-        for row in self.gen_sheet_w_headers():
-            ws.append(row)
+
+        def append_rows(rows: Iterator[Iterator[str | None]]) -> None:
+            for row in rows:
+                ws.append(row)
+
+        # saving isn't cancellable, an abandoned worker would still write the file
+        self.C.run_task(append_rows, self.gen_sheet_w_headers(self.sheet.MT.data.copy()), cancellable=False)
         self.write_additional_sheets_to_workbook(sheetname)
         self.C.wb.active = self.C.wb[sheetname]
         filepath = convert_old_xl_to_xlsx(filepath)
-        self.C.wb.save(filepath)
+        self.C.run_task(self.C.wb.save, filepath, cancellable=False)
         self.C.open_dict["filepath"] = filepath
         self.C.change_app_title(title=os.path.basename(filepath))
         return True
 
     def save_csv(self, filepath):
-        with open(filepath, "w", newline="", encoding="utf-8") as fh:
-            writer = csv.writer(
-                fh,
-                dialect=csv.excel_tab if filepath.lower().endswith(".tsv") else csv.excel,
-                lineterminator="\n",
-            )
-            writer.writerows(self.gen_sheet_w_headers())
+        def write_csv(rows: Iterator[Iterator[str | None]]) -> None:
+            with open(filepath, "w", newline="", encoding="utf-8") as fh:
+                writer = csv.writer(
+                    fh,
+                    dialect=csv.excel_tab if filepath.lower().endswith(".tsv") else csv.excel,
+                    lineterminator="\n",
+                )
+                writer.writerows(rows)
+
+        self.C.run_task(write_csv, self.gen_sheet_w_headers(self.sheet.MT.data.copy()), cancellable=False)
         self.C.open_dict["filepath"] = filepath
         self.C.change_app_title(title=os.path.basename(filepath))
         self.C.open_dict["sheet"] = "Sheet1"
         return True
 
     def save_json(self, filepath):
-        with open(filepath, "w") as fh:
-            fh.write(json.dumps(self.get_save_json(), indent=4))
+        def write_json_file(obj: dict) -> None:
+            with open(filepath, "w") as fh:
+                write_json(fh, obj, indent=4 if self.save_json_indented else None)
+
+        self.C.run_task(write_json_file, self.get_save_json(), cancellable=False)
         self.C.open_dict["filepath"] = filepath
         self.C.change_app_title(title=os.path.basename(filepath))
         self.C.open_dict["sheet"] = "Sheet1"
         return True
 
+    def save_tktrees(self, filepath):
+        self.C.run_task(
+            ProjectFile.write,
+            filepath,
+            self.get_program_data_dict(self.C.open_dict["sheet"], compact=True),
+            cancellable=False,
+        )
+        self.C.open_dict["filepath"] = filepath
+        self.C.change_app_title(title=os.path.basename(filepath))
+        return True
+
+    def load_changelog(self, project: ProjectFile) -> None:
+        # not needed for the first screen so it's decoded after opening,
+        # anything logged in the meantime stays after it
+        with project:
+            try:
+                changelog = (
+                    self.C.run_task(project.section, "changelog", cancellable=False) if "changelog" in project else []
+                )
+            except Exception as error_msg:
+                changelog = []
+                Error(self, f"Error reading changelog: {error_msg}", theme=self.C.theme)
+        if changelog and len(changelog[0]) > 5:
+            changelog = []
+        self.changelog[:0] = changelog
+        self.C.status_bar.change_text(self.get_tree_editor_status_bar_text())
+
     def save_(self, event=None, quitting=False):
         if self.C.current_frame != "tree_edit":
             return
@@ -11006,6 +11870,8 @@ class Tree_Editor(tk.Frame):
                 successful = self.save_csv(newfile)
             elif newfile.lower().endswith(".json"):
                 successful = self.save_json(newfile)
+            elif newfile.lower().endswith(".tktrees"):
+                successful = self.save_tktrees(newfile)
             elif newfile.lower().endswith((".xlsx", ".xls", ".xlsm")):
                 successful = self.save_workbook(newfile, self.C.open_dict["sheet"])
                 self.C.try_to_close_workbook()
@@ -11030,6 +11896,7 @@ class Tree_Editor(tk.Frame):
                 ("JSON file", ".json"),
                 ("CSV File (Comma separated values)", ".csv"),
                 ("TSV File (Tab separated values)", ".tsv"),
+                ("Tk-Trees project", ".tktrees"),
             ],
             defaultextension=".xlsx",
             confirmoverwrite=True,
@@ -11037,8 +11904,8 @@ class Tree_Editor(tk.Frame):
         if not newfile:
             return False
         newfile = os.path.normpath(newfile)
-        if not newfile.lower().endswith((".json", ".csv", ".xlsx", ".tsv")):
-            Error(self, "Can only write .json, .xlsx or .csv    ", theme=self.C.theme)
+        if not newfile.lower().endswith((".json", ".csv", ".xlsx", ".tsv", ".tktrees")):
+            Error(self, "Can only write .json, .xlsx, .csv or .tktrees    ", theme=self.C.theme)
             return False
         self.start_work("Saving... ")
         successful = False
@@ -11047,6 +11914,8 @@ class Tree_Editor(tk.Frame):
                 successful = self.save_csv(newfile)
             elif newfile.lower().endswith(".json"):
                 successful = self.save_json(newfile)
+            elif newfile.lower().endswith(".tktrees"):
+                successful = self.save_tktrees(newfile)
             elif newfile.lower().endswith(".xlsx"):
                 popup = Enter_Sheet_Name_Popup(self, theme=self.C.theme)
                 if popup.result and all(
@@ -11089,10 +11958,13 @@ class Tree_Editor(tk.Frame):
         elif newfile.lower().endswith((".xlsx", ".json", ".xlsm")):
             ext = newfile[-5:]
             path = newfile[:-5]
+        elif newfile.lower().endswith(".tktrees"):
+            ext = newfile[-8:]
+            path = newfile[:-8]
         else:
             Error(
                 self,
-                "Error saving file, file extension must be .csv/.xlsx/.json   ",
+                "Error saving file, file extension must be .csv/.xlsx/.json/.tktrees   ",
                 theme=self.C.theme,
             )
             self.stop_work(self.get_tree_editor_status_bar_text())
@@ -11110,7 +11982,7 @@ class Tree_Editor(tk.Frame):
             try:
                 for file in os.listdir(folder):
                     if (
-                        file.lower().endswith((".json", ".xlsx", ".csv", ".xls", ".xlsm", ".tsv"))
+                        file.lower().endswith((".json", ".xlsx", ".csv", ".xls", ".xlsm", ".tsv", ".tktrees"))
                         and path_without_numbers(file) == newfile_without_numbers
                     ):
                         matches[file] = path_numbers(file)
@@ -11159,6 +12031,8 @@ class Tree_Editor(tk.Frame):
                 successful = self.save_csv(newfile)
             elif newfile.lower().endswith(".json"):
                 successful = self.save_json(newfile)
+            elif newfile.lower().endswith(".tktrees"):
+                successful = self.save_tktrees(newfile)
             elif newfile.lower().endswith((".xlsx", ".xls", ".xlsm")):
                 successful = self.save_workbook(newfile, self.C.open_dict["sheet"])
                 self.C.try_to_close_workbook()
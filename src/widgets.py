@@ -1,23 +1,30 @@
 # SPDX-License-Identifier: AGPL-3.0-only
 # Copyright (c) R. A. Gardner
 
+from __future__ import annotations
+
 import datetime
 import os
 import re
+import threading
 import tkinter as tk
+from collections.abc import Callable, Generator, Iterable, Sequence
 from contextlib import suppress
 from itertools import islice
 from tkinter import filedialog, ttk
-from typing import Literal
+from typing import Any, Literal
 
 from tksheet import (
     Sheet,
+    is_iterable,
     num2alpha,
 )
+from tksheet.other_classes import Node
 
 from . import toplevels
 from .classes import (
     Header,
+    TaskCancelled,
     TreeBuilder,
 )
 from .constants import (
@@ -41,6 +48,42 @@ from .functions import (
 )
 
 
+def create_cell_align_selector_menu(
+    parent,
+    command,
+    menu_kwargs,
+    icons,
+):
+    menu = tk.Menu(parent, tearoff=0, **menu_kwargs)
+    menu.add_command(
+        label="Left",
+        command=lambda: command("w"),
+        image=icons["w"],
+        compound="left",
+        **menu_kwargs,
+    )
+    menu.add_command(
+        label="Center",
+        command=lambda: command("center"),
+        image=icons["c"],
+        compound="left",
+        **menu_kwargs,
+    )
+    menu.add_command(
+        label="Right",
+        command=lambda: command("e"),
+        image=icons["e"],
+        compound="left",
+        **menu_kwargs,
+    )
+    menu.add_command(
+        label="Default",
+        command=lambda: command("global"),
+        **menu_kwargs,
+    )
+    return menu
+
+
 class Workbook_Sheet_Selection(tk.Frame):
     def __init__(self, parent, C):
         tk.Frame.__init__(self, parent)
@@ -878,6 +921,244 @@ class Fast_Selector(Sheet):
         pass
 
 
+class Unloaded_Children(list):
+    # stands in for the children of a node that haven't been inserted
+    # into the treeview yet, it's truthy so tksheet still draws an arrow
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return True
+
+
+class Lazy_Tree(Sheet):
+    """
+    Treeview that in lazy mode only holds rows for the top level and the
+    children of open nodes, children are inserted when a node is opened
+    and removed again when it is closed
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy = False
+        # open ids of nodes that are not currently in the treeview
+        self.pending_opens = set()
+        self.lazy_children = None
+        self.lazy_parent = None
+        self.lazy_row = None
+        self.lazy_loaded = None
+
+    def set_lazy_callbacks(
+        self,
+        children: Callable[[str], Sequence[str]],
+        parent: Callable[[str], str | None],
+        row: Callable[[str], tuple[str, list[Any]]],
+        loaded: Callable[[list[str]], None],
+    ) -> None:
+        self.lazy_children = children
+        self.lazy_parent = parent
+        self.lazy_row = row
+        self.lazy_loaded = loaded
+
+    def lazy_built(self, iids: Iterable[str], open_ids: Iterable[str] | None) -> None:
+        """
+        Called after tree_build() with the built iids to mark the
+        nodes whose children were left out
+        """
+        index = self.MT._row_index
+        rns = self.RI.rns
+        for iid in iids:
+            node = index[rns[iid]]
+            if not node.children and self.lazy_children(iid):
+                node.children = Unloaded_Children()
+        self.pending_opens = {iid for iid in open_ids if iid not in rns} if open_ids else set()
+
+    def is_loaded(self, iid: str) -> bool:
+        return not isinstance(self.MT._row_index[self.RI.rns[iid]].children, Unloaded_Children)
+
+    def _gen_load(self, iid: str, full: bool) -> Generator[tuple[str, str, bool]]:
+        # depth first (iid, parent, descend) for the rows to insert under iid
+        stack = [(iid, iter(self.lazy_children(iid)))]
+        while stack:
+            try:
+                ciid = next(stack[-1][1])
+            except StopIteration:
+                stack.pop()
+                continue
+            descend = bool(self.lazy_children(ciid)) and (full or ciid in self.pending_opens)
+            yield ciid, stack[-1][0], descend
+            if descend:
+                stack.append((ciid, iter(self.lazy_children(ciid))))
+
+    def load_children(self, iid: str, full: bool = False) -> None:
+        """
+        Inserts the children of iid, and the children of any of them that
+        were open, or the whole subtree if full, the rows are inserted hidden
+        """
+        if not self.lazy or iid not in self.RI.rns or self.is_loaded(iid):
+            return
+        rows = []
+        new_iids = []
+        opened = []
+        for ciid, piid, descend in self._gen_load(iid, full):
+            text, values = self.lazy_row(ciid)
+            if descend:
+                children = list(self.lazy_children(ciid))
+                if ciid in self.pending_opens:
+                    opened.append(ciid)
+            else:
+                children = Unloaded_Children() if self.lazy_children(ciid) else []
+            rows.append([Node(text, ciid, piid, children)] + values)
+            new_iids.append(ciid)
+        self.MT._row_index[self.RI.rns[iid]].children = []
+        was_open = iid in self.RI.tree_open_ids
+        self.RI.tree_open_ids.discard(iid)
+        if rows:
+            self.insert_rows(
+                rows=rows,
+                idx=self.RI.rns[iid] + 1,
+                heights=[],
+                row_index=True,
+                fill=False,
+                undo=False,
+                create_selections=False,
+                redraw=False,
+            )
+        self.MT._row_index[self.RI.rns[iid]].children = list(self.lazy_children(iid))
+        for ciid in opened:
+            self.RI.tree_open_ids.add(ciid)
+            self.pending_opens.discard(ciid)
+        if was_open:
+            super().item(iid, open_=True, undo=False, emit_event=False, redraw=False)
+        self.lazy_loaded(new_iids)
+
+    def load_subtree(self, iid: str) -> None:
+        if not self.lazy or iid not in self.RI.rns:
+            return
+        if any(
+            not self.is_loaded(diid) for diid in (iid, *self.RI.get_iid_descendants(iid)) if self.lazy_children(diid)
+        ):
+            self.release(iid)
+            self.load_children(iid, full=True)
+
+    def release(self, iid: str) -> None:
+        """
+        Removes the rows under iid, open ids below it are kept in pending_opens
+        """
+        node = self.MT._row_index[self.RI.rns[iid]]
+        if not node.children or isinstance(node.children, Unloaded_Children):
+            return
+        dids = list(self.RI.get_iid_descendants(iid))
+        self.pending_opens.update(filter(self.RI.tree_open_ids.__contains__, dids))
+        was_open = iid in self.RI.tree_open_ids
+        rn = self.RI.rns[iid]
+        self.del_rows(range(rn + 1, rn + 1 + len(dids)), data_indexes=True, undo=False, redraw=False)
+        self.MT._row_index[self.RI.rns[iid]].children = Unloaded_Children()
+        if was_open:
+            self.RI.tree_open_ids.add(iid)
+
+    def ensure_item(self, item: str) -> bool:
+        """
+        Inserts the ancestors of item if needed, returns whether item is in the treeview
+        """
+        if item in self.RI.rns:
+            return True
+        if not self.lazy:
+            return False
+        chain = []
+        iid = item
+        while iid not in self.RI.rns:
+            chain.append(iid)
+            if not (iid := self.lazy_parent(iid)):
+                return False
+        for piid in (iid, *reversed(chain[1:])):
+            self.load_children(piid)
+        return item in self.RI.rns
+
+    def get_tree_state(self) -> dict[str, Any]:
+        # row based options are copied because the next tree_build() dehighlights them in place
+        return {
+            "data": self.MT.data,
+            "row_index": self.MT._row_index,
+            "displayed_rows": self.MT.displayed_rows,
+            "all_rows_displayed": self.MT.all_rows_displayed,
+            "row_positions": self.MT.row_positions,
+            "saved_row_heights": self.MT.saved_row_heights,
+            "cell_options": {k: v.copy() for k, v in self.MT.cell_options.items()},
+            "row_options": {k: v.copy() for k, v in self.MT.row_options.items()},
+            "index_options": {k: v.copy() for k, v in self.RI.cell_options.items()},
+            "rns": self.RI.rns,
+            "tree_open_ids": self.RI.tree_open_ids,
+            "lazy": self.lazy,
+            "pending_opens": self.pending_opens,
+        }
+
+    def set_tree_state(self, state: dict[str, Any]) -> None:
+        self.deselect(redraw=False)
+        self.MT.data = state["data"]
+        self.MT._row_index = state["row_index"]
+        self.MT.displayed_rows = state["displayed_rows"]
+        self.MT.all_rows_displayed = state["all_rows_displayed"]
+        self.MT.row_positions = state["row_positions"]
+        self.MT.saved_row_heights = state["saved_row_heights"]
+        self.MT.cell_options = state["cell_options"]
+        self.MT.row_options = state["row_options"]
+        self.RI.cell_options = state["index_options"]
+        self.RI.rns = state["rns"]
+        self.RI.tree_open_ids = state["tree_open_ids"]
+        self.lazy = state["lazy"]
+        self.pending_opens = state["pending_opens"]
+        self.set_refresh_timer()
+
+    def tree_get_open(self) -> set[str]:
+        if self.lazy:
+            return self.RI.tree_open_ids | self.pending_opens
+        return self.RI.tree_open_ids
+
+    def item(self, item: str, *args, open_: bool | None = None, **kwargs) -> Any:
+        if self.lazy and open_ is True:
+            self.load_children(item)
+        result = super().item(item, *args, open_=open_, **kwargs)
+        if self.lazy and open_ is False:
+            self.release(item)
+        return result
+
+    def tree_open(self, *items: str, redraw: bool = True) -> Sheet:
+        if not self.lazy:
+            return super().tree_open(*items, redraw=redraw)
+        items = tuple(items[0] if len(items) == 1 and is_iterable(items[0]) else items)
+        for iid in items:
+            self.load_children(iid)
+        return super().tree_open(items, redraw=redraw) if items else super().tree_open(redraw=redraw)
+
+    def tree_close(self, *items: str, redraw: bool = True) -> Sheet:
+        if not self.lazy:
+            return super().tree_close(*items, redraw=redraw)
+        items = tuple(items[0] if len(items) == 1 and is_iterable(items[0]) else items)
+        if not items:
+            return super().tree_close(redraw=redraw)
+        super().tree_close(items, redraw=redraw)
+        for iid in items:
+            if iid in self.RI.rns and iid not in self.RI.tree_open_ids:
+                self.release(iid)
+        return self
+
+    def get_children(self, item: str | None = None) -> Generator[str]:
+        if self.lazy and item:
+            self.load_children(item)
+        return super().get_children(item)
+
+    def display_item(self, item: str, redraw: bool = False) -> Sheet:
+        self.ensure_item(item)
+        return super().display_item(item, redraw=redraw)
+
+    def selection_add(self, *items, run_binding: bool = True, redraw: bool = True) -> Sheet:
+        if self.lazy:
+            items = tuple(items[0] if len(items) == 1 and is_iterable(items[0]) else items)
+            for iid in items:
+                self.ensure_item(iid)
+        return super().selection_add(*items, run_binding=run_binding, redraw=redraw)
+
+
 class X_Checkbutton(ttk.Button):
     def __init__(
         self, parent, text="", style="Std.TButton", command=None, state="normal", checked=False, compound="right"
@@ -2143,3 +2424,126 @@ class Display_Label(tk.Label):
     def change_text(self, text):
         self.config(text=text)
         self.update_idletasks()
+
+
+class BackgroundTask:
+    """
+    Runs func in a worker thread while the Tk event loop keeps running, the result or
+    exception is handed back to the caller via after() polling, func must not touch Tk,
+    it can call task.progress(text) for the status bar and task.check_cancelled(),
+    menus and editing are blocked while it runs so the data it reads can't change
+    """
+
+    __slots__ = (
+        "cancellable",
+        "cancelled",
+        "done",
+        "error",
+        "poll_ms",
+        "result",
+        "shown_text",
+        "status_bar",
+        "text",
+        "thread",
+        "widget",
+    )
+
+    def __init__(
+        self,
+        widget: tk.Misc,
+        status_bar: Any = None,
+        cancellable: bool = True,
+        poll_ms: int = 50,
+    ) -> None:
+        self.widget = widget
+        self.status_bar = status_bar
+        self.cancellable = cancellable
+        self.poll_ms = poll_ms
+        self.cancelled = threading.Event()
+        self.done = tk.BooleanVar(widget, value=False)
+        self.result = None
+        self.error = None
+        self.text = ""
+        self.shown_text = ""
+        self.thread = None
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        def target() -> None:
+            try:
+                self.result = func(*args, **kwargs)
+            except BaseException as error:
+                self.error = error
+
+        toplevel = self.widget.winfo_toplevel()
+        if self.cancellable:
+            toplevel.bind("<Escape>", self.cancel)
+            if self.status_bar is not None:
+                self.progress(self.status_bar.text)
+        # func reads data the user could otherwise edit, input is held until it returns
+        unblock = self.block_input(toplevel)
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+        self.widget.after(self.poll_ms, self.poll)
+        try:
+            # processes events until poll() sets done
+            self.widget.wait_variable(self.done)
+        finally:
+            unblock()
+            if self.cancellable:
+                toplevel.unbind("<Escape>")
+        # a cancelled thread is left to finish on its own and its result ignored
+        if self.cancelled.is_set():
+            raise TaskCancelled
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def block_input(self, toplevel: tk.Misc) -> Callable[[], None]:
+        # disables the menubar and sends mouse and key events to the status bar
+        # returns a function that puts back the menu states, grab and focus
+        menu_states = []
+        if menu_name := toplevel["menu"]:
+            menu = toplevel.nametowidget(menu_name)
+            for i in range((menu.index("end") or 0) + 1):
+                with suppress(tk.TclError):
+                    menu_states.append((i, menu.entrycget(i, "state")))
+                    menu.entryconfig(i, state="disabled")
+        old_grab, old_focus = toplevel.grab_current(), toplevel.focus_get()
+        grabbed = False
+        if self.status_bar is not None:
+            with suppress(tk.TclError):
+                self.status_bar.grab_set()
+                self.status_bar.focus_set()
+                grabbed = True
+
+        def unblock() -> None:
+            with suppress(tk.TclError):
+                if grabbed:
+                    self.status_bar.grab_release()
+                    if old_grab is not None:
+                        old_grab.grab_set()
+                    if old_focus is not None:
+                        old_focus.focus_set()
+                for i, state in menu_states:
+                    menu.entryconfig(i, state=state)
+
+        return unblock
+
+    def poll(self) -> None:
+        if self.status_bar is not None and self.text != self.shown_text:
+            self.shown_text = self.text
+            self.status_bar.change_text(f"{self.text}   (Esc to cancel)" if self.cancellable else self.text)
+        if self.thread.is_alive() and not self.cancelled.is_set():
+            self.widget.after(self.poll_ms, self.poll)
+        else:
+            self.done.set(True)
+
+    def progress(self, text: str) -> None:
+        self.text = text
+
+    def cancel(self, event: Any = None) -> None:
+        self.cancelled.set()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled.is_set():
+            raise TaskCancelled
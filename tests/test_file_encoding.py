@@ -0,0 +1,24 @@
+from src.functions import get_csv_data_from_file, get_file_encoding, get_json_from_file
+
+
+def test_csv_non_utf8_byte_after_sample(tmp_path):
+    fp = tmp_path / "late.csv"
+    rows = [f"id{i},par{i}" for i in range(10_000)]
+    fp.write_bytes(("\n".join(rows) + "\nCaf\xe9,par\n").encode("latin-1"))
+    assert fp.stat().st_size > 1 << 16
+    assert get_file_encoding(str(fp)) == "utf-8"
+    data = get_csv_data_from_file(str(fp))
+    assert len(data) == 10_001
+    assert data[-1] == ["Caf\xe9", "par"]
+
+
+def test_csv_utf8(tmp_path):
+    fp = tmp_path / "utf8.csv"
+    fp.write_bytes("ID,Parent\nCaf\xe9,中\n".encode())
+    assert get_csv_data_from_file(str(fp)) == [["ID", "Parent"], ["Caf\xe9", "中"]]
+
+
+def test_json_non_utf8_byte_after_sample(tmp_path):
+    fp = tmp_path / "late.json"
+    fp.write_bytes(('{"pad": "' + "x" * (1 << 16) + '", "name": "Caf\xe9"}').encode("latin-1"))
+    assert get_json_from_file(str(fp))["name"] == "Caf\xe9"
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BLOCK_TK = 'import sys; sys.modules["tkinter"] = None; sys.modules["_tkinter"] = None; '
+
+
+def run_without_tk(code: str, *args: str) -> subprocess.CompletedProcess:
+    # a fresh interpreter so modules imported by other tests don't hide an import of tkinter
+    return subprocess.run(
+        [sys.executable, "-c", BLOCK_TK + code, *args],
+        check=False,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def test_import_compare_without_tkinter():
+    result = run_without_tk("import src.compare, src.api")
+    assert result.returncode == 0, result.stderr
+
+
+def test_compare_cli_without_tkinter(tmp_path):
+    one, two, out = tmp_path / "one.csv", tmp_path / "two.csv", tmp_path / "out.csv"
+    one.write_text("ID,Parent\na,\nb,a\nc,b\n")
+    two.write_text("ID,Parent\na,\nb,a\nc,a\nd,c\n")
+    code = "import runpy; sys.argv = sys.argv[1:]; runpy.run_path('TKTREES.pyw', run_name='__main__')"
+    argv = ["TKTREES.pyw", "compare", str(one), str(two), str(out), "-id-0", "-all-parent-columns-1"]
+    result = run_without_tk(code, *argv)
+    assert result.returncode == 0, result.stderr
+    report = out.read_text()
+    assert "New IDs two.csv" in report
+    assert "c,Parents in hierarchy: Parent,b,a" in report